@@ -12,11 +12,15 @@ setup(
     packages=find_packages(),
     python_requires=">=3.8",
     install_requires=requirements,
+    extras_require={
+        'scoring': ['numpy'],
+    },
     entry_points={
         'console_scripts': [
-            'career-scout=src.parser:main',
+            'career-scout=src.cli:main',
             'career-scout-logs=src.commands.watch_logs:watch_logs',
             'career-scout-clear-cache=src.commands.clear_cache:clear_cache',
+            'career-scout-backfill=src.commands.backfill:main',
         ],
     }
 ) 
\ No newline at end of file
@@ -0,0 +1,303 @@
+"""Benchmarks of the filter, cache and formatter hot paths on synthetic data.
+
+Results are written as JSON (seconds per operation for every case), so a
+run can be compared against a stored baseline to catch regressions.
+
+Usage:
+    python -m src.benchmark --output baseline.json
+    python -m src.benchmark --quick --baseline baseline.json [--threshold 0.25]
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import pytz
+
+from src.cache import MessageCache, cache_key
+from src.filters import MessageFilter
+from src.formatter import MessageFormatter
+from src.matcher import build_keyword_matcher
+from src.storage import create_storage
+
+KEYWORD_COUNTS = (10, 100, 1000, 10000)
+CACHE_SIZES = (5000, 50000, 1000000)
+CACHE_BACKENDS = ('json', 'log', 'sqlite', 'binary')
+QUICK_KEYWORD_COUNTS = (10, 1000)
+QUICK_CACHE_SIZES = (5000, 50000)
+CORPUS_SIZE = 2000
+# Operations per cache case, cut short when the time budget runs out
+CACHE_OPERATIONS = 2000
+# Seconds one case may take before it stops early
+TIME_BUDGET = 2.0
+# Timed runs per stateless case, the fastest one is reported
+REPEAT = 3
+CACHE_TTL = 7 * 86400
+# Relative slowdown reported as regression by compare()
+DEFAULT_THRESHOLD = 0.25
+
+SENIORITY = {
+    'en': ['junior', 'middle', 'senior', 'lead', 'principal', 'staff'],
+    'ru': ['младший', 'ведущий', 'старший', 'главный'],
+    'de': ['junior', 'senior', 'leitender'],
+    'es': ['junior', 'senior', 'líder'],
+}
+ROLES = {
+    'en': ['developer', 'engineer', 'architect', 'team lead', 'consultant', 'specialist'],
+    'ru': ['разработчик', 'инженер', 'архитектор', 'программист', 'тимлид'],
+    'de': ['entwickler', 'ingenieur', 'architekt', 'berater'],
+    'es': ['desarrollador', 'ingeniero', 'arquitecto', 'programador'],
+}
+TECHNOLOGIES = [
+    'python', 'java', 'kotlin', 'swift', 'ios', 'android', 'go', 'rust', 'c++', 'c#',
+    '.net', 'php', 'ruby', 'scala', 'elixir', 'node.js', 'react', 'vue', 'angular',
+    'flutter', 'django', 'spring', 'laravel', 'rails', 'devops', 'sre', 'qa', 'data',
+    'ml', 'backend', 'frontend', 'fullstack', 'mobile', 'embedded', 'unity', '1c',
+    'sql', 'kubernetes', 'aws', 'security', 'typescript', 'javascript', 'golang', 'c',
+    'perl', 'haskell', 'clojure', 'dart', 'fastapi', 'flask', 'symfony', 'nestjs', 'svelte',
+    'gcp', 'azure', 'linux', 'bigdata', 'etl', 'gamedev', 'blockchain',
+]
+STOP_WORDS = ['resume', 'looking for a job', 'ищу работу', 'резюме', 'suche arbeit',
+              'busco trabajo', 'open to work', 'cv attached']
+LOCATIONS = ['Remote', 'Berlin', 'Москва', 'Madrid', 'Lisbon', 'Warsaw', 'Тбилиси', 'Dubai']
+SENTENCES = {
+    'en': ['We are a fast growing product company.', 'Hybrid schedule, flexible hours.',
+           'You will own services used by millions of users.', 'Code review and pair programming.',
+           'Relocation package and visa support.', 'Stock options and private insurance.'],
+    'ru': ['Мы развиваем собственный продукт.', 'Гибкий график, удаленная работа.',
+           'Белая зарплата, ДМС и компенсация обучения.', 'Небольшая команда без бюрократии.',
+           'Помощь с релокацией.', 'Код-ревью и современный стек.'],
+    'de': ['Wir sind ein wachsendes Startup.', 'Flexible Arbeitszeiten und Homeoffice.',
+           'Unbefristeter Vertrag und 30 Tage Urlaub.', 'Moderne Infrastruktur in der Cloud.'],
+    'es': ['Somos una empresa de producto en crecimiento.', 'Horario flexible y teletrabajo.',
+           'Seguro médico privado y formación.', 'Equipo internacional y buen ambiente.'],
+}
+
+def generate_keywords(count: int, seed: int = 0) -> Dict:
+    """Keyword section with `count` distinct positions in several languages"""
+    terms = set()
+    for language, roles in ROLES.items():
+        for role in roles:
+            for technology in TECHNOLOGIES:
+                for title in (f"{technology} {role}", f"{role} {technology}"):
+                    terms.add(title)
+                    terms.update(f"{seniority} {title}" for seniority in SENIORITY[language])
+    terms = sorted(terms)
+    if count > len(terms):
+        raise ValueError(f"At most {len(terms)} keywords can be generated")
+    return {
+        'positions': random.Random(seed).sample(terms, count),
+        'stop_words': list(STOP_WORDS),
+        'word_boundary': True,
+    }
+
+def generate_corpus(count: int, seed: int = 0) -> List[str]:
+    """Vacancy-like texts in English, Russian, German and Spanish"""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        language = rng.choice(list(ROLES))
+        title = (f"{rng.choice(SENIORITY[language]).title()} {rng.choice(TECHNOLOGIES)} "
+                 f"{rng.choice(ROLES[language])}")
+        lines = [
+            f"🔥 {title}",
+            f"📍 {rng.choice(LOCATIONS)} · 💰 {rng.randrange(2, 12) * 1000}$",
+            *rng.sample(SENTENCES[language], rng.randrange(2, len(SENTENCES[language]) + 1)),
+            f"Stack: {', '.join(rng.sample(TECHNOLOGIES, 5))}",
+        ]
+        # Some messages are job seekers' posts excluded by stop words
+        if rng.random() < 0.1:
+            lines.append(rng.choice(STOP_WORDS).capitalize())
+        texts.append('\n'.join(lines * rng.randrange(1, 4)))
+    return texts
+
+def _best_time(run: Callable[[], None], repeat: int = REPEAT) -> float:
+    """Fastest of `repeat` runs, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def _per_operation(operation: Callable[[int], None], count: int, budget: float) -> float:
+    """Seconds per call of operation(i) for i in range(count), stopping when budget is spent"""
+    started = time.perf_counter()
+    deadline = started + budget
+    done = 0
+    while done < count:
+        operation(done)
+        done += 1
+        if time.perf_counter() > deadline:
+            break
+    return (time.perf_counter() - started) / done
+
+def bench_filter(keyword_counts: Sequence[int], corpus: List[str]) -> Dict[str, float]:
+    results = {}
+    for count in keyword_counts:
+        keywords = generate_keywords(count)
+        started = time.perf_counter()
+        message_filter = MessageFilter(build_keyword_matcher(keywords))
+        results[f"filter/build/keywords={count}"] = time.perf_counter() - started
+
+        def relevant():
+            for text in corpus:
+                message_filter.is_relevant(text)
+
+        def extract():
+            for text in corpus:
+                message_filter.extract_keywords(text)
+
+        results[f"filter/is_relevant/keywords={count}"] = _best_time(relevant) / len(corpus)
+        results[f"filter/extract_keywords/keywords={count}"] = _best_time(extract) / len(corpus)
+    return results
+
+def _prefill(backend: str, cache_file: Path, size: int, now: float):
+    """Store `size` unexpired entries spread over half of the TTL, oldest first"""
+    storage = create_storage(backend, cache_file)
+    step = CACHE_TTL / size / 2
+    storage.save({cache_key(i, f"@channel{i % 50}"): int(now - CACHE_TTL / 2 + i * step)
+                  for i in range(size)})
+    storage.close()
+
+def bench_cache(sizes: Sequence[int], backends: Sequence[str],
+                operations: int = CACHE_OPERATIONS, budget: float = TIME_BUDGET) -> Dict[str, float]:
+    results = {}
+    rng = random.Random(0)
+    for backend in backends:
+        for size in sizes:
+            case = f"backend={backend}/size={size}"
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                cache_file = Path(tmp_dir) / "messages_cache.json"
+                _prefill(backend, cache_file, size, time.time())
+
+                started = time.perf_counter()
+                cache = MessageCache(cache_file, backend, cache_size=size, cache_ttl=CACHE_TTL)
+                results[f"cache/load/{case}"] = time.perf_counter() - started
+
+                hits = [rng.randrange(size) for _ in range(operations)]
+                results[f"cache/message_exists_hit/{case}"] = _per_operation(
+                    lambda i: cache.message_exists(hits[i], f"@channel{hits[i] % 50}"),
+                    operations, budget)
+                results[f"cache/message_exists_miss/{case}"] = _per_operation(
+                    lambda i: cache.message_exists(size + i, "@channel0"), operations, budget)
+                results[f"cache/add_message/{case}"] = _per_operation(
+                    lambda i: cache.add_message(size + i, "@channel0"), operations, budget)
+
+                started = time.perf_counter()
+                cache._save_cache()
+                results[f"cache/save/{case}"] = time.perf_counter() - started
+                cache.close()
+    return results
+
+def bench_formatter(corpus: List[str]) -> Dict[str, float]:
+    formatter = MessageFormatter('Europe/Moscow')
+    keywords = {'positions': ['senior python developer', 'python разработчик']}
+    published = datetime(2024, 11, 30, 10, 0, tzinfo=pytz.UTC)
+
+    def format_messages():
+        for i, text in enumerate(corpus):
+            formatter.format_message(text, "@channel", f"https://t.me/channel/{i}",
+                                     keywords, published + timedelta(minutes=i), 3.5)
+
+    def format_entries():
+        for i, text in enumerate(corpus):
+            formatter.format_digest_entry(text, "@channel", f"https://t.me/channel/{i}",
+                                          keywords, published + timedelta(minutes=i))
+
+    return {
+        "formatter/format_message": _best_time(format_messages) / len(corpus),
+        "formatter/format_digest_entry": _best_time(format_entries) / len(corpus),
+    }
+
+def run_benchmarks(keyword_counts: Sequence[int] = KEYWORD_COUNTS,
+                   cache_sizes: Sequence[int] = CACHE_SIZES,
+                   backends: Sequence[str] = CACHE_BACKENDS,
+                   corpus_size: int = CORPUS_SIZE,
+                   suites: Sequence[str] = ('filter', 'cache', 'formatter')) -> Dict:
+    """Run suites and return report with seconds per operation of every case"""
+    corpus = generate_corpus(corpus_size)
+    results: Dict[str, float] = {}
+    if 'filter' in suites:
+        results.update(bench_filter(keyword_counts, corpus))
+    if 'cache' in suites:
+        results.update(bench_cache(cache_sizes, backends))
+    if 'formatter' in suites:
+        results.update(bench_formatter(corpus))
+    return {
+        'meta': {
+            'time': datetime.now(pytz.UTC).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'corpus_size': corpus_size,
+        },
+        'results': results,
+    }
+
+def compare(report: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """Cases present in both reports with relative change, slower than threshold marked"""
+    rows = []
+    for case, seconds in report['results'].items():
+        base = baseline['results'].get(case)
+        if not base:
+            continue
+        change = seconds / base - 1
+        rows.append({'case': case, 'seconds': seconds, 'baseline': base,
+                     'change': change, 'regression': change > threshold})
+    return rows
+
+def _format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+def print_report(report: Dict, rows: Optional[List[Dict]] = None):
+    changes = {row['case']: row for row in rows or []}
+    for case, seconds in report['results'].items():
+        line = f"{case:<55} {_format_time(seconds):>10}"
+        row = changes.get(case)
+        if row:
+            line += f"  {row['change']:+.0%}" + ("  REGRESSION" if row['regression'] else "")
+        print(line)
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark filter, cache and formatter")
+    arg_parser.add_argument('--quick', action='store_true',
+                            help="Smaller keyword lists and caches (no 1M entry cache)")
+    arg_parser.add_argument('--suite', action='append', choices=('filter', 'cache', 'formatter'),
+                            help="Run only this suite (repeatable)")
+    arg_parser.add_argument('--backend', action='append', choices=CACHE_BACKENDS,
+                            help="Cache backend to benchmark (repeatable, default all)")
+    arg_parser.add_argument('--output', type=Path, help="Write JSON report to file")
+    arg_parser.add_argument('--baseline', type=Path, help="Compare with a stored JSON report")
+    arg_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help="Slowdown reported as regression (default 0.25 = 25%%)")
+    args = arg_parser.parse_args(argv)
+
+    report = run_benchmarks(
+        keyword_counts=QUICK_KEYWORD_COUNTS if args.quick else KEYWORD_COUNTS,
+        cache_sizes=QUICK_CACHE_SIZES if args.quick else CACHE_SIZES,
+        backends=args.backend or CACHE_BACKENDS,
+        suites=args.suite or ('filter', 'cache', 'formatter'),
+    )
+    rows = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            rows = compare(report, json.load(f), args.threshold)
+    print_report(report, rows)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if rows and any(row['regression'] for row in rows):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,112 @@
-import json
 import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Optional, Tuple
 from src.config import config
+from src.idset import TTL_BUCKETS, MessageIdSet
+from src.storage import BinaryStorage, create_storage
+
+def key_group(channel_id, route: Optional[str] = None) -> str:
+    """Part of cache key before the message id: channel, prefixed with the route if any"""
+    if route is None:
+        return str(channel_id)
+    return f"{route}:{channel_id}"
+
+def cache_key(message_id: int, channel_id, route: Optional[str] = None) -> str:
+    """Key of message, prefixed with the route unless sent to the default target"""
+    return f"{key_group(channel_id, route)}_{message_id}"
+
+def split_key(key: str) -> Tuple[str, int]:
+    """Channel and message id of a cache key, channel names may contain '_'"""
+    channel_id, _, message_id = key.rpartition(':')[2].rpartition('_')
+    return channel_id, int(message_id)
 
 class MessageCache:
-    def __init__(self):
-        self.cache_file = config.CACHE_FILE
-        self.cache_size = config.CACHE_SIZE
-        self.cache_ttl = config.CACHE_TTL
-        self.cache: Dict = self._load_cache()
-
-    def _load_cache(self) -> Dict:
-        """Load cache from file or return empty dict if file doesn't exist"""
-        if self.cache_file.exists():
-            try:
-                with open(self.cache_file, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-        return {}
+    def __init__(self, cache_file: Optional[Path] = None, backend: Optional[str] = None,
+                 cache_size: Optional[int] = None, cache_ttl: Optional[int] = None):
+        self.cache_file = cache_file or config.CACHE_FILE
+        self.cache_size = config.CACHE_SIZE if cache_size is None else cache_size
+        self.cache_ttl = config.CACHE_TTL if cache_ttl is None else cache_ttl
+        self.storage = create_storage(backend or config.CACHE_BACKEND, Path(self.cache_file))
+        # Binary storage keeps message ids in per-channel arrays instead of a dict of keys
+        self.ids: Optional[MessageIdSet] = None
+        if isinstance(self.storage, BinaryStorage):
+            self.ids = self.storage.load_ids(max(1, self.cache_ttl // TTL_BUCKETS))
+        # Kept in timestamp order so expired and oldest entries are at the front
+        self.cache: OrderedDict = OrderedDict() if self.ids is not None else self._load_cache()
+        self._cleanup()
+
+    def __len__(self) -> int:
+        return len(self.ids) if self.ids is not None else len(self.cache)
+
+    def _load_cache(self) -> OrderedDict:
+        """Load cache from storage ordered by timestamp"""
+        entries = self.storage.load()
+        return OrderedDict(sorted(entries.items(), key=lambda x: x[1]))
 
     def _save_cache(self):
-        """Save cache to file"""
-        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.cache_file, 'w') as f:
-            json.dump(self.cache, f)
+        """Save whole cache to storage"""
+        if self.ids is not None:
+            self.storage.save_ids(self.ids)
+        else:
+            self.storage.save(self.cache)
 
-    def add_message(self, message_id: int, channel_id: int):
-        """Add message to cache with current timestamp"""
+    def add_message(self, message_id: int, channel_id: int, route: Optional[str] = None):
+        """Add message delivered to `route` (default target if None) with current timestamp"""
         current_time = int(time.time())
-        self.cache[f"{channel_id}_{message_id}"] = current_time
-        
+        key = cache_key(message_id, channel_id, route)
+        if self.ids is not None:
+            self.ids.add(key_group(channel_id, route), message_id, current_time)
+        else:
+            self.cache[key] = current_time
+            self.cache.move_to_end(key)
+
         # Clean old entries
         self._cleanup()
-        self._save_cache()
+        if self.storage.incremental:
+            self.storage.add(key, current_time)
+            if self.storage.needs_compaction(len(self)):
+                self._save_cache()
+        else:
+            self._save_cache()
 
-    def message_exists(self, message_id: int, channel_id: int) -> bool:
-        """Check if message exists in cache and not expired"""
-        key = f"{channel_id}_{message_id}"
+    def message_exists(self, message_id: int, channel_id: int, route: Optional[str] = None) -> bool:
+        """Check if message of `route` exists in cache and not expired"""
+        if self.ids is not None:
+            timestamp = self.ids.get(key_group(channel_id, route), message_id)
+            return timestamp is not None and time.time() - timestamp < self.cache_ttl
+        key = cache_key(message_id, channel_id, route)
         if key in self.cache:
             timestamp = self.cache[key]
             if time.time() - timestamp < self.cache_ttl:
                 return True
             del self.cache[key]
+        elif self.storage.shared:
+            # Entry may have been added by the sender in another process
+            timestamp = self.storage.get(key)
+            return timestamp is not None and time.time() - timestamp < self.cache_ttl
         return False
 
     def _cleanup(self):
-        """Remove expired entries and limit cache size"""
-        current_time = time.time()
-        # Remove expired entries
-        self.cache = {
-            k: v for k, v in self.cache.items()
-            if current_time - v < self.cache_ttl
-        }
-        
+        """Remove expired entries and limit cache size.
+
+        Entries are popped from the front only, so each entry is removed
+        at most once and cleanup is amortized O(1) per insert.
+        """
+        expire_before = time.time() - self.cache_ttl
+        if self.ids is not None:
+            self.ids.expire(expire_before)
+            if len(self.ids) > self.cache_size:
+                # Evicting a bucket's share more than needed keeps eviction passes rare
+                self.ids.evict(len(self.ids) - self.cache_size + self.cache_size // TTL_BUCKETS)
+            return
+        while self.cache and next(iter(self.cache.values())) <= expire_before:
+            self.cache.popitem(last=False)
+
         # If cache is still too large, remove oldest entries
-        if len(self.cache) > self.cache_size:
-            sorted_items = sorted(self.cache.items(), key=lambda x: x[1])
-            self.cache = dict(sorted_items[-self.cache_size:]) 
\ No newline at end of file
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def close(self):
+        """Release storage resources"""
+        self.storage.close()
@@ -0,0 +1,48 @@
+"""Single command line entry point with subcommands.
+
+Modules of a subcommand are imported only when it runs, so utility
+commands start without loading Telethon or reading the configuration.
+
+Usage:
+    career-scout [run]              # start the parser
+    career-scout logs --level warning
+    career-scout <command> --help
+"""
+import argparse
+import importlib
+import sys
+
+# Subcommand: (module, entry function taking argv, description)
+COMMANDS = {
+    'run': ('src.parser', 'main', "Start the parser (default)"),
+    'replay': ('src.replay', 'main', "Replay a message dump offline"),
+    'cache': ('src.commands.cache', 'main', "Inspect, compact, export or clear the cache"),
+    'logs': ('src.commands.watch_logs', 'watch_logs', "Follow the parser log"),
+    'backfill': ('src.commands.backfill', 'main', "Backfill channel history"),
+    'workers': ('src.workers', 'main', "Run or log in sharded workers"),
+    'bench': ('src.benchmark', 'main', "Benchmark filter, cache and formatter"),
+}
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    commands = '\n'.join(f"  {name:<10}{description}"
+                         for name, (_, _, description) in COMMANDS.items())
+    arg_parser = argparse.ArgumentParser(
+        prog='career-scout',
+        description="Telegram job vacancy parser",
+        epilog=f"commands:\n{commands}",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    arg_parser.add_argument('command', nargs='?', default='run', choices=COMMANDS,
+                            metavar='command', help="Command to run (default run)")
+    arg_parser.add_argument('args', nargs=argparse.REMAINDER,
+                            help="Arguments of the command")
+    return arg_parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(sys.argv[1:] if argv is None else argv)
+    module, function, _ = COMMANDS[args.command]
+    entry = getattr(importlib.import_module(module), function)
+    return entry(args.args)
+
+if __name__ == "__main__":
+    main()
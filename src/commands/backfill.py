@@ -0,0 +1,305 @@
+"""Parallel backfill of channel history with resumable checkpoints.
+
+The message id range of every channel since the requested date is split
+into segments that are fetched concurrently, a page per request. Progress
+of each segment is checkpointed, so an interrupted backfill continues
+where it stopped when started again.
+
+Matches are only queued in the outbox and delivered by the running
+parser; with --send the backfill delivers them itself, which must only
+be used while the parser is stopped (both would send the same items).
+
+Usage:
+    python -m src.commands.backfill [--channel @jobs] [--days 30] [--segments 8] [--send]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pytz
+from telethon import TelegramClient
+from telethon.errors import FloodWaitError
+
+from src.config import config
+from src.cursors import ChannelCursors
+from src.entities import EntityCache
+from src.parser import TelegramParser
+from src.ratelimit import TokenBucket
+
+# Messages per history request
+PAGE_SIZE = 100
+DEFAULT_SEGMENTS = 8
+DEFAULT_CONCURRENCY = 4
+# History requests per second over all segments
+DEFAULT_REQUEST_RATE = 3.0
+# Seconds between progress reports
+PROGRESS_INTERVAL = 5.0
+
+class Segment:
+    """Message ids in (low, high], processed up to `done`"""
+
+    __slots__ = ('low', 'high', 'done')
+
+    def __init__(self, low: int, high: int, done: Optional[int] = None):
+        self.low = low
+        self.high = high
+        self.done = low if done is None else done
+
+    @property
+    def finished(self) -> bool:
+        return self.done >= self.high
+
+def split_range(low: int, high: int, count: int) -> List[Segment]:
+    """Split ids (low, high] into up to `count` segments of equal size"""
+    count = max(1, min(count, high - low))
+    step = (high - low) / count
+    bounds = [low + round(step * i) for i in range(count)] + [high]
+    return [Segment(bounds[i], bounds[i + 1]) for i in range(count) if bounds[i] < bounds[i + 1]]
+
+class BackfillState:
+    """Segment checkpoints per channel, stored next to the cache file"""
+
+    def __init__(self, state_file: Optional[Path] = None):
+        self.state_file = state_file or config.CACHE_FILE.parent / "backfill.json"
+        self.plans: Dict[str, List[Segment]] = self._load()
+
+    def _load(self) -> Dict[str, List[Segment]]:
+        if not self.state_file.exists():
+            return {}
+        try:
+            with open(self.state_file, 'r') as f:
+                data = json.load(f)
+            return {channel: [Segment(*segment) for segment in segments]
+                    for channel, segments in data.items()}
+        except (OSError, ValueError, TypeError):
+            return {}
+
+    def save(self):
+        """Atomically write checkpoints"""
+        data = {channel: [[s.low, s.high, s.done] for s in segments]
+                for channel, segments in self.plans.items()}
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.state_file.with_name(self.state_file.name + ".tmp")
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_file, self.state_file)
+
+    def finish(self, channel_id: str):
+        self.plans.pop(channel_id, None)
+        self.save()
+
+class BackfillProgress:
+    """Processed share of message ids with rate and estimated time remaining"""
+
+    def __init__(self):
+        self.total_ids = 0
+        self.done_ids = 0
+        self.messages = 0
+        self._started = time.monotonic()
+        self._done_at_start = 0
+
+    def add_plan(self, segments: List[Segment]):
+        self.total_ids += sum(s.high - s.low for s in segments)
+        resumed = sum(s.done - s.low for s in segments)
+        self.done_ids += resumed
+        self._done_at_start += resumed
+
+    def advance(self, ids: int, messages: int):
+        self.done_ids += ids
+        self.messages += messages
+
+    def eta(self) -> Optional[float]:
+        elapsed = time.monotonic() - self._started
+        done = self.done_ids - self._done_at_start
+        if not done or not elapsed:
+            return None
+        return (self.total_ids - self.done_ids) / (done / elapsed)
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self._started
+        percent = self.done_ids / self.total_ids * 100 if self.total_ids else 100.0
+        rate = self.messages / elapsed if elapsed else 0.0
+        eta = self.eta()
+        eta_text = f"{int(eta // 60)}m{int(eta % 60):02d}s" if eta is not None else "unknown"
+        return (f"Backfill: {percent:.1f}% ({self.done_ids}/{self.total_ids} ids), "
+                f"{self.messages} messages, {rate:.0f} msg/s, ETA {eta_text}")
+
+class Backfill:
+    """Fetches channel history in concurrent segments through the parser pipeline"""
+
+    def __init__(self, parser, state: BackfillState, segments: int = DEFAULT_SEGMENTS,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 request_rate: float = DEFAULT_REQUEST_RATE):
+        self.parser = parser
+        self.client = parser.client
+        self.state = state
+        self.segments = segments
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.bucket = TokenBucket(request_rate, max(1, concurrency))
+        self.progress = BackfillProgress()
+        # FloodWait pauses all segments, not only the one that hit it
+        self._paused_until = 0.0
+
+    async def _first_id(self, entity, **kwargs) -> int:
+        async for message in self.client.iter_messages(entity, limit=1, **kwargs):
+            return message.id
+        return 0
+
+    async def plan(self, channel_id: str, entity, since: datetime) -> List[Segment]:
+        """Resume unfinished plan of channel, or split its range since date"""
+        segments = self.state.plans.get(channel_id)
+        if segments and not all(s.finished for s in segments):
+            print(f"{channel_id}: resuming unfinished backfill")
+            return segments
+        high = await self._first_id(entity)
+        # Newest message before the date, backfill starts after it
+        low = await self._first_id(entity, offset_date=since)
+        segments = split_range(low, high, self.segments) if high > low else []
+        self.state.plans[channel_id] = segments
+        self.state.save()
+        return segments
+
+    async def _wait_for_request(self):
+        while True:
+            delay = self._paused_until - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        await self.bucket.acquire()
+
+    async def run_segment(self, channel_id: str, entity, segment: Segment):
+        """Fetch segment page by page, checkpointing after every page"""
+        async with self.semaphore:
+            while not segment.finished and self.parser.is_running:
+                await self._wait_for_request()
+                try:
+                    page = [message async for message in self.client.iter_messages(
+                        entity, min_id=segment.done, max_id=segment.high + 1,
+                        reverse=True, limit=PAGE_SIZE)]
+                except FloodWaitError as e:
+                    print(f"{channel_id}: flood limit, pausing {e.seconds} seconds")
+                    self._paused_until = max(self._paused_until, time.monotonic() + e.seconds)
+                    continue
+                if not page:
+                    # No more messages in segment (deleted ids at its end)
+                    self.progress.advance(segment.high - segment.done, 0)
+                    segment.done = segment.high
+                    break
+
+                processed = await self.parser.process_page(channel_id, page)
+                if processed:
+                    done = page[processed - 1].id
+                    self.progress.advance(done - segment.done, processed)
+                    segment.done = done
+                self.state.save()
+                if processed < len(page):
+                    raise RuntimeError(f"message {page[processed].id} could not be processed")
+            self.state.save()
+
+    async def run_channel(self, channel_id: str, since: datetime) -> Tuple[str, Optional[str]]:
+        try:
+            # Read again, the running parser may have resolved channels since start
+            entities = EntityCache(self.parser.entities.cache_file)
+            entity = await entities.resolve(self.client, channel_id)
+            segments = await self.plan(channel_id, entity, since)
+            self.progress.add_plan(segments)
+            pending = [s for s in segments if not s.finished]
+            # Let other segments reach a checkpoint even if one of them fails
+            errors = [e for e in await asyncio.gather(
+                *(self.run_segment(channel_id, entity, s) for s in pending), return_exceptions=True
+            ) if isinstance(e, Exception)]
+            if errors:
+                raise errors[0]
+        except Exception as e:
+            return channel_id, str(e) or type(e).__name__
+
+        if all(s.finished for s in segments):
+            # Regular scans continue after backfilled range, unless that leaves a gap.
+            # Cursors are read again as the running parser keeps advancing them
+            cursors = ChannelCursors(self.parser.cursors.cursor_file)
+            cursor = cursors.get(channel_id)
+            if segments and (cursor is None or cursor >= segments[0].low):
+                cursors.update(channel_id, segments[-1].high)
+                cursors.save()
+            self.state.finish(channel_id)
+        return channel_id, None
+
+    async def _report_progress(self):
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            print(self.progress.line())
+
+    async def run(self, channel_ids: List[str], since: datetime) -> List[Tuple[str, Optional[str]]]:
+        """Backfill channels concurrently, return (channel, error) pairs"""
+        reporter = asyncio.create_task(self._report_progress())
+        try:
+            return await asyncio.gather(*(self.run_channel(c, since) for c in channel_ids))
+        finally:
+            reporter.cancel()
+            await asyncio.gather(reporter, return_exceptions=True)
+            print(self.progress.line())
+
+async def backfill(channel_ids: List[str], since: datetime, segments: int = DEFAULT_SEGMENTS,
+                   concurrency: int = DEFAULT_CONCURRENCY, request_rate: float = DEFAULT_REQUEST_RATE,
+                   send: bool = False, client=None, data_dir: Optional[Path] = None,
+                   target_channel=None) -> List[Tuple[str, Optional[str]]]:
+    """Backfill channels, queueing matches for the parser or delivering them with `send`"""
+    parser = TelegramParser(client=client, target_channel=target_channel, data_dir=data_dir)
+    data_dir = data_dir or config.CACHE_FILE.parent
+    runner = Backfill(parser, BackfillState(data_dir / "backfill.json"),
+                      segments, concurrency, request_rate)
+    sender_task = None
+    await parser.start()
+    try:
+        if send:
+            sender_task = asyncio.create_task(parser.sender.run())
+        results = await runner.run(channel_ids, since)
+        if send:
+            # Drain matches queued by the backfill before exiting
+            while len(parser.outbox) and not sender_task.done():
+                await asyncio.sleep(0.1)
+        return results
+    finally:
+        if sender_task:
+            parser.sender.stop()
+            sender_task.cancel()
+            await asyncio.gather(sender_task, return_exceptions=True)
+        parser.outbox.close()
+        parser.cache.close()
+        await parser.stop()
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Backfill channel history in parallel segments")
+    arg_parser.add_argument('--channel', action='append', dest='channels',
+                            help="Channel to backfill (repeatable, default all configured)")
+    arg_parser.add_argument('--days', type=int, default=config.DAYS_TO_PARSE,
+                            help="How many days back to backfill (default days_to_parse)")
+    arg_parser.add_argument('--segments', type=int, default=DEFAULT_SEGMENTS,
+                            help="Segments per channel")
+    arg_parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                            help="Segments fetched at the same time")
+    arg_parser.add_argument('--rate', type=float, default=DEFAULT_REQUEST_RATE,
+                            help="History requests per second")
+    arg_parser.add_argument('--send', action='store_true',
+                            help="Deliver matches too, only while the parser is stopped")
+    arg_parser.add_argument('--session', default='career_scout_backfill',
+                            help="Telegram session name, separate from the running parser")
+    args = arg_parser.parse_args(argv)
+
+    channel_ids = args.channels or [channel['id'] for channel in config.get_channels()]
+    since = datetime.now(pytz.UTC) - timedelta(days=args.days)
+    client = TelegramClient(args.session, config.API_ID, config.API_HASH)
+    print(f"Backfilling {len(channel_ids)} channels since {since:%Y-%m-%d %H:%M}")
+    results = asyncio.run(backfill(channel_ids, since, args.segments, args.concurrency,
+                                   args.rate, args.send, client))
+    for channel_id, error in results:
+        status = f"failed: {error} (run again to resume)" if error else "done"
+        print(f"  {channel_id}: {status}")
+
+if __name__ == "__main__":
+    main()
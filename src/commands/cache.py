@@ -0,0 +1,242 @@
+"""Inspect and maintain the message cache.
+
+Every command streams the stored records, so caches with millions of
+entries are handled without loading them into memory. Commands that
+rewrite the cache (compact, purge, import, clear) should be run while
+the parser is stopped, except with the sqlite backend.
+
+Records are keyed by the numeric peer id of the channel; purge accepts
+the channel as in channels.yaml and looks the id up in the parser's
+resolved entities.
+
+Usage:
+    python -m src.commands.cache stats
+    python -m src.commands.cache compact
+    python -m src.commands.cache purge --channel @jobs --from 2024-11-01 --to 2024-11-30
+    python -m src.commands.cache export cache.jsonl
+    python -m src.commands.cache import cache.jsonl
+    python -m src.commands.cache verify
+    python -m src.commands.cache clear
+"""
+import argparse
+import json
+import sys
+import time
+from bisect import bisect_right
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+from src.cache import split_key
+from src.config import config
+from src.storage import CacheStorage, create_storage
+
+# Upper bounds of age histogram buckets, in seconds
+AGE_BUCKETS = (
+    ('1 hour', 3600),
+    ('6 hours', 6 * 3600),
+    ('1 day', 86400),
+    ('3 days', 3 * 86400),
+    ('7 days', 7 * 86400),
+    ('30 days', 30 * 86400),
+)
+# Timestamps this far in the future are reported by verify
+CLOCK_SKEW = 86400
+
+class CacheStats(NamedTuple):
+    records: int
+    expired: int
+    channels: Counter
+    # Record count per AGE_BUCKETS entry, plus one for older records
+    ages: List[int]
+    size: int
+    read_seconds: float
+
+def open_storage() -> CacheStorage:
+    return create_storage(config.CACHE_BACKEND, Path(config.CACHE_FILE))
+
+def collect_stats(storage: CacheStorage, ttl: int, now: Optional[float] = None) -> CacheStats:
+    now = time.time() if now is None else now
+    started = time.perf_counter()
+    records = expired = 0
+    channels: Counter = Counter()
+    ages = [0] * (len(AGE_BUCKETS) + 1)
+    limits = [limit for _, limit in AGE_BUCKETS]
+    for key, timestamp in storage.iter_entries():
+        records += 1
+        age = now - timestamp
+        if age >= ttl:
+            expired += 1
+        channel_id, _ = split_key(key)
+        channels[channel_id] += 1
+        ages[bisect_right(limits, age)] += 1
+    read_seconds = time.perf_counter() - started
+    size = sum(path.stat().st_size for path in storage.files() if path.exists())
+    return CacheStats(records, expired, channels, ages, size, read_seconds)
+
+def print_stats(storage: CacheStorage, stats: CacheStats, ttl: int):
+    print(f"Cache: {storage.path} ({config.CACHE_BACKEND})")
+    print(f"File size: {stats.size / 1024 / 1024:.1f} MB")
+    print(f"Records: {stats.records} ({stats.expired} expired, TTL {ttl // 3600} hours)")
+    print(f"Read time: {stats.read_seconds:.2f} s")
+    print("Channels:")
+    for channel_id, count in stats.channels.most_common():
+        print(f"  {channel_id:<30} {count}")
+    print("Age:")
+    labels = [f"< {label}" for label, _ in AGE_BUCKETS] + [f">= {AGE_BUCKETS[-1][0]}"]
+    for label, count in zip(labels, stats.ages):
+        print(f"  {label:<12} {count}")
+
+def compact(storage: CacheStorage, ttl: int, now: Optional[float] = None) -> int:
+    """Drop expired and unreadable records, return number removed"""
+    expire_before = (time.time() if now is None else now) - ttl
+    return storage.retain(lambda key, timestamp: timestamp > expire_before)
+
+def resolve_channel(channel: str, cache_dir: Path) -> str:
+    """Peer id used in cache keys of a channel id or username from channels.yaml"""
+    if channel.lstrip('-').isdigit():
+        # Channel ids like -1001234567890 are stored without the -100 prefix
+        return channel[4:] if channel.startswith('-100') else channel.lstrip('-')
+
+    from src.entities import EntityCache
+    # Workers keep the entities of their channels in own directories
+    for entities_file in (cache_dir / "entities.json", *sorted(cache_dir.glob("worker-*/entities.json"))):
+        record = EntityCache(entities_file).entities.get(channel)
+        if record is not None:
+            return str(record['id'])
+    raise ValueError(f"Channel {channel} was not resolved by the parser yet, use its numeric id")
+
+def purge(storage: CacheStorage, channel_id: Optional[str] = None,
+          start: Optional[float] = None, end: Optional[float] = None) -> int:
+    """Remove records of channel (peer id) and/or cached in [start, end), return number removed"""
+    def matches(key: str, timestamp: int) -> bool:
+        # Records of all routes belong to the channel
+        return ((channel_id is None or split_key(key)[0] == channel_id)
+                and (start is None or timestamp >= start)
+                and (end is None or timestamp < end))
+
+    return storage.retain(lambda key, timestamp: not matches(key, timestamp))
+
+def export_entries(storage: CacheStorage, output) -> int:
+    """Write records as JSON lines, the format of the log backend"""
+    count = 0
+    for key, timestamp in storage.iter_entries():
+        output.write(json.dumps({'k': key, 't': timestamp}) + "\n")
+        count += 1
+    return count
+
+def _read_export(source):
+    for line in source:
+        if line.strip():
+            record = json.loads(line)
+            yield record['k'], int(record['t'])
+
+def import_entries(storage: CacheStorage, source) -> int:
+    """Add records exported by export_entries, replacing existing keys"""
+    return storage.merge(_read_export(source))
+
+def verify(storage: CacheStorage, now: Optional[float] = None) -> List[str]:
+    """Problems found in stored file and records, empty if cache is intact"""
+    now = time.time() if now is None else now
+    problems = storage.verify()
+    if problems:
+        return problems
+
+    invalid_keys = future = 0
+    for key, timestamp in storage.iter_entries():
+        try:
+            channel_id, _ = split_key(key)
+            if not channel_id:
+                raise ValueError(key)
+        except (AttributeError, ValueError):
+            invalid_keys += 1
+        if not isinstance(timestamp, int) or timestamp > now + CLOCK_SKEW:
+            future += 1
+    if invalid_keys:
+        problems.append(f"{invalid_keys} records with invalid keys")
+    if future:
+        problems.append(f"{future} records with invalid or future timestamps")
+    return problems
+
+def clear(storage: CacheStorage) -> List[Path]:
+    """Delete all files of the store, return deleted paths"""
+    storage.close()
+    deleted = []
+    for path in storage.files():
+        if path.exists():
+            path.unlink()
+            deleted.append(path)
+    return deleted
+
+def _timestamp(value: str) -> float:
+    """Unix time of ISO date or datetime, naive values are in configured timezone"""
+    import pytz
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = pytz.timezone(config.TIMEZONE).localize(moment)
+    return moment.timestamp()
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(description="Inspect and maintain the message cache")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', help="Records per channel, age histogram, size and read time")
+    commands.add_parser('compact', help="Remove expired records")
+    purge_parser = commands.add_parser('purge', help="Remove records of a channel or time range")
+    purge_parser.add_argument('--channel', help="Channel username or id as in channels.yaml")
+    purge_parser.add_argument('--from', dest='start', type=_timestamp,
+                              help="Records cached at or after this date (ISO format)")
+    purge_parser.add_argument('--to', dest='end', type=_timestamp,
+                              help="Records cached before this date (ISO format)")
+    export_parser = commands.add_parser('export', help="Write records as JSON lines")
+    export_parser.add_argument('file', nargs='?', type=Path, help="Output file (default stdout)")
+    import_parser = commands.add_parser('import', help="Add records from an export")
+    import_parser.add_argument('file', type=Path, help="File written by export")
+    commands.add_parser('verify', help="Check cache file and records")
+    commands.add_parser('clear', help="Delete the cache")
+    return arg_parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.command == 'purge' and args.channel is None and args.start is None and args.end is None:
+        raise SystemExit("purge needs --channel, --from or --to")
+    channel_id = None
+    if args.command == 'purge' and args.channel is not None:
+        try:
+            channel_id = resolve_channel(args.channel, Path(config.CACHE_FILE).parent)
+        except ValueError as e:
+            raise SystemExit(str(e))
+
+    storage = open_storage()
+    try:
+        if args.command == 'stats':
+            print_stats(storage, collect_stats(storage, config.CACHE_TTL), config.CACHE_TTL)
+        elif args.command == 'compact':
+            print(f"Removed {compact(storage, config.CACHE_TTL)} expired records")
+        elif args.command == 'purge':
+            print(f"Removed {purge(storage, channel_id, args.start, args.end)} records")
+        elif args.command == 'export':
+            if args.file:
+                with open(args.file, 'w', encoding='utf-8') as f:
+                    count = export_entries(storage, f)
+                print(f"Exported {count} records to {args.file}")
+            else:
+                export_entries(storage, sys.stdout)
+        elif args.command == 'import':
+            with open(args.file, 'r', encoding='utf-8') as f:
+                print(f"Imported {import_entries(storage, f)} records")
+        elif args.command == 'verify':
+            problems = verify(storage)
+            for problem in problems:
+                print(problem)
+            if problems:
+                raise SystemExit(1)
+            print("Cache is intact")
+        elif args.command == 'clear':
+            deleted = clear(storage)
+            print("Cache cleared successfully" if deleted else f"Cache file not found at: {storage.path}")
+    finally:
+        storage.close()
+
+if __name__ == "__main__":
+    main()
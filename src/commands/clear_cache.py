@@ -1,14 +1,11 @@
-from pathlib import Path
-from src.config import config
+"""Kept for `python -m src.commands.clear_cache`, same as `cache clear`"""
+from src.commands.cache import main as cache_main
 
 def clear_cache():
-    cache_file = Path(config.CACHE_FILE)
-    if not cache_file.exists():
-        print(f"Cache file not found at: {cache_file}")
-        return
+    cache_main(['clear'])
 
-    cache_file.unlink()
-    print("Cache cleared successfully")
+def main(argv=None):
+    cache_main(['clear'] + list(argv or []))
 
 if __name__ == "__main__":
-    clear_cache() 
\ No newline at end of file
+    main()
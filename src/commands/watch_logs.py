@@ -1,26 +1,258 @@
+import argparse
+import ctypes
+import ctypes.util
+import json
 import os
+import re
+import select
+import sys
 import time
 from pathlib import Path
+from typing import Callable, List, Optional
 from src.config import config
 
-def watch_logs():
-    log_file = Path(config.LOG_FILE)
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40, 'CRITICAL': 50}
+_TEXT_LEVEL_RE = re.compile(r' - (DEBUG|INFO|WARNING|ERROR|CRITICAL) - ')
+
+TAIL_BLOCK_SIZE = 64 * 1024
+
+class LineFilter:
+    """Filters text or JSON log lines by level, channel and regex"""
+
+    def __init__(self, level: Optional[str] = None, channel: Optional[str] = None,
+                 pattern: Optional[str] = None):
+        self.min_level = LEVELS[level.upper()] if level else 0
+        self.channel = channel
+        # In text logs the channel is part of the message, match it as a whole word
+        # so that @jobs does not match @jobs_remote
+        self._channel_re = re.compile(rf'(?<!\w){re.escape(channel)}(?!\w)') if channel else None
+        self.pattern = re.compile(pattern) if pattern else None
+
+    def __call__(self, line: str) -> bool:
+        record = None
+        if line.startswith('{'):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+
+        if self.min_level:
+            if record is not None:
+                level = record.get('level')
+            else:
+                match = _TEXT_LEVEL_RE.search(line)
+                level = match.group(1) if match else None
+            # Continuation lines (tracebacks) have no level and are kept
+            if level is not None and LEVELS.get(level, 0) < self.min_level:
+                return False
+
+        if self.channel:
+            if record is not None and 'channel' in record:
+                if record['channel'] != self.channel:
+                    return False
+            elif not self._channel_re.search(line):
+                return False
+
+        if self.pattern and not self.pattern.search(line):
+            return False
+        return True
+
+def tail_lines(path: Path, count: int, keep: Optional[Callable[[str], bool]] = None) -> List[str]:
+    """Return last `count` lines of file accepted by keep(), reading it backwards in blocks"""
+    if count <= 0:
+        return []
+    found: List[str] = []
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        # Start of the earliest line read so far, possibly incomplete
+        head = b''
+        while position > 0 and len(found) < count:
+            size = min(TAIL_BLOCK_SIZE, position)
+            position -= size
+            f.seek(position)
+            data = f.read(size) + head
+            if position > 0:
+                head_end = data.find(b'\n') + 1
+                if not head_end:
+                    head = data
+                    continue
+                head, data = data[:head_end], data[head_end:]
+            else:
+                head = b''
+            lines = data.decode('utf-8', errors='replace').splitlines(keepends=True)
+            for line in reversed(lines):
+                if keep is None or keep(line):
+                    found.append(line)
+                    if len(found) == count:
+                        break
+    return found[::-1]
+
+class PollingWaiter:
+    """Sleeps with exponential backoff while the file is idle"""
+
+    def __init__(self, min_delay: float = 0.05, max_delay: float = 2.0):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay = min_delay
+
+    def wait(self):
+        time.sleep(self.delay)
+        self.delay = min(self.delay * 2, self.max_delay)
+
+    def reset(self):
+        self.delay = self.min_delay
+
+    def close(self):
+        pass
+
+class InotifyWaiter:
+    """Blocks until something changes in the log directory (Linux only)"""
+
+    IN_MODIFY = 0x002
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = 0o2000000
+
+    # Safety net in case an event is missed (e.g. on network filesystems)
+    TIMEOUT = 5.0
+
+    def __init__(self, directory: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = (self.IN_MODIFY | self.IN_MOVED_FROM | self.IN_MOVED_TO
+                | self.IN_CREATE | self.IN_DELETE)
+        if libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def wait(self):
+        ready, _, _ = select.select([self.fd], [], [], self.TIMEOUT)
+        if ready:
+            # Events are only a wake-up signal, drain them
+            try:
+                while os.read(self.fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def reset(self):
+        pass
+
+    def close(self):
+        os.close(self.fd)
+
+def create_waiter(path: Path):
+    """Use inotify where available, fall back to adaptive polling"""
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWaiter(path.parent)
+        except (OSError, AttributeError):
+            pass
+    return PollingWaiter()
+
+class LogFollower:
+    """Follows log file across rotations, yielding complete lines"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+        self._inode = None
+        self._partial = ''
+
+    def open(self, at_end: bool = True):
+        self._file = open(self.path, 'r', encoding='utf-8', errors='replace')
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        if at_end:
+            self._file.seek(0, os.SEEK_END)
+
+    def _read_lines(self) -> List[str]:
+        data = self._partial + self._file.read()
+        lines = data.splitlines(keepends=True)
+        # Keep unfinished last line until the writer completes it
+        if lines and not lines[-1].endswith('\n'):
+            self._partial = lines.pop()
+        else:
+            self._partial = ''
+        return lines
+
+    def _rotated(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if stat.st_ino != self._inode:
+            return True
+        # Truncated in place
+        return stat.st_size < self._file.tell()
+
+    def read_available(self) -> List[str]:
+        """Return lines written since last call, reopening rotated file"""
+        if self._file is None:
+            if not self.path.exists():
+                return []
+            self.open(at_end=False)
+        lines = self._read_lines()
+        if self._rotated():
+            # Finish old file, then continue from start of the new one
+            lines += self._read_lines()
+            if self._partial:
+                lines.append(self._partial)
+                self._partial = ''
+            self._file.close()
+            self.open(at_end=False)
+            lines += self._read_lines()
+        return lines
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+def watch_logs(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Follow parser log in real time")
+    arg_parser.add_argument('-n', '--lines', type=int, default=0,
+                            help="Show last N matching lines before following")
+    arg_parser.add_argument('--level', choices=list(LEVELS), type=str.upper,
+                            help="Minimal level to show")
+    arg_parser.add_argument('--channel', help="Show only lines of this channel")
+    arg_parser.add_argument('--grep', help="Show only lines matching regex")
+    arg_parser.add_argument('--file', type=Path, help="Log file (default from config)")
+    args = arg_parser.parse_args(argv)
+
+    log_file = args.file or Path(config.LOG_FILE)
     if not log_file.exists():
         print(f"Log file not found at: {log_file}")
         return
 
+    line_filter = LineFilter(args.level, args.channel, args.grep)
+    if args.lines:
+        for line in tail_lines(log_file, args.lines, line_filter):
+            print(line, end='')
+
     print("Watching logs in real-time. Press Ctrl+C to stop.")
+    follower = LogFollower(log_file)
+    follower.open(at_end=True)
+    waiter = create_waiter(log_file)
     try:
-        with open(log_file, 'r') as f:
-            # Go to the end of file
-            f.seek(0, 2)
-            while True:
-                line = f.readline()
-                if line:
-                    print(line, end='')
-                time.sleep(0.1)
+        while True:
+            lines = follower.read_available()
+            if lines:
+                waiter.reset()
+                for line in lines:
+                    if line_filter(line):
+                        print(line, end='')
+                sys.stdout.flush()
+            else:
+                waiter.wait()
     except KeyboardInterrupt:
         print("\nStopped watching logs")
+    finally:
+        follower.close()
+        waiter.close()
 
 if __name__ == "__main__":
-    watch_logs() 
\ No newline at end of file
+    watch_logs()
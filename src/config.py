@@ -1,11 +1,12 @@
+import functools
+import logging
 import os
+import re
+import time
 from pathlib import Path
-from typing import Dict, List
-import yaml
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple, Union
+from src.matcher import KeywordMatcher, build_keyword_matcher
+from src.scoring import TermScorer, build_scorer, scoring_available
 
 # Base paths
 BASE_DIR = Path(__file__).parent.parent
@@ -14,75 +15,517 @@ DATA_DIR = BASE_DIR / "data"
 CACHE_DIR = DATA_DIR / "cache"
 LOGS_DIR = BASE_DIR / "logs"
 
-# Create required directories
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
-LOGS_DIR.mkdir(parents=True, exist_ok=True)
+# Minimal interval between checks of channels.yaml modification time
+RELOAD_CHECK_INTERVAL = 5.0
+
+CACHE_BACKENDS = ('json', 'log', 'sqlite', 'binary')
+PARSER_MODES = ('poll', 'events')
+LOG_FORMATS = ('text', 'json')
+DIGEST_GROUPINGS = ('channel', 'window')
+# Lower thresholds probe more than one bit of each band, which makes
+# near-duplicate lookups slow (3.5 ms per message with 300k fingerprints at
+# 0.85, 0.45 ms at 0.9) and matches unrelated 64-bit fingerprints
+MIN_DEDUP_SIMILARITY = 0.9
+# Optional per-channel keys of job_channels entries, see src.scheduler
+CHANNEL_SCHEDULE_OVERRIDES = ('interval_minutes', 'min_minutes', 'max_minutes')
+# Route names are part of cache keys and file names
+ROUTE_NAME = re.compile(r'[A-Za-z0-9_-]+')
+
+class ConfigError(ValueError):
+    """Raised when channels.yaml is invalid"""
+
+class Settings(NamedTuple):
+    cache_file: Path
+    cache_size: int
+    cache_ttl: int
+    cache_backend: str
+    days_to_parse: int
+    max_retries: int
+    request_delay: float
+    max_concurrent_channels: int
+    workers: int
+    timezone: str
+    log_level: str
+    log_file: Path
+    log_format: str
+    pause_minutes: int
+    schedule_adaptive: bool
+    schedule_min_minutes: float
+    schedule_max_minutes: float
+    mode: str
+    listen_edits: bool
+    catchup_minutes: int
+    dedup_enabled: bool
+    dedup_similarity: float
+    dedup_ttl: int
+    send_rate_per_minute: float
+    send_burst: int
+    digest_enabled: bool
+    digest_group_by: str
+    digest_flush_interval: float
+    digest_max_latency: float
+    metrics_port: Optional[int]
+    metrics_host: str
+    profile_enabled: bool
+    profile_cycles: int
+    profile_seconds: float
+    profile_lag_interval: float
+
+class Route(NamedTuple):
+    """Additional feed with own target channel and keywords"""
+    name: str
+    target: Union[int, str]
+    keywords: Dict[str, List[str]]
+    # Channel ids (as in job_channels, as strings) the route applies to, all if None
+    channels: Optional[FrozenSet[str]] = None
+
+class ConfigSnapshot(NamedTuple):
+    """Immutable, validated view of channels.yaml"""
+    settings: Settings
+    channels: Tuple[Dict, ...]
+    keywords: Dict[str, List[str]]
+    # Matches keywords and the keywords of all routes in one pass
+    matcher: KeywordMatcher
+    # Only set when keywords.scoring is enabled
+    scorer: Optional[TermScorer] = None
+    routes: Tuple[Route, ...] = ()
+
+def _require(value, expected, name: str):
+    if not isinstance(value, expected) or isinstance(value, bool) and expected is not bool:
+        raise ConfigError(f"{name} has invalid value: {value!r}")
+    return value
+
+def _positive(value, name: str):
+    _require(value, (int, float), name)
+    if value < 0:
+        raise ConfigError(f"{name} must not be negative: {value!r}")
+    return value
+
+def _parse_settings(raw: Dict) -> Settings:
+    """Validate settings section and convert it to typed Settings"""
+    import pytz
+
+    settings = _require(raw.get('settings'), dict, 'settings')
+    cache = _require(settings.get('cache'), dict, 'settings.cache')
+    parser = _require(settings.get('parser'), dict, 'settings.parser')
+    dedup = _require(settings.get('dedup', {}), dict, 'settings.dedup')
+    sender = _require(settings.get('sender', {}), dict, 'settings.sender')
+    metrics = _require(settings.get('metrics', {}), dict, 'settings.metrics')
+    digest = _require(sender.get('digest', {}), dict, 'settings.sender.digest')
+    profiling = _require(settings.get('profiling', {}), dict, 'settings.profiling')
+    schedule = _require(parser.get('schedule', {}), dict, 'settings.parser.schedule')
+
+    try:
+        timezone = parser['timezone']
+        pytz.timezone(timezone)
+        cache_ttl = _positive(cache['ttl'], 'settings.cache.ttl')
+        request_delay = _positive(parser['request_delay'], 'settings.parser.request_delay')
+        # Without explicit rate keep one message per request_delay
+        default_rate = 60 / request_delay if request_delay else 60
+        result = Settings(
+            cache_file=Path(_require(cache['file'], str, 'settings.cache.file')),
+            cache_size=_positive(cache['size'], 'settings.cache.size'),
+            cache_ttl=cache_ttl,
+            cache_backend=cache.get('backend', 'log'),
+            days_to_parse=_positive(parser['days_to_parse'], 'settings.parser.days_to_parse'),
+            max_retries=_positive(parser['max_retries'], 'settings.parser.max_retries'),
+            request_delay=request_delay,
+            max_concurrent_channels=_positive(parser.get('max_concurrent_channels', 1),
+                                              'settings.parser.max_concurrent_channels'),
+            workers=_require(parser.get('workers', 1), int, 'settings.parser.workers'),
+            timezone=timezone,
+            log_level=_require(parser['log_level'], str, 'settings.parser.log_level').upper(),
+            log_file=Path(_require(parser['log_file'], str, 'settings.parser.log_file')),
+            log_format=parser.get('log_format', 'text'),
+            pause_minutes=_positive(parser['pause_minutes'], 'settings.parser.pause_minutes'),
+            schedule_adaptive=_require(schedule.get('adaptive', False), bool,
+                                       'settings.parser.schedule.adaptive'),
+            schedule_min_minutes=_positive(schedule.get('min_minutes', 2),
+                                           'settings.parser.schedule.min_minutes'),
+            schedule_max_minutes=_positive(schedule.get('max_minutes', 360),
+                                           'settings.parser.schedule.max_minutes'),
+            mode=parser.get('mode', 'poll'),
+            listen_edits=_require(parser.get('listen_edits', False), bool,
+                                  'settings.parser.listen_edits'),
+            catchup_minutes=_positive(parser.get('catchup_minutes', 360),
+                                      'settings.parser.catchup_minutes'),
+            dedup_enabled=_require(dedup.get('enabled', False), bool, 'settings.dedup.enabled'),
+            dedup_similarity=_positive(dedup.get('similarity', 0.95), 'settings.dedup.similarity'),
+            dedup_ttl=_positive(dedup.get('ttl', cache_ttl), 'settings.dedup.ttl'),
+            send_rate_per_minute=_positive(sender.get('rate_per_minute', default_rate),
+                                           'settings.sender.rate_per_minute'),
+            send_burst=_positive(sender.get('burst', 1), 'settings.sender.burst'),
+            digest_enabled=_require(digest.get('enabled', False), bool,
+                                    'settings.sender.digest.enabled'),
+            digest_group_by=digest.get('group_by', 'channel'),
+            digest_flush_interval=_positive(digest.get('flush_interval', 120),
+                                            'settings.sender.digest.flush_interval'),
+            digest_max_latency=_positive(digest.get('max_latency', 900),
+                                         'settings.sender.digest.max_latency'),
+            metrics_port=metrics.get('port'),
+            metrics_host=_require(metrics.get('host', '127.0.0.1'), str, 'settings.metrics.host'),
+            profile_enabled=_require(profiling.get('enabled', False), bool,
+                                     'settings.profiling.enabled'),
+            profile_cycles=_require(profiling.get('cycles', 1), int, 'settings.profiling.cycles'),
+            profile_seconds=_positive(profiling.get('seconds', 0), 'settings.profiling.seconds'),
+            profile_lag_interval=_positive(profiling.get('lag_interval', 0.05),
+                                           'settings.profiling.lag_interval'),
+        )
+    except KeyError as e:
+        raise ConfigError(f"Missing setting: {e.args[0]}")
+    except pytz.UnknownTimeZoneError as e:
+        raise ConfigError(f"Unknown timezone: {e}")
+
+    if result.cache_backend not in CACHE_BACKENDS:
+        raise ConfigError(f"Unknown cache backend: {result.cache_backend}")
+    if result.log_format not in LOG_FORMATS:
+        raise ConfigError(f"Unknown log format: {result.log_format}")
+    if result.digest_group_by not in DIGEST_GROUPINGS:
+        raise ConfigError(f"Unknown digest grouping: {result.digest_group_by}")
+    if result.mode not in PARSER_MODES:
+        raise ConfigError(f"Unknown parser mode: {result.mode}")
+    if result.workers < 1:
+        raise ConfigError("settings.parser.workers must be at least 1")
+    if result.workers > 1 and result.cache_backend != 'sqlite':
+        # Workers share cache with the sender process, only SQLite is safe for that
+        raise ConfigError("settings.parser.workers > 1 requires cache backend sqlite")
+    if result.metrics_port is not None:
+        _require(result.metrics_port, int, 'settings.metrics.port')
+    if result.schedule_min_minutes > result.schedule_max_minutes:
+        raise ConfigError("settings.parser.schedule.min_minutes must not exceed max_minutes")
+    if result.send_rate_per_minute <= 0:
+        raise ConfigError("settings.sender.rate_per_minute must be positive")
+    if result.profile_cycles < 1:
+        raise ConfigError("settings.profiling.cycles must be at least 1")
+    if result.profile_lag_interval <= 0:
+        raise ConfigError("settings.profiling.lag_interval must be positive")
+    if not MIN_DEDUP_SIMILARITY <= result.dedup_similarity <= 1:
+        raise ConfigError(f"settings.dedup.similarity must be between {MIN_DEDUP_SIMILARITY} and 1")
+    return result
+
+def _parse_keyword_lists(keywords: Dict, name: str):
+    for group in ('positions', 'stop_words'):
+        words = _require(keywords.get(group), list, f'{name}.{group}')
+        for word in words:
+            _require(word, str, f'{name}.{group}')
+
+def _parse_routes(raw: Dict) -> Tuple[Route, ...]:
+    """Validate routes section, each route needs name, target and keywords"""
+    routes = []
+    for index, entry in enumerate(_require(raw.get('routes', []), list, 'routes')):
+        _require(entry, dict, f'routes[{index}]')
+        name = _require(entry.get('name'), str, f'routes[{index}].name')
+        if not ROUTE_NAME.fullmatch(name):
+            raise ConfigError(f"Route name may only contain letters, digits, '_' and '-': {name!r}")
+        if any(route.name == name for route in routes):
+            raise ConfigError(f"Duplicate route name: {name}")
+        target = _require(entry.get('target'), (int, str), f'routes.{name}.target')
+        if isinstance(target, str) and target.lstrip('-').isdigit():
+            target = int(target)
+        keywords = dict(_require(entry.get('keywords'), dict, f'routes.{name}.keywords'))
+        keywords.setdefault('stop_words', [])
+        _parse_keyword_lists(keywords, f'routes.{name}.keywords')
+        channels = entry.get('channels')
+        if channels is not None:
+            # Quoted and unquoted numeric ids name the same channel
+            channels = frozenset(str(_require(channel, (int, str), f'routes.{name}.channels'))
+                                 for channel in _require(channels, list, f'routes.{name}.channels'))
+        routes.append(Route(name, target, keywords, channels))
+    return tuple(routes)
+
+def build_snapshot(raw: Dict) -> ConfigSnapshot:
+    """Validate raw YAML data and precompile everything derived from it"""
+    _require(raw, dict, 'channels.yaml')
+    settings = _parse_settings(raw)
+
+    channels = _require(_require(raw.get('channels'), dict, 'channels').get('job_channels'),
+                        list, 'channels.job_channels')
+    for channel in channels:
+        if not isinstance(channel, dict) or 'id' not in channel:
+            raise ConfigError(f"Channel entry without id: {channel!r}")
+        for name in CHANNEL_SCHEDULE_OVERRIDES:
+            if name in channel:
+                _positive(channel[name], f"channels.job_channels[{channel['id']}].{name}")
+
+    keywords = _require(raw.get('keywords'), dict, 'keywords')
+    _parse_keyword_lists(keywords, 'keywords')
+    routes = _parse_routes(raw)
+
+    scoring = _require(keywords.get('scoring', {}), dict, 'keywords.scoring')
+    for name in ('threshold', 'bias', 'stop_weight'):
+        if name in scoring:
+            _require(scoring[name], (int, float), f'keywords.scoring.{name}')
+    for term, weight in _require(scoring.get('weights', {}), dict, 'keywords.scoring.weights').items():
+        _require(term, str, 'keywords.scoring.weights')
+        _require(weight, (int, float), f'keywords.scoring.weights.{term}')
+    scorer = None
+    if _require(scoring.get('enabled', False), bool, 'keywords.scoring.enabled'):
+        if not scoring_available():
+            raise ConfigError("keywords.scoring requires numpy (pip install numpy)")
+        scorer = build_scorer(keywords)
+
+    return ConfigSnapshot(
+        settings=settings,
+        channels=tuple(channels),
+        keywords=keywords,
+        matcher=build_keyword_matcher(keywords, {route.name: route.keywords for route in routes}),
+        scorer=scorer,
+        routes=routes,
+    )
+
+@functools.lru_cache(maxsize=None)
+def _load_env():
+    """Load .env once, on first access to credentials"""
+    from dotenv import load_dotenv
+    load_dotenv()
 
 class Config:
-    def __init__(self):
-        self._config = self._load_config()
-        
+    """Configuration read from channels.yaml on first use.
+
+    Importing the module loads nothing, so commands that do not need the
+    configuration (or credentials) start without parsing YAML.
+    """
+
+    def __init__(self, config_file: Optional[Path] = None):
+        self.config_file = config_file or CONFIG_DIR / "channels.yaml"
+    
+    def __getattr__(self, name):
+        # Only called while the attribute is not set, i.e. before first use.
+        # Reload checks start on their own, so a snapshot set by tests is
+        # kept until channels.yaml actually changes
+        if name in ('_mtime', '_next_check'):
+            self._start_reload_checks()
+        elif name == '_snapshot':
+            if '_mtime' not in self.__dict__:
+                # Modification time is taken before loading, so changes made meanwhile are reloaded
+                self._start_reload_checks()
+            self._snapshot = build_snapshot(self._load_config())
+        else:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        return getattr(self, name)
+    
+    def _start_reload_checks(self):
+        self._mtime = self._get_mtime()
+        self._next_check = time.monotonic() + RELOAD_CHECK_INTERVAL
+    
     def _load_config(self) -> Dict:
         """Loads configuration from YAML file"""
-        config_file = CONFIG_DIR / "channels.yaml"
-        with open(config_file, 'r', encoding='utf-8') as f:
+        import yaml
+        with open(self.config_file, 'r', encoding='utf-8') as f:
             return yaml.safe_load(f)
     
-    # Telegram credentials from .env
-    API_ID: int = int(os.getenv("TELEGRAM_API_ID"))
-    API_HASH: str = os.getenv("TELEGRAM_API_HASH")
-    CHANNEL_ID: int = int(os.getenv("CHANNEL_ID"))
+    def _get_mtime(self) -> float:
+        try:
+            return self.config_file.stat().st_mtime
+        except OSError:
+            return 0.0
+    
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        """Current configuration snapshot"""
+        return self._snapshot
+    
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """Reload channels.yaml if it was modified, return True if reloaded.
+    
+        An invalid file is reported and the previous snapshot is kept.
+        """
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        self._next_check = now + RELOAD_CHECK_INTERVAL
+    
+        mtime = self._get_mtime()
+        if not force and mtime == self._mtime:
+            return False
+        self._mtime = mtime
+    
+        import yaml
+        try:
+            snapshot = build_snapshot(self._load_config())
+        except (OSError, yaml.YAMLError, ConfigError) as e:
+            logging.getLogger("career_scout").error(
+                f"Invalid {self.config_file.name}, keeping previous configuration: {e}")
+            return False
+        # Single reference swap, readers see either old or new snapshot
+        self._snapshot = snapshot
+        return True
+    
+    # Telegram credentials from .env, read on access so that
+    # offline tools (replay, tests) work without them
+    @property
+    def API_ID(self) -> int:
+        _load_env()
+        return int(os.getenv("TELEGRAM_API_ID"))
+    
+    @property
+    def API_HASH(self) -> str:
+        _load_env()
+        return os.getenv("TELEGRAM_API_HASH")
+    
+    @property
+    def CHANNEL_ID(self) -> int:
+        _load_env()
+        return int(os.getenv("CHANNEL_ID"))
     
     # Cache settings from YAML
     @property
     def CACHE_FILE(self) -> Path:
-        return Path(self._config['settings']['cache']['file'])
+        return self._snapshot.settings.cache_file
     
     @property
     def CACHE_SIZE(self) -> int:
-        return self._config['settings']['cache']['size']
+        return self._snapshot.settings.cache_size
     
     @property
     def CACHE_TTL(self) -> int:
-        return self._config['settings']['cache']['ttl']
+        return self._snapshot.settings.cache_ttl
+    
+    @property
+    def CACHE_BACKEND(self) -> str:
+        return self._snapshot.settings.cache_backend
     
     # Parser settings from YAML
     @property
     def DAYS_TO_PARSE(self) -> int:
-        return self._config['settings']['parser']['days_to_parse']
+        return self._snapshot.settings.days_to_parse
     
     @property
     def MAX_RETRIES(self) -> int:
-        return self._config['settings']['parser']['max_retries']
+        return self._snapshot.settings.max_retries
     
     @property
     def REQUEST_DELAY(self) -> float:
-        return self._config['settings']['parser']['request_delay']
+        return self._snapshot.settings.request_delay
+    
+    @property
+    def MAX_CONCURRENT_CHANNELS(self) -> int:
+        return self._snapshot.settings.max_concurrent_channels
+    
+    @property
+    def WORKERS(self) -> int:
+        return self._snapshot.settings.workers
     
     @property
     def TIMEZONE(self) -> str:
-        return self._config['settings']['parser']['timezone']
+        return self._snapshot.settings.timezone
     
     @property
     def LOG_LEVEL(self) -> str:
-        return self._config['settings']['parser']['log_level']
+        return self._snapshot.settings.log_level
     
     @property
     def LOG_FILE(self) -> Path:
-        return Path(self._config['settings']['parser']['log_file'])
+        return self._snapshot.settings.log_file
+    
+    @property
+    def LOG_FORMAT(self) -> str:
+        return self._snapshot.settings.log_format
+    
+    # Near-duplicate suppression settings from YAML
+    @property
+    def DEDUP_ENABLED(self) -> bool:
+        return self._snapshot.settings.dedup_enabled
+    
+    @property
+    def DEDUP_SIMILARITY(self) -> float:
+        return self._snapshot.settings.dedup_similarity
+    
+    @property
+    def DEDUP_TTL(self) -> int:
+        return self._snapshot.settings.dedup_ttl
+    
+    # Sender settings from YAML
+    @property
+    def SEND_RATE_PER_MINUTE(self) -> float:
+        return self._snapshot.settings.send_rate_per_minute
+    
+    @property
+    def SEND_BURST(self) -> int:
+        return self._snapshot.settings.send_burst
+    
+    @property
+    def DIGEST_ENABLED(self) -> bool:
+        return self._snapshot.settings.digest_enabled
+    
+    @property
+    def DIGEST_GROUP_BY(self) -> str:
+        return self._snapshot.settings.digest_group_by
+    
+    @property
+    def DIGEST_FLUSH_INTERVAL(self) -> float:
+        return self._snapshot.settings.digest_flush_interval
+    
+    @property
+    def DIGEST_MAX_LATENCY(self) -> float:
+        return self._snapshot.settings.digest_max_latency
+    
+    # Metrics endpoint settings from YAML
+    @property
+    def METRICS_PORT(self) -> Optional[int]:
+        return self._snapshot.settings.metrics_port
+    
+    @property
+    def METRICS_HOST(self) -> str:
+        return self._snapshot.settings.metrics_host
+    
+    # Profiling settings from YAML
+    @property
+    def PROFILE_ENABLED(self) -> bool:
+        return self._snapshot.settings.profile_enabled
+    
+    @property
+    def PROFILE_CYCLES(self) -> int:
+        return self._snapshot.settings.profile_cycles
+    
+    @property
+    def PROFILE_SECONDS(self) -> float:
+        return self._snapshot.settings.profile_seconds
+    
+    @property
+    def PROFILE_LAG_INTERVAL(self) -> float:
+        return self._snapshot.settings.profile_lag_interval
     
     # Channel and keyword settings
     def get_channels(self) -> List[Dict]:
         """Returns list of channels"""
-        return self._config['channels']['job_channels']
+        return list(self._snapshot.channels)
     
     def get_keywords(self) -> Dict[str, List[str]]:
         """Returns keyword settings"""
-        return self._config['keywords']
+        return self._snapshot.keywords
+    
+    def get_routes(self) -> List[Route]:
+        """Returns additional feeds"""
+        return list(self._snapshot.routes)
     
     @property
     def PAUSE_MINUTES(self) -> int:
-        return self._config['settings']['parser']['pause_minutes']
+        return self._snapshot.settings.pause_minutes
+    
+    @property
+    def SCHEDULE_ADAPTIVE(self) -> bool:
+        return self._snapshot.settings.schedule_adaptive
+    
+    @property
+    def SCHEDULE_MIN_MINUTES(self) -> float:
+        return self._snapshot.settings.schedule_min_minutes
+    
+    @property
+    def SCHEDULE_MAX_MINUTES(self) -> float:
+        return self._snapshot.settings.schedule_max_minutes
+    
+    @property
+    def MODE(self) -> str:
+        return self._snapshot.settings.mode
+    
+    @property
+    def LISTEN_EDITS(self) -> bool:
+        return self._snapshot.settings.listen_edits
+    
+    @property
+    def CATCHUP_MINUTES(self) -> int:
+        return self._snapshot.settings.catchup_minutes
 
 # Create global config instance
-config = Config() 
\ No newline at end of file
+config = Config()
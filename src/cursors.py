@@ -0,0 +1,58 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+from src.config import config
+
+class ChannelCursors:
+    """Per-channel high-water-mark message ids, stored next to the cache file"""
+
+    def __init__(self, cursor_file: Optional[Path] = None):
+        self.cursor_file = cursor_file or config.CACHE_FILE.parent / "cursors.json"
+        self.cursors: Dict[str, int] = self._load_cursors()
+        self._dirty = False
+
+    def _load_cursors(self) -> Dict[str, int]:
+        """Load cursors from file, dropping invalid entries"""
+        if not self.cursor_file.exists():
+            return {}
+        try:
+            with open(self.cursor_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return {
+            str(k): v for k, v in data.items()
+            if isinstance(v, int) and not isinstance(v, bool) and v > 0
+        }
+
+    def get(self, channel_id) -> Optional[int]:
+        """Return last processed message id for channel, if known"""
+        return self.cursors.get(str(channel_id))
+
+    def update(self, channel_id, message_id: int):
+        """Advance channel cursor if message is newer"""
+        key = str(channel_id)
+        if message_id > self.cursors.get(key, 0):
+            self.cursors[key] = message_id
+            self._dirty = True
+
+    def save(self):
+        """Atomically write cursors to file if changed.
+
+        Cursors saved meanwhile by another process (e.g. a backfill) are
+        merged in, so neither overwrites the other with older values.
+        """
+        if not self._dirty:
+            return
+        for key, message_id in self._load_cursors().items():
+            if message_id > self.cursors.get(key, 0):
+                self.cursors[key] = message_id
+        self.cursor_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.cursor_file.with_name(self.cursor_file.name + ".tmp")
+        with open(tmp_file, 'w') as f:
+            json.dump(self.cursors, f)
+        os.replace(tmp_file, self.cursor_file)
+        self._dirty = False
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import re
+import time
+from array import array
+from collections import OrderedDict
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from src.config import config
+from src.storage import MIN_COMPACTION_RECORDS
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 3
+# Bands of 16 bits keep buckets sparse, larger distances probe neighbouring
+# buckets instead of using more, narrower bands
+MAX_BANDS = 4
+
+_TOKEN_RE = re.compile(r'\w+')
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of normalized word shingles"""
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) > SHINGLE_SIZE:
+        shingles = {' '.join(tokens[i:i + SHINGLE_SIZE])
+                    for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    else:
+        shingles = {' '.join(tokens)}
+
+    hashes = [
+        format(int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), 'big'), '064b')
+        for s in shingles
+    ]
+    # Column-wise bit majority, computed over bit strings to avoid a Python loop per bit
+    half = len(hashes) / 2
+    bits = ''.join('1' if column.count('1') > half else '0' for column in zip(*hashes))
+    return int(bits, 2)
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+class NearDuplicateIndex:
+    """Recent message fingerprints with fast near-duplicate lookup.
+
+    Fingerprints are split into up to MAX_BANDS bands: by the pigeonhole
+    principle two fingerprints within max_distance bits differ in at most
+    max_distance // bands bits of some band, so only buckets within that
+    many bits of the fingerprint's bands are probed and compared.
+
+    New fingerprints are appended to the index file, which is rewritten
+    only once it holds mostly expired records.
+    """
+
+    def __init__(self, index_file: Optional[Path] = None,
+                 similarity: Optional[float] = None,
+                 ttl: Optional[int] = None):
+        self.index_file = index_file or config.CACHE_FILE.parent / "fingerprints.bin"
+        similarity = config.DEDUP_SIMILARITY if similarity is None else similarity
+        self.ttl = config.DEDUP_TTL if ttl is None else ttl
+        self.max_distance = int(round((1 - similarity) * FINGERPRINT_BITS))
+        self._bands = self._band_masks(min(self.max_distance + 1, MAX_BANDS))
+        radius = self.max_distance // len(self._bands)
+        self._probes = [self._probe_masks(mask.bit_length(), radius) for _, mask in self._bands]
+
+        # fingerprint -> timestamp, in insertion order for expiry
+        self.fingerprints: OrderedDict = OrderedDict()
+        self._buckets: List[Dict[int, Set[int]]] = [{} for _ in self._bands]
+        # Records added since last save, and number of records in the file
+        self._pending = array('Q')
+        self._stored = 0
+        self._load()
+
+    @staticmethod
+    def _band_masks(count: int):
+        """Split fingerprint bits into `count` (shift, mask) bands"""
+        width, extra = divmod(FINGERPRINT_BITS, count)
+        bands, shift = [], 0
+        for i in range(count):
+            size = width + (1 if i < extra else 0)
+            bands.append((shift, (1 << size) - 1))
+            shift += size
+        return bands
+
+    @staticmethod
+    def _probe_masks(width: int, radius: int) -> List[int]:
+        """XOR masks of all band values within `radius` bits, nearest first"""
+        return [sum(1 << bit for bit in bits)
+                for distance in range(radius + 1)
+                for bits in combinations(range(width), distance)]
+
+    def _load(self):
+        if not self.index_file.exists():
+            return
+        data = array('Q')
+        record_size = 2 * data.itemsize
+        try:
+            with open(self.index_file, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return
+        torn = len(raw) % record_size
+        if torn:
+            # Drop record torn by a crash during append, so new ones stay aligned
+            raw = raw[:-torn]
+            os.truncate(self.index_file, len(raw))
+        data.frombytes(raw)
+        for i in range(0, len(data) - 1, 2):
+            self._insert(data[i], data[i + 1])
+        self._stored = len(data) // 2
+        self._expire()
+
+    def save(self):
+        """Append new fingerprints to file, rewrite it once mostly expired"""
+        self._expire()
+        records = self._stored + len(self._pending) // 2
+        compact = records >= MIN_COMPACTION_RECORDS and records > 2 * len(self.fingerprints)
+        if not compact and not self._pending:
+            return
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        if compact:
+            data = array('Q')
+            for fingerprint, timestamp in self.fingerprints.items():
+                data.append(fingerprint)
+                data.append(timestamp)
+            tmp_file = self.index_file.with_name(self.index_file.name + ".tmp")
+            with open(tmp_file, 'wb') as f:
+                data.tofile(f)
+            os.replace(tmp_file, self.index_file)
+            self._stored = len(self.fingerprints)
+        elif self._pending:
+            with open(self.index_file, 'ab') as f:
+                self._pending.tofile(f)
+            self._stored += len(self._pending) // 2
+        self._pending = array('Q')
+
+    def _insert(self, fingerprint: int, timestamp: int):
+        self.fingerprints.pop(fingerprint, None)
+        self.fingerprints[fingerprint] = timestamp
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            buckets.setdefault((fingerprint >> shift) & mask, set()).add(fingerprint)
+
+    def _remove(self, fingerprint: int):
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            band = (fingerprint >> shift) & mask
+            bucket = buckets.get(band)
+            if bucket is not None:
+                bucket.discard(fingerprint)
+                if not bucket:
+                    del buckets[band]
+
+    def _expire(self):
+        """Drop fingerprints older than TTL from the front"""
+        expire_before = time.time() - self.ttl
+        while self.fingerprints and next(iter(self.fingerprints.values())) <= expire_before:
+            fingerprint, _ = self.fingerprints.popitem(last=False)
+            self._remove(fingerprint)
+
+    def contains(self, fingerprint: int) -> bool:
+        """Check if a similar fingerprint was seen within TTL"""
+        self._expire()
+        for (shift, mask), probes, buckets in zip(self._bands, self._probes, self._buckets):
+            band = (fingerprint >> shift) & mask
+            for probe in probes:
+                for candidate in buckets.get(band ^ probe, ()):
+                    if hamming_distance(fingerprint, candidate) <= self.max_distance:
+                        return True
+        return False
+
+    def add(self, fingerprint: int):
+        """Remember fingerprint with current timestamp"""
+        timestamp = int(time.time())
+        self._insert(fingerprint, timestamp)
+        self._pending.append(fingerprint)
+        self._pending.append(timestamp)
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
@@ -0,0 +1,59 @@
+import html
+from collections import OrderedDict
+from typing import List, NamedTuple
+from src.outbox import OutboxItem
+
+# Telegram limit for message text, in UTF-16 code units
+MESSAGE_LIMIT = 4096
+
+ENTRY_SEPARATOR = "\n\n"
+
+class DigestPart(NamedTuple):
+    text: str
+    items: List[OutboxItem]
+
+def telegram_length(text: str) -> int:
+    """Length as counted by Telegram, where emoji outside the BMP count twice"""
+    return len(text.encode('utf-16-le')) // 2
+
+def _header(channel: str, group_by: str) -> str:
+    if group_by == 'channel':
+        return f"🔍 <b>New vacancies in {html.escape(channel)}</b>"
+    return "🔍 <b>New vacancies</b>"
+
+def build_digests(items: List[OutboxItem], group_by: str = 'channel') -> List[DigestPart]:
+    """Pack digest entries of items into as few messages as the length limit allows.
+
+    With `group_by` 'channel' every source channel gets its own messages,
+    with 'window' all items are combined. Items of different routes never
+    share a message. Messages are only split between entries, in queue order.
+    """
+    groups: OrderedDict = OrderedDict()
+    for item in items:
+        channel = item.payload.get('channel', str(item.channel_id)) if group_by == 'channel' else ''
+        groups.setdefault((item.payload.get('route'), channel), []).append(item)
+
+    parts: List[DigestPart] = []
+    for (_, channel), group in groups.items():
+        header = _header(channel, group_by)
+        text, length, part_items = header, telegram_length(header), []
+        for item in group:
+            entry = ENTRY_SEPARATOR + item.payload['entry']
+            entry_length = telegram_length(entry)
+            if part_items and length + entry_length > MESSAGE_LIMIT:
+                parts.append(DigestPart(text, part_items))
+                text, length, part_items = header, telegram_length(header), []
+            text += entry
+            length += entry_length
+            part_items.append(item)
+        parts.append(DigestPart(text, part_items))
+    return parts
+
+def is_full(items: List[OutboxItem]) -> bool:
+    """Check if entries already fill a whole message, so waiting gains nothing"""
+    length = 0
+    for item in items:
+        length += telegram_length(ENTRY_SEPARATOR + item.payload['entry'])
+        if length > MESSAGE_LIMIT:
+            return True
+    return False
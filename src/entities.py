@@ -0,0 +1,68 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from telethon.errors import ChannelInvalidError, ChannelPrivateError, PeerIdInvalidError
+from telethon.tl.types import InputPeerChannel, InputPeerChat
+from src.config import config
+
+# Errors meaning a cached input peer can no longer be used
+INVALID_PEER_ERRORS = (ChannelInvalidError, ChannelPrivateError, PeerIdInvalidError)
+
+class EntityCache:
+    """Resolved input peers of configured channels, persisted across restarts"""
+
+    def __init__(self, cache_file: Optional[Path] = None):
+        self.cache_file = cache_file or config.CACHE_FILE.parent / "entities.json"
+        self.entities: Dict[str, Dict] = self._load_entities()
+
+    def _load_entities(self) -> Dict[str, Dict]:
+        if not self.cache_file.exists():
+            return {}
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        return {
+            str(k): v for k, v in data.items()
+            if isinstance(v, dict) and isinstance(v.get('id'), int)
+        }
+
+    def _save(self):
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.cache_file.with_name(self.cache_file.name + ".tmp")
+        with open(tmp_file, 'w') as f:
+            json.dump(self.entities, f)
+        os.replace(tmp_file, self.cache_file)
+
+    @staticmethod
+    def _input_peer(record: Dict):
+        if record.get('access_hash') is None:
+            return InputPeerChat(record['id'])
+        return InputPeerChannel(record['id'], record['access_hash'])
+
+    def sync(self, channel_ids: Iterable):
+        """Forget channels that are no longer configured"""
+        configured = {str(channel_id) for channel_id in channel_ids}
+        removed = [k for k in self.entities if k not in configured]
+        for key in removed:
+            del self.entities[key]
+        if removed:
+            self._save()
+
+    async def resolve(self, client, channel_id):
+        """Return input peer for channel, resolving it only if not cached"""
+        key = str(channel_id)
+        record = self.entities.get(key)
+        if record is None:
+            entity = await client.get_entity(channel_id)
+            record = {'id': entity.id, 'access_hash': getattr(entity, 'access_hash', None)}
+            self.entities[key] = record
+            self._save()
+        return self._input_peer(record)
+
+    def invalidate(self, channel_id):
+        """Drop cached peer so it is resolved again on next use"""
+        if self.entities.pop(str(channel_id), None) is not None:
+            self._save()
@@ -1,29 +1,80 @@
-from typing import Dict, List
-from src.config import config
+from typing import Dict, List, NamedTuple, Optional, Sequence
+from src.config import ConfigSnapshot, config
+from src.matcher import KeywordMatcher, build_keyword_matcher, route_group
+from src.scoring import TermScorer
+
+class FilterResult(NamedTuple):
+    is_relevant: bool
+    keywords: Dict[str, List[str]]
+    # Relevance score, only set by ScoringFilter
+    score: Optional[float] = None
+    # Positions found per matching route, regardless of route channels
+    routes: Optional[Dict[str, List[str]]] = None
 
 class MessageFilter:
-    def __init__(self):
-        keywords = config.get_keywords()
-        self.positions = [pos.lower() for pos in keywords['positions']]
-        self.stop_words = [word.lower() for word in keywords['stop_words']]
+    def __init__(self, matcher: Optional[KeywordMatcher] = None, routes: Sequence[str] = ()):
+        """Use precompiled matcher, or compile keywords from config.
+
+        `routes` are names of routes compiled into the matcher, they are
+        checked in the same pass as the keywords.
+        """
+        self.matcher = matcher or build_keyword_matcher(config.get_keywords())
+        self.routes = tuple(routes)
+        self._route_stop_groups = tuple(route_group(route, 'stop_words') for route in self.routes)
+        self._stop_groups = ('stop_words',) + self._route_stop_groups
+
+    def _route_matches(self, found: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        matches = {}
+        for route in self.routes:
+            positions = found[route_group(route, 'positions')]
+            if positions and not found[route_group(route, 'stop_words')]:
+                matches[route] = positions
+        return matches
+
+    def match(self, text: str) -> FilterResult:
+        """Check relevance and extract keywords of all routes in a single pass"""
+        found = self.matcher.find(text.lower(), stop_groups=self._stop_groups)
+        is_relevant = not found['stop_words'] and bool(found['positions'])
+        return FilterResult(is_relevant, {'positions': found['positions']},
+                            routes=self._route_matches(found))
+
+    def match_batch(self, texts: Sequence[str]) -> List[FilterResult]:
+        """Check page of messages at once"""
+        return [self.match(text) for text in texts]
 
     def is_relevant(self, text: str) -> bool:
         """Check if text matches search criteria"""
-        text = text.lower()
-        
-        # Check stop words
-        if any(word in text for word in self.stop_words):
-            return False
-            
-        # Check position keywords
-        has_position = any(pos in text for pos in self.positions)
-        
-        return has_position
+        return self.match(text).is_relevant
 
     def extract_keywords(self, text: str) -> Dict[str, List[str]]:
         """Extract found keywords from text"""
-        text = text.lower()
-        found_keywords = {
-            'positions': [pos for pos in self.positions if pos in text]
-        }
-        return found_keywords 
\ No newline at end of file
+        found = self.matcher.find(text.lower())
+        return {'positions': found['positions']}
+
+class ScoringFilter(MessageFilter):
+    """Weighted relevance score with threshold instead of any-keyword match"""
+
+    def __init__(self, scorer: TermScorer, matcher: Optional[KeywordMatcher] = None,
+                 routes: Sequence[str] = ()):
+        super().__init__(matcher, routes)
+        self.scorer = scorer
+
+    def match_batch(self, texts: Sequence[str]) -> List[FilterResult]:
+        scores, terms = self.scorer.score_batch(texts)
+        # Routes keep keyword matching, all of them in one pass per text
+        routes = [self._route_matches(self.matcher.find(text.lower(), self._route_stop_groups))
+                  if self.routes else {} for text in texts]
+        return [
+            FilterResult(score >= self.scorer.threshold, {'positions': found}, score, matches)
+            for score, found, matches in zip(scores, terms, routes)
+        ]
+
+    def match(self, text: str) -> FilterResult:
+        return self.match_batch([text])[0]
+
+def create_filter(snapshot: ConfigSnapshot) -> MessageFilter:
+    """Filter configured by snapshot: scoring if enabled, keyword match otherwise"""
+    routes = [route.name for route in snapshot.routes]
+    if snapshot.scorer is not None:
+        return ScoringFilter(snapshot.scorer, snapshot.matcher, routes)
+    return MessageFilter(snapshot.matcher, routes)
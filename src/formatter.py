@@ -1,18 +1,23 @@
-from typing import Dict, List
+import html
+from typing import Dict, List, Optional
 from datetime import datetime
 import pytz
 from src.config import config
 
+# Characters of message text kept in a digest entry
+DIGEST_SNIPPET_LENGTH = 300
+
 class MessageFormatter:
-    def __init__(self):
-        self.timezone = pytz.timezone(config.TIMEZONE)
+    def __init__(self, timezone: Optional[str] = None):
+        self.timezone = pytz.timezone(timezone or config.TIMEZONE)
 
     def format_message(self, 
                       original_text: str,
                       channel_name: str,
                       message_url: str,
                       keywords: Dict[str, List[str]],
-                      published_date: datetime) -> str:
+                      published_date: datetime,
+                      score: Optional[float] = None) -> str:
         """Format message for sending"""
         # Convert time to target timezone
         local_date = published_date.astimezone(self.timezone)
@@ -20,16 +25,48 @@ class MessageFormatter:
         
         # Format found keywords
         positions = ", ".join(keywords['positions'])
+        # Relevance score of scoring filter
+        score_line = f"📊 Score: {score:.1f}\n" if score is not None else ""
         
         # Create message in markdown format
         message = (
             f"🔍 **New vacancy!**\n\n"
             f"📅 Date: {date_str}\n"
             f"📢 Channel: {channel_name}\n"
-            f"💼 Position: {positions}\n\n"
+            f"💼 Position: {positions}\n"
+            f"{score_line}\n"
             f"📝 **Description:**\n"
             f"{original_text[:1000]}...\n\n"  # Truncate long text
             f"🔗 [Original message]({message_url})"
         )
         
-        return message 
\ No newline at end of file
+        return message 
+    
+    def format_digest_entry(self,
+                            original_text: str,
+                            channel_name: str,
+                            message_url: str,
+                            keywords: Dict[str, List[str]],
+                            published_date: datetime,
+                            score: Optional[float] = None) -> str:
+        """Format compact HTML entry for digest messages.
+        
+        Telethon's markdown has no escape syntax, so digests use HTML
+        where any message text can be escaped safely.
+        """
+        local_date = published_date.astimezone(self.timezone)
+        date_str = local_date.strftime("%Y-%m-%d %H:%M")
+        positions = html.escape(", ".join(keywords['positions']))
+        score_text = f" · 📊 {score:.1f}" if score is not None else ""
+        
+        # Collapse whitespace so entries stay compact
+        snippet = " ".join(original_text.split())
+        if len(snippet) > DIGEST_SNIPPET_LENGTH:
+            snippet = snippet[:DIGEST_SNIPPET_LENGTH].rstrip() + "…"
+        
+        return (
+            f"💼 <b>{positions}</b>{score_text}\n"
+            f"{html.escape(snippet)}\n"
+            f"📅 {date_str} · "
+            f"<a href=\"{html.escape(message_url)}\">{html.escape(channel_name)}</a>"
+        )
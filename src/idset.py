@@ -0,0 +1,214 @@
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Dict, Iterator, Optional, Tuple
+
+# Buckets per cache TTL: timestamps are kept as bucket numbers, so entries
+# expire up to TTL / TTL_BUCKETS late
+TTL_BUCKETS = 256
+# Buckets are stored relative to a base bucket as unsigned 16-bit numbers
+MAX_RELATIVE_BUCKET = 0xFFFF
+
+def to_little_endian(values: array) -> array:
+    """Values in little-endian order, the byte order of stored arrays"""
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+class IdRun:
+    """Sorted message ids of one channel and their buckets.
+
+    `ordered` is kept while buckets do not decrease along the ids, i.e.
+    messages were added in id order: then the oldest entries are a prefix.
+    """
+
+    __slots__ = ('ids', 'buckets', 'ordered')
+
+    def __init__(self, ids: Optional[array] = None, buckets: Optional[array] = None,
+                 ordered: Optional[bool] = None):
+        # Telegram message ids are 32-bit
+        self.ids = ids if ids is not None else array('i')
+        self.buckets = buckets if buckets is not None else array('H')
+        self.ordered = self._is_ordered() if ordered is None else ordered
+
+    def _is_ordered(self) -> bool:
+        return all(a <= b for a, b in zip(self.buckets, self.buckets[1:]))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def keep(self, keep_bucket) -> int:
+        """Remove entries whose bucket keep_bucket() rejects, return number removed"""
+        kept = [(message_id, bucket) for message_id, bucket in zip(self.ids, self.buckets)
+                if keep_bucket(bucket)]
+        removed = len(self.ids) - len(kept)
+        if removed:
+            self.ids = array('i', (message_id for message_id, _ in kept))
+            self.buckets = array('H', (bucket for _, bucket in kept))
+            self.ordered = self._is_ordered()
+        return removed
+
+    def remove_oldest(self, bucket: int, limit: int) -> int:
+        """Remove up to `limit` entries of `bucket`, the oldest one, return number removed"""
+        if self.ordered:
+            count = min(bisect_right(self.buckets, bucket), limit)
+            del self.ids[:count]
+            del self.buckets[:count]
+            return count
+        removed = 0
+
+        def keep_bucket(value: int) -> bool:
+            nonlocal removed
+            if value == bucket and removed < limit:
+                removed += 1
+                return False
+            return True
+
+        self.keep(keep_bucket)
+        return removed
+
+class MessageIdSet:
+    """Cached message ids grouped by channel, with coarse timestamps.
+
+    Each group (channel, or route and channel) keeps its ids in a sorted
+    array with the bucket number of every id in a parallel array, about
+    6 bytes per message. Ids grow over time, so adding is usually an
+    append and expired entries are removed as a prefix.
+    """
+
+    def __init__(self, bucket_seconds: int, base: int = 0):
+        self.bucket_seconds = max(1, int(bucket_seconds))
+        # Absolute bucket number of relative bucket 0
+        self.base = base
+        self.groups: Dict[str, IdRun] = {}
+        # Number of entries per relative bucket
+        self._counts: Dict[int, int] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def bucket(self, timestamp: float) -> int:
+        """Absolute bucket number of timestamp"""
+        return int(timestamp // self.bucket_seconds)
+
+    def timestamp(self, relative_bucket: int) -> int:
+        """Last second of a bucket, entries are treated as added then"""
+        return (self.base + relative_bucket + 1) * self.bucket_seconds - 1
+
+    def _relative(self, timestamp: float) -> int:
+        bucket = self.bucket(timestamp)
+        if not self._counts:
+            self.base = bucket
+        elif bucket - self.base > MAX_RELATIVE_BUCKET:
+            self._rebase(bucket - MAX_RELATIVE_BUCKET)
+        # Entries older than the base (imported, clock changes) count as base bucket
+        return max(bucket - self.base, 0)
+
+    def _count(self, relative_bucket: int, amount: int):
+        count = self._counts.get(relative_bucket, 0) + amount
+        if count:
+            self._counts[relative_bucket] = count
+        else:
+            del self._counts[relative_bucket]
+        self._size += amount
+
+    def add(self, group: str, message_id: int, timestamp: float):
+        """Add message or refresh its timestamp"""
+        relative = self._relative(timestamp)
+        run = self.groups.get(group)
+        if run is None:
+            run = self.groups[group] = IdRun()
+        ids, buckets = run.ids, run.buckets
+        if not ids or message_id > ids[-1]:
+            if buckets and buckets[-1] > relative:
+                run.ordered = False
+            ids.append(message_id)
+            buckets.append(relative)
+            self._count(relative, 1)
+            return
+
+        index = bisect_left(ids, message_id)
+        if ids[index] == message_id:
+            self._count(buckets[index], -1)
+            buckets[index] = relative
+        else:
+            # Older message added late, e.g. by a backfill
+            ids.insert(index, message_id)
+            buckets.insert(index, relative)
+        self._count(relative, 1)
+        if (index > 0 and buckets[index - 1] > relative
+                or index + 1 < len(buckets) and buckets[index + 1] < relative):
+            run.ordered = False
+
+    def get(self, group: str, message_id: int) -> Optional[int]:
+        """Timestamp of message, None if it is not in the set"""
+        run = self.groups.get(group)
+        if run is None:
+            return None
+        index = bisect_left(run.ids, message_id)
+        if index < len(run.ids) and run.ids[index] == message_id:
+            return self.timestamp(run.buckets[index])
+        return None
+
+    def _remove_before(self, relative_bucket: int):
+        """Remove all entries of buckets before `relative_bucket`"""
+        for group, run in list(self.groups.items()):
+            if run.ordered:
+                count = bisect_left(run.buckets, relative_bucket)
+                del run.ids[:count]
+                del run.buckets[:count]
+            else:
+                run.keep(lambda bucket: bucket >= relative_bucket)
+            if not run.ids:
+                del self.groups[group]
+        for bucket in [bucket for bucket in self._counts if bucket < relative_bucket]:
+            self._count(bucket, -self._counts[bucket])
+
+    def expire(self, expire_before: float):
+        """Remove entries whose whole bucket lies before `expire_before`"""
+        relative = self.bucket(expire_before) - self.base
+        if self._counts and min(self._counts) < relative:
+            self._remove_before(relative)
+
+    def evict(self, count: int):
+        """Remove `count` oldest entries"""
+        while count > 0 and self._counts:
+            oldest = min(self._counts)
+            if self._counts[oldest] <= count:
+                count -= self._counts[oldest]
+                self._remove_before(oldest + 1)
+                continue
+            for group, run in list(self.groups.items()):
+                removed = run.remove_oldest(oldest, count)
+                self._count(oldest, -removed)
+                count -= removed
+                if not run.ids:
+                    del self.groups[group]
+                if not count:
+                    break
+
+    def _rebase(self, min_base: int):
+        """Move base forward to the oldest entry, dropping entries before `min_base`"""
+        self._remove_before(min_base - self.base)
+        new_base = self.base + min(self._counts) if self._counts else min_base
+        shift = new_base - self.base
+        for run in self.groups.values():
+            run.buckets = array('H', (bucket - shift for bucket in run.buckets))
+        self._counts = {bucket - shift: count for bucket, count in self._counts.items()}
+        self.base = new_base
+
+    def items(self) -> Iterator[Tuple[str, int, int]]:
+        """Group, message id and timestamp of every entry"""
+        for group, run in self.groups.items():
+            for message_id, bucket in zip(run.ids, run.buckets):
+                yield group, message_id, self.timestamp(bucket)
+
+    def add_run(self, group: str, run: IdRun):
+        """Add stored group with buckets relative to the same base, as loaded"""
+        self.groups[group] = run
+        for bucket, count in Counter(run.buckets).items():
+            self._counts[bucket] = self._counts.get(bucket, 0) + count
+        self._size += len(run)
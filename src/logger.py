@@ -1,35 +1,105 @@
+import atexit
+import json
 import logging
+import queue
 import sys
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
 from src.config import config
 
-def setup_logger(name: str = "career_scout") -> logging.Logger:
+# Поля из extra, которые попадают в структурированный лог
+STRUCTURED_FIELDS = ('channel', 'message_id', 'stage')
+
+_listener: Optional[QueueListener] = None
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as JSON lines"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+def setup_logger(name: str = "career_scout", log_file: Optional[Path] = None) -> logging.Logger:
+    global _listener
     logger = logging.getLogger(name)
     logger.setLevel(config.LOG_LEVEL)
 
+    # Повторная настройка (например, в процессе воркера) заменяет обработчики
+    stop_logging()
+    logger.handlers.clear()
+
     # Форматирование логов
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    if config.LOG_FORMAT == 'json':
+        formatter = JsonFormatter(datefmt='%Y-%m-%dT%H:%M:%S%z')
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
 
     # Обработчик для вывода в консоль
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
 
     # Обработчик для записи в файл с ротацией
+    log_file = Path(log_file or config.LOG_FILE)
+    log_file.parent.mkdir(parents=True, exist_ok=True)
     file_handler = RotatingFileHandler(
-        config.LOG_FILE,
+        log_file,
         maxBytes=10*1024*1024,  # 10MB
         backupCount=5,
         encoding='utf-8'
     )
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+
+    # Запись в консоль и файл выполняется в фоновом потоке,
+    # event loop только кладет записи в очередь
+    log_queue = queue.Queue()
+    logger.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, console_handler, file_handler)
+    _listener.start()
+    atexit.register(stop_logging)
 
     return logger
 
-# Создаем глобальный логгер
-logger = setup_logger() 
\ No newline at end of file
+def flush_logging():
+    """Write out all queued records and keep logging running"""
+    if _listener is not None:
+        _listener.stop()
+        _listener.start()
+
+def stop_logging():
+    """Write out all queued records and stop background thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+class _SetupOnFirstUse(logging.Handler):
+    """Configures logging when the first record is emitted"""
+
+    def emit(self, record: logging.LogRecord):
+        # Handler.handle держит блокировку обработчика, поэтому настройка
+        # выполняется один раз, даже если первые записи пришли из разных потоков
+        if self in logger.handlers:
+            setup_logger()
+        if logger.isEnabledFor(record.levelno):
+            logger.handle(record)
+
+# Создаем глобальный логгер. Конфигурация читается и файл лога открывается
+# при первой записи, а не при импорте, чтобы утилиты запускались быстро
+logger = logging.getLogger("career_scout")
+logger.setLevel(logging.DEBUG)
+logger.addHandler(_SetupOnFirstUse())
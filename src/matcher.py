@@ -0,0 +1,118 @@
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton matching groups of keywords in a single pass"""
+
+    def __init__(self, groups: Dict[str, Iterable[str]], word_boundary: bool = False):
+        self.word_boundary = word_boundary
+        self.groups: Tuple[str, ...] = tuple(groups)
+        # (group, keyword) per pattern id, in configured order
+        self._patterns: List[Tuple[str, str]] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        seen = set()
+        for group, words in groups.items():
+            for word in words:
+                word = word.lower()
+                if not word or (group, word) in seen:
+                    continue
+                seen.add((group, word))
+                self._add(word, len(self._patterns))
+                self._patterns.append((group, word))
+        self._build_failure_links()
+
+    def _add(self, word: str, pattern_id: int):
+        """Insert keyword into the trie"""
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = next_state
+        self._out[state] += (pattern_id,)
+
+    def _build_failure_links(self):
+        """Compute failure transitions breadth-first"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] += self._out[self._fail[next_state]]
+
+    def _on_boundary(self, text: str, end: int, word: str) -> bool:
+        """Check that keyword ending at `end` is not part of a longer word"""
+        start = end - len(word) + 1
+        if _is_word_char(word[0]) and start > 0 and _is_word_char(text[start - 1]):
+            return False
+        if _is_word_char(word[-1]) and end + 1 < len(text) and _is_word_char(text[end + 1]):
+            return False
+        return True
+
+    def find(self, text: str, stop_groups: Sequence[str] = ()) -> Dict[str, List[str]]:
+        """Find keywords of every group in normalized (lowercase) text.
+
+        Scanning stops once every one of `stop_groups` has a hit, e.g. when
+        stop words rejected the message for all routes.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        hits = set()
+        stopped = set()
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not out[state]:
+                continue
+            for pattern_id in out[state]:
+                if pattern_id in hits:
+                    continue
+                group, word = self._patterns[pattern_id]
+                if self.word_boundary and not self._on_boundary(text, index, word):
+                    continue
+                hits.add(pattern_id)
+                if group in stop_groups:
+                    stopped.add(group)
+                    if len(stopped) == len(stop_groups):
+                        return self._collect(hits)
+        return self._collect(hits)
+
+    def _collect(self, hits) -> Dict[str, List[str]]:
+        """Group matched pattern ids, keeping configured keyword order"""
+        found: Dict[str, List[str]] = {group: [] for group in self.groups}
+        for pattern_id in sorted(hits):
+            group, word = self._patterns[pattern_id]
+            found[group].append(word)
+        return found
+
+
+def route_group(route: str, group: str) -> str:
+    """Matcher group of `positions` or `stop_words` of a route"""
+    return f"{route}:{group}"
+
+
+def build_keyword_matcher(keywords: Dict, routes: Optional[Dict[str, Dict]] = None) -> KeywordMatcher:
+    """Compile `keywords` section of channels.yaml, with keywords of `routes` by name"""
+    groups = {'stop_words': keywords['stop_words'], 'positions': keywords['positions']}
+    for route, route_keywords in (routes or {}).items():
+        groups[route_group(route, 'stop_words')] = route_keywords['stop_words']
+        groups[route_group(route, 'positions')] = route_keywords['positions']
+    return KeywordMatcher(groups, word_boundary=keywords.get('word_boundary', False))
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# Latency buckets in seconds, from in-memory stages to FloodWait-sized pauses
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Sequence[str], values: Tuple) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self.values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket_labels = _format_labels(self.labelnames + ('le',), labels + (le,))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List = []
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Histogram:
+        metric = Histogram(name, help_text, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Metrics in Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict[str, Dict[Tuple, float]]:
+        """Current counter values and histogram (count, sum) for diffing"""
+        result = {}
+        for metric in self.metrics:
+            if isinstance(metric, Counter):
+                result[metric.name] = dict(metric.values)
+            else:
+                result[metric.name] = {k: (v[2], v[1]) for k, v in metric.values.items()}
+        return result
+
+registry = MetricsRegistry()
+
+messages_fetched = registry.counter(
+    'career_scout_messages_fetched_total', 'Messages fetched from channel history', ('channel',))
+messages_filtered = registry.counter(
+    'career_scout_messages_filtered_total', 'Messages checked by the keyword filter', ('channel', 'result'))
+messages_deduplicated = registry.counter(
+    'career_scout_messages_deduplicated_total', 'Messages skipped as already seen', ('channel', 'reason'))
+messages_sent = registry.counter(
+    'career_scout_messages_sent_total', 'Messages delivered to the target channel', ('channel',))
+flood_wait_seconds = registry.counter(
+    'career_scout_flood_wait_seconds_total', 'Seconds spent waiting on FloodWait', ('stage',))
+stage_seconds = registry.histogram(
+    'career_scout_stage_seconds', 'Latency of pipeline stages', ('stage',))
+
+def cycle_summary(before: Dict[str, Dict[Tuple, float]]) -> List[str]:
+    """Log lines describing metric changes since `before` snapshot"""
+    after = registry.snapshot()
+
+    def delta(metric: Counter) -> float:
+        previous = before.get(metric.name, {})
+        return sum(v - previous.get(k, 0) for k, v in after[metric.name].items())
+
+    filtered_in = sum(
+        v - before.get(messages_filtered.name, {}).get(k, 0)
+        for k, v in after[messages_filtered.name].items() if k[1] == 'in'
+    )
+    lines = [
+        f"Cycle stats: fetched={delta(messages_fetched):.0f} "
+        f"relevant={filtered_in:.0f} "
+        f"deduplicated={delta(messages_deduplicated):.0f} "
+        f"sent={delta(messages_sent):.0f} "
+        f"flood_wait={delta(flood_wait_seconds):.0f}s"
+    ]
+    previous_stages = before.get(stage_seconds.name, {})
+    for labels, (count, total) in sorted(after[stage_seconds.name].items()):
+        prev_count, prev_total = previous_stages.get(labels, (0, 0.0))
+        count, total = count - prev_count, total - prev_total
+        if count:
+            lines.append(f"  stage {labels[0]}: {count} calls, "
+                         f"mean {total / count * 1000:.2f}ms, total {total:.2f}s")
+    return lines
+
+async def _handle_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = await reader.readline()
+        # Drain request headers
+        while (await reader.readline()).strip():
+            pass
+        parts = request_line.decode('latin-1').split()
+        if len(parts) >= 2 and parts[1].split('?')[0] == '/metrics':
+            status, body = '200 OK', registry.render().encode()
+        else:
+            status, body = '404 Not Found', b'Not found\n'
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+async def start_metrics_server(host: str, port: int) -> asyncio.AbstractServer:
+    """Serve /metrics on host:port"""
+    return await asyncio.start_server(_handle_request, host, port)
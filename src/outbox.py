@@ -0,0 +1,120 @@
+import asyncio
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+from src.cache import cache_key
+from src.config import config
+
+# Seconds between checks for items put by other processes (workers, backfill)
+OUTBOX_POLL_INTERVAL = 1.0
+
+class OutboxItem(NamedTuple):
+    id: int
+    channel_id: int
+    message_id: int
+    payload: Dict
+    attempts: int
+    created: int
+
+class Outbox:
+    """Persistent queue of matched messages waiting for delivery"""
+
+    def __init__(self, outbox_file: Optional[Path] = None):
+        self.outbox_file = outbox_file or config.CACHE_FILE.parent / "outbox.db"
+        self.outbox_file.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.outbox_file))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " key TEXT UNIQUE NOT NULL,"
+            " channel_id INTEGER NOT NULL,"
+            " message_id INTEGER NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            " created INTEGER NOT NULL)"
+        )
+        self._db.commit()
+        self._event: Optional[asyncio.Event] = None
+
+    def put(self, message_id: int, channel_id: int, payload: Dict) -> bool:
+        """Queue message for delivery, return False if already queued.
+
+        Messages are queued once per route, given by payload['route'].
+        """
+        with self._db:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO outbox (key, channel_id, message_id, payload, created)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (cache_key(message_id, channel_id, payload.get('route')), channel_id, message_id,
+                 json.dumps(payload), int(time.time()))
+            )
+        if self._event:
+            self._event.set()
+        return cursor.rowcount == 1
+
+    def contains(self, message_id: int, channel_id: int, route: Optional[str] = None) -> bool:
+        """Check if message of `route` is waiting in the outbox"""
+        row = self._db.execute(
+            "SELECT 1 FROM outbox WHERE key = ? AND status = 'pending'",
+            (cache_key(message_id, channel_id, route),)
+        ).fetchone()
+        return row is not None
+
+    def peek(self, limit: int = 1) -> List[OutboxItem]:
+        """Return oldest pending items without removing them"""
+        rows = self._db.execute(
+            "SELECT id, channel_id, message_id, payload, attempts, created FROM outbox"
+            " WHERE status = 'pending' ORDER BY id LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [OutboxItem(r[0], r[1], r[2], json.loads(r[3]), r[4], r[5]) for r in rows]
+
+    def ack(self, item_id: int):
+        """Remove delivered item"""
+        with self._db:
+            self._db.execute("DELETE FROM outbox WHERE id = ?", (item_id,))
+
+    def record_failure(self, item_id: int) -> int:
+        """Increase attempt counter of item and return it"""
+        with self._db:
+            self._db.execute(
+                "UPDATE outbox SET attempts = attempts + 1 WHERE id = ?", (item_id,)
+            )
+        row = self._db.execute(
+            "SELECT attempts FROM outbox WHERE id = ?", (item_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def mark_failed(self, item_id: int):
+        """Keep undeliverable item for inspection, but stop retrying it"""
+        with self._db:
+            self._db.execute(
+                "UPDATE outbox SET status = 'failed' WHERE id = ?", (item_id,)
+            )
+
+    def __len__(self) -> int:
+        row = self._db.execute(
+            "SELECT COUNT(*) FROM outbox WHERE status = 'pending'"
+        ).fetchone()
+        return row[0]
+
+    async def wait(self, timeout: Optional[float] = None):
+        """Wait until new items are queued in this process, or timeout passes.
+
+        Items put by other processes do not wake the waiter, so a
+        shared outbox has to be polled with a timeout.
+        """
+        if self._event is None:
+            self._event = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return
+        self._event.clear()
+
+    def close(self):
+        self._db.close()
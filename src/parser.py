@@ -1,33 +1,87 @@
+import argparse
 import asyncio
 import signal
 import sys
+import time
 from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, NamedTuple, Optional
 import pytz
-from telethon import TelegramClient
-from telethon.errors import FloodWaitError
+from telethon import TelegramClient, events, utils
 from telethon.tl.types import Message
 
 from src.config import config
 from src.cache import MessageCache
-from src.filters import MessageFilter
+from src.cursors import ChannelCursors
+from src.dedup import NearDuplicateIndex, simhash
+from src.entities import INVALID_PEER_ERRORS, EntityCache
+from src.filters import FilterResult, create_filter
 from src.formatter import MessageFormatter
-from src.logger import logger
+from src.logger import flush_logging, logger, stop_logging
+from src import metrics
+from src.outbox import OUTBOX_POLL_INTERVAL, Outbox
+from src.profiling import ProfileSession
+from src.scheduler import ChannelScheduler
+from src.sender import MessageSender
+
+# Messages per history request of iter_messages, filtered as one batch
+FILTER_BATCH_SIZE = 100
+
+class ChannelScan(NamedTuple):
+    channel_id: str
+    messages: int
+    seconds: float
+    error: Optional[str] = None
 
 class TelegramParser:
-    def __init__(self):
-        self.client = TelegramClient('career_scout',
-                                   config.API_ID,
-                                   config.API_HASH)
-        self.cache = MessageCache()
-        self.filter = MessageFilter()
+    def __init__(self, client=None, target_channel=None, data_dir: Optional[Path] = None,
+                 shard=None):
+        """Create parser.
+
+        `client` replaces the Telegram client (e.g. with a fake one for
+        replays) and `data_dir` keeps all state files in another directory.
+        With `shard` (see src.workers) the parser runs as a worker: it scans
+        only its own channels and leaves delivery to the supervisor.
+        """
+        self.client = client or TelegramClient('career_scout',
+                                               config.API_ID,
+                                               config.API_HASH)
+        self.shard = shard
+        data_dir = data_dir or config.CACHE_FILE.parent
+        # Cursors and access hashes belong to the session, so workers keep their own
+        state_dir = data_dir / f"worker-{shard.index}" if shard else data_dir
+        self.cache = MessageCache(data_dir / config.CACHE_FILE.name)
+        self.cursors = ChannelCursors(state_dir / "cursors.json")
+        self.entities = EntityCache(state_dir / "entities.json")
+        self.scheduler = ChannelScheduler(state_dir / "schedule.json", *self._schedule_settings())
+        self.filter = create_filter(config.snapshot)
+        self.routes = {route.name: route for route in config.get_routes()}
         self.formatter = MessageFormatter()
-        self.target_channel = config.CHANNEL_ID
+        self.target_channel = config.CHANNEL_ID if target_channel is None else target_channel
+        self.outbox = Outbox(data_dir / "outbox.db")
+        self.sender = None
+        if shard is None:
+            duplicates = (NearDuplicateIndex(data_dir / "fingerprints.bin")
+                          if config.DEDUP_ENABLED else None)
+            self.sender = MessageSender(self.client, self.outbox, self.cache,
+                                        self.target_channel, duplicates,
+                                        poll_interval=OUTBOX_POLL_INTERVAL)
         self.is_running = True
+        # Peer id -> configured channel id, filled in events mode
+        self._channel_names = {}
+        self._event_channels = None
+        # Running or requested profile, see request_profile
+        self.profile: Optional[ProfileSession] = None
+        self._profile_flag = False
+        # Set to end the pause between scan cycles early
+        self._wake = asyncio.Event()
         
     def stop_parser(self):
         """Stop parser gracefully"""
         logger.info("Stopping parser gracefully...")
         self.is_running = False
+        if self.sender:
+            self.sender.stop()
         
     async def shutdown(self, signal=None):
         """Cleanup and shutdown"""
@@ -40,6 +94,7 @@ class TelegramParser:
         logger.info(f"Cancelling {len(tasks)} outstanding tasks")
         await asyncio.gather(*tasks, return_exceptions=True)
         logger.info("Stopping event loop...")
+        flush_logging()
         asyncio.get_event_loop().stop()
 
     def _handle_exception(self, loop, context):
@@ -56,117 +111,376 @@ class TelegramParser:
         """Stop Telegram client"""
         await self.client.disconnect()
         
+    def request_profile(self):
+        """Profile the next scan cycles (or seconds) on SIGUSR1 or config flag"""
+        if self.profile and not self.profile.finished:
+            logger.info("Profiling is already running")
+            return
+        name = f"profile.worker-{self.shard.index}" if self.shard else "profile"
+        self.profile = ProfileSession(Path(config.LOG_FILE).parent, name, config.PROFILE_CYCLES,
+                                      config.PROFILE_SECONDS, config.PROFILE_LAG_INTERVAL)
+        if self.profile.by_cycles:
+            # Profile a cycle of all channels now instead of after the pause
+            self.scheduler.expedite()
+            self._wake.set()
+        else:
+            self.profile.start()
+
+    @staticmethod
+    def _schedule_settings():
+        """Scheduler intervals in seconds and whether they adapt to posting rates"""
+        if config.MODE == 'events':
+            # Events deliver messages, polling only catches up on gaps after reconnects
+            return config.CATCHUP_MINUTES * 60, 0, config.CATCHUP_MINUTES * 60, False
+        return (config.PAUSE_MINUTES * 60, config.SCHEDULE_MIN_MINUTES * 60,
+                config.SCHEDULE_MAX_MINUTES * 60, config.SCHEDULE_ADAPTIVE)
+
+    def _refresh_config(self):
+        """Switch to new configuration snapshot if channels.yaml changed"""
+        if config.reload_if_changed():
+            self.filter = create_filter(config.snapshot)
+            self.routes = {route.name: route for route in config.get_routes()}
+            logger.info("Configuration reloaded")
+        
+    async def register_event_handlers(self, channels: List[dict]):
+        """Process new (and optionally edited) messages as soon as they arrive"""
+        channel_ids = tuple(channel['id'] for channel in channels)
+        if channel_ids == self._event_channels:
+            return
+        if self._event_channels is not None:
+            self.client.remove_event_handler(self._on_message)
+        self._event_channels = channel_ids
+        self._channel_names = {}
+        for channel in channels:
+            try:
+                entity = await self.entities.resolve(self.client, channel['id'])
+            except Exception as e:
+                logger.error(f"Error resolving channel {channel['id']}: {e}")
+                continue
+            self._channel_names[utils.get_peer_id(entity)] = channel['id']
+        
+        chats = list(self._channel_names)
+        self.client.add_event_handler(self._on_message, events.NewMessage(chats=chats))
+        if config.LISTEN_EDITS:
+            self.client.add_event_handler(self._on_message, events.MessageEdited(chats=chats))
+        logger.info(f"Listening for new messages in {len(chats)} channels")
+        
+    async def _on_message(self, event):
+        """Run incoming message through the filter pipeline"""
+        channel_id = self._channel_names.get(event.chat_id, str(event.chat_id))
+        try:
+            # Cursor is left to catch-up scans, so gaps before this message are not skipped
+            metrics.messages_fetched.inc(channel_id)
+            await self.process_message(event.message, channel_id)
+        except Exception as e:
+            logger.error(f"Error processing message {event.message.id} from {channel_id}: {e}",
+                         extra={'channel': channel_id, 'message_id': event.message.id, 'stage': 'event'})
+        
+    def own_channels(self, channels: List[dict]) -> List[dict]:
+        """Channels scanned by this parser, i.e. all unless it is a worker"""
+        if self.shard is None:
+            return channels
+        return [channel for channel in channels if self.shard.owns(channel['id'])]
+        
     def _get_message_url(self, channel_id: int, message_id: int) -> str:
         """Generate message URL"""
         return f"https://t.me/c/{str(channel_id)[4:]}/{message_id}"
         
-    async def process_message(self, message: Message, channel_id: str):
-        """Process single message"""
+    async def process_message(self, message: Message, channel_id: str,
+                              result: Optional[FilterResult] = None) -> bool:
+        """Process single message, return False if it has to be retried.
+
+        `result` is the filter result if message was already checked as part of a page.
+        """
         if not message.text or not self.is_running:
-            return
-            
-        # Check if message already processed
-        if self.cache.message_exists(message.id, message.peer_id.channel_id):
-            return
-            
-        # Check message relevance
-        if not self.filter.is_relevant(message.text):
-            return
+            return True
+        
+        # Configuration changes apply between messages
+        self._refresh_config()
+        
+        # Check message relevance for all routes and extract keywords
+        if result is None:
+            with metrics.stage_seconds.time('filter'):
+                result = self.filter.match(message.text)
+        # Positions found per matching route, None is the default target
+        matches = {None: result.keywords['positions']} if result.is_relevant else {}
+        for name, positions in (result.routes or {}).items():
+            route = self.routes.get(name)
+            if route and (route.channels is None or str(channel_id) in route.channels):
+                matches[name] = positions
+        if not matches:
+            metrics.messages_filtered.inc(channel_id, 'out')
+            return True
+        metrics.messages_filtered.inc(channel_id, 'in')
             
-        # Extract keywords
-        keywords = self.filter.extract_keywords(message.text)
-        logger.info(f"Found relevant message in {channel_id} with keywords: {keywords['positions']}")
+        # Skip routes the message was already sent to or is waiting for
+        channel_peer_id = message.peer_id.channel_id
+        with metrics.stage_seconds.time('dedup'):
+            matches = {route: positions for route, positions in matches.items()
+                       if not (self.cache.message_exists(message.id, channel_peer_id, route)
+                               or self.outbox.contains(message.id, channel_peer_id, route))}
+        if not matches:
+            metrics.messages_deduplicated.inc(channel_id, 'cache')
+            return True
+        
+        fingerprint = None
+        if config.DEDUP_ENABLED:
+            # Near-duplicates across channels are skipped by the sender
+            with metrics.stage_seconds.time('fingerprint'):
+                fingerprint = simhash(message.text)
+        
+        for route, positions in matches.items():
+            # Score only applies to the default keywords
+            score = result.score if route is None else None
+            if not self._enqueue(message, channel_id, route, {'positions': positions}, score, fingerprint):
+                return False
+        return True
+        
+    def _enqueue(self, message: Message, channel_id: str, route: Optional[str],
+                 keywords: dict, score: Optional[float], fingerprint: Optional[int]) -> bool:
+        """Format message for route and queue it, return False if it has to be retried"""
+        feed = f" for route {route}" if route else ""
+        logger.info(f"Found relevant message in {channel_id}{feed} with keywords: {keywords['positions']}",
+                    extra={'channel': channel_id, 'message_id': message.id, 'stage': 'filter'})
         
         # Generate message URL
-        message_url = self._get_message_url(message.peer_id.channel_id, message.id)
+        channel_peer_id = message.peer_id.channel_id
+        message_url = self._get_message_url(channel_peer_id, message.id)
         
         # Format message
-        formatted_message = self.formatter.format_message(
-            original_text=message.text,
-            channel_name=channel_id,
-            message_url=message_url,
-            keywords=keywords,
-            published_date=message.date
-        )
+        with metrics.stage_seconds.time('format'):
+            formatted_message = self.formatter.format_message(
+                original_text=message.text,
+                channel_name=channel_id,
+                message_url=message_url,
+                keywords=keywords,
+                published_date=message.date,
+                score=score
+            )
         
-        try:
-            if not self.is_running:
-                return
-                
-            # Send message
-            await self.client.send_message(
-                self.target_channel,
-                formatted_message,
-                parse_mode='markdown',
-                link_preview=False
+        payload = {'text': formatted_message, 'channel': channel_id}
+        if route is not None:
+            payload['route'] = route
+            payload['target'] = self.routes[route].target
+        if config.DIGEST_ENABLED:
+            payload['entry'] = self.formatter.format_digest_entry(
+                original_text=message.text,
+                channel_name=channel_id,
+                message_url=message_url,
+                keywords=keywords,
+                published_date=message.date,
+                score=score
             )
-            
-            # Add to cache
-            self.cache.add_message(message.id, message.peer_id.channel_id)
-            
-            # Delay to avoid flood
-            if self.is_running:
-                await asyncio.sleep(config.REQUEST_DELAY)
-            
-        except FloodWaitError as e:
-            logger.warning(f"Hit flood limit, waiting {e.seconds} seconds")
-            if self.is_running:
-                await asyncio.sleep(e.seconds)
-        except Exception as e:
-            logger.error(f"Error sending message: {e}")
-            
-    async def process_channel(self, channel: dict):
-        """Process all messages from channel"""
-        if not self.is_running:
-            return
-            
+        if fingerprint is not None:
+            payload['fingerprint'] = fingerprint
+        
+        # Queue for delivery, sender marks it in cache once sent
         try:
-            channel_id = channel['id']
-            channel_entity = await self.client.get_entity(channel_id)
+            with metrics.stage_seconds.time('enqueue'):
+                self.outbox.put(message.id, channel_peer_id, payload)
+        except Exception as e:
+            logger.error(f"Error queueing message {message.id} from {channel_id}: {e}",
+                         extra={'channel': channel_id, 'message_id': message.id, 'stage': 'enqueue'})
+            return False
+        return True
             
-            # Define time range
+    async def _scan_history(self, channel_id: str, channel_entity) -> int:
+        """Run channel history through process_message, return number of messages"""
+        messages = 0
+        
+        # Continue from cursor, fall back to full time range
+        cursor = self.cursors.get(channel_id)
+        if cursor:
+            history = self.client.iter_messages(
+                channel_entity,
+                min_id=cursor,
+                reverse=True
+            )
+        else:
             now = datetime.now(pytz.UTC)
             since_date = now - timedelta(days=config.DAYS_TO_PARSE)
-            
-            async for message in self.client.iter_messages(
+            logger.info(f"No cursor for {channel_id}, scanning since {since_date}")
+            history = self.client.iter_messages(
                 channel_entity,
                 offset_date=since_date,
                 reverse=True
-            ):
-                if not self.is_running:
-                    break
-                await self.process_message(message, channel_id)
+            )
+        
+        # Stop advancing cursor after first failed message so it is retried
+        advance_cursor = True
+        page = []
+        waiting_since = time.perf_counter()
+        async for message in history:
+            # Time spent waiting for the iterator, i.e. history paging
+            metrics.stage_seconds.observe(time.perf_counter() - waiting_since, 'fetch')
+            if not self.is_running:
+                break
+            messages += 1
+            metrics.messages_fetched.inc(channel_id)
+            if message.date:
+                self.scheduler.observe(channel_id, message.date.timestamp())
+            page.append(message)
+            if len(page) >= FILTER_BATCH_SIZE:
+                advance_cursor = await self._scan_page(channel_id, page, advance_cursor)
+                page = []
+            waiting_since = time.perf_counter()
+        if page:
+            await self._scan_page(channel_id, page, advance_cursor)
+        return messages
+    
+    async def _scan_page(self, channel_id: str, page: List[Message], advance_cursor: bool) -> bool:
+        """Process page and move cursor, return whether cursor may still advance"""
+        processed = await self.process_page(channel_id, page)
+        if advance_cursor and processed:
+            self.cursors.update(channel_id, page[processed - 1].id)
+        return advance_cursor and processed == len(page)
+    
+    async def process_page(self, channel_id: str, page: List[Message]) -> int:
+        """Filter page of messages at once, then process them in order.
+        
+        Returns number of messages from the start of page processed
+        successfully, i.e. how far a cursor may advance.
+        """
+        with metrics.stage_seconds.time('filter_page'):
+            results = self.filter.match_batch([message.text or '' for message in page])
+        processed = 0
+        failed = False
+        for message, result in zip(page, results):
+            if not self.is_running:
+                break
+            ok = await self.process_message(message, channel_id, result)
+            failed = failed or not ok
+            if not failed:
+                processed += 1
+        return processed
+    
+    async def process_channel(self, channel: dict) -> ChannelScan:
+        """Process all messages from channel"""
+        channel_id = channel['id']
+        started = time.monotonic()
+        messages = 0
+        error = None
+        if not self.is_running:
+            return ChannelScan(channel_id, messages, 0.0)
+            
+        try:
+            try:
+                channel_entity = await self.entities.resolve(self.client, channel_id)
+                messages = await self._scan_history(channel_id, channel_entity)
+            except INVALID_PEER_ERRORS as e:
+                # Cached access hash may be stale, resolve channel once more
+                logger.warning(f"Cached peer of {channel_id} is invalid ({e}), resolving again")
+                self.entities.invalidate(channel_id)
+                channel_entity = await self.entities.resolve(self.client, channel_id)
+                messages = await self._scan_history(channel_id, channel_entity)
                 
         except Exception as e:
-            logger.error(f"Error processing channel {channel_id}: {e}")
+            logger.error(f"Error processing channel {channel_id}: {e}",
+                         extra={'channel': channel_id, 'stage': 'fetch'})
+            error = str(e) or type(e).__name__
+        finally:
+            self.cursors.save()
+        return ChannelScan(channel_id, messages, time.monotonic() - started, error)
+    
+    async def scan_channels(self, channels: List[dict]) -> List[ChannelScan]:
+        """Scan channels as concurrent tasks, bounded by MAX_CONCURRENT_CHANNELS"""
+        semaphore = asyncio.Semaphore(max(1, config.MAX_CONCURRENT_CHANNELS))
+        
+        async def scan(channel: dict) -> ChannelScan:
+            async with semaphore:
+                if not self.is_running:
+                    return ChannelScan(channel['id'], 0, 0.0)
+                logger.info(f"Processing channel: {channel['id']}")
+                return await self.process_channel(channel)
+        
+        return await asyncio.gather(*(scan(channel) for channel in channels))
+    
+    def _log_cycle_summary(self, results: List[ChannelScan], seconds: float):
+        """Log per-channel timings of finished scan cycle"""
+        failed = sum(1 for r in results if r.error)
+        logger.info(f"Scan cycle took {seconds:.1f}s: {len(results)} channels, {failed} failed")
+        for r in sorted(results, key=lambda r: r.seconds, reverse=True):
+            status = f"failed: {r.error}" if r.error else "ok"
+            logger.info(f"  {r.channel_id}: {r.seconds:.1f}s, {r.messages} messages, {status}")
             
     async def run(self):
         """Run parser"""
+        sender_task = None
+        metrics_server = None
         try:
             await self.start()
+            if config.METRICS_PORT:
+                # Supervisor uses the configured port, workers the following ones
+                port = config.METRICS_PORT + (self.shard.index + 1 if self.shard else 0)
+                metrics_server = await metrics.start_metrics_server(config.METRICS_HOST, port)
+                logger.info(f"Serving metrics on http://{config.METRICS_HOST}:{port}/metrics")
+            if self.sender:
+                sender_task = asyncio.create_task(self.sender.run())
+                if len(self.outbox):
+                    logger.info(f"Resuming delivery of {len(self.outbox)} queued messages")
             
             while self.is_running:
-                channels = config.get_channels()
-                now = datetime.now(pytz.UTC)
-                since_date = now - timedelta(days=config.DAYS_TO_PARSE)
-                logger.info(f"Starting new scan cycle. Checking messages from {since_date} to {now}")
+                self._refresh_config()
+                self._wake.clear()
+                channels = self.own_channels(config.get_channels())
+                self.entities.sync(channel['id'] for channel in channels)
+                self.scheduler.configure(*self._schedule_settings())
+                self.scheduler.sync(channels)
+                # Flag starts a profile when set at startup or switched on by reload
+                if config.PROFILE_ENABLED and not self._profile_flag:
+                    self.request_profile()
+                self._profile_flag = config.PROFILE_ENABLED
+                if config.MODE == 'events':
+                    await self.register_event_handlers(channels)
                 
-                for channel in channels:
-                    if not self.is_running:
-                        break
-                    logger.info(f"Processing channel: {channel['id']}")
-                    await self.process_channel(channel)
+                due = self.scheduler.pop_due()
+                # Without channels every pause ends an (empty) cycle, so profiles still finish
+                if due or not channels:
+                    logger.info(f"Starting new scan cycle: {len(due)} of {len(channels)} channels due")
+                    profile = self.profile
+                    if profile and profile.by_cycles and not profile.started:
+                        profile.start()
+                    started = time.monotonic()
+                    before = metrics.registry.snapshot()
+                    results = await self.scan_channels(due)
+                    self._log_cycle_summary(results, time.monotonic() - started)
+                    for line in metrics.cycle_summary(before):
+                        logger.info(line)
+                    for result in results:
+                        self.scheduler.reschedule(result.channel_id)
+                    self.scheduler.save()
+                    if profile and profile.by_cycles:
+                        profile.cycle_finished()
                     
+                next_due = self.scheduler.next_due()
                 if self.is_running:
-                    pause_seconds = config.PAUSE_MINUTES * 60
-                    next_run = datetime.now() + timedelta(minutes=config.PAUSE_MINUTES)
-                    logger.info(f"Finished processing all channels. Next run at: {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
-                    await asyncio.sleep(pause_seconds)
+                    # Without channels check channels.yaml again after the default pause
+                    pause_seconds = (max(0.0, next_due - time.monotonic()) if next_due is not None
+                                     else self.scheduler.default_interval)
+                    next_run = datetime.now() + timedelta(seconds=pause_seconds)
+                    logger.info(f"Next run at: {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), pause_seconds)
+                    except asyncio.TimeoutError:
+                        pass
                 
         finally:
+            if self.profile and self.profile.started:
+                # Keep what was captured until shutdown
+                self.profile.stop()
+            if metrics_server:
+                metrics_server.close()
+            if sender_task:
+                sender_task.cancel()
+                await asyncio.gather(sender_task, return_exceptions=True)
             await self.stop()
             
-def main():
+def main(argv=None):
+    argparse.ArgumentParser(description="Monitor job channels and forward matching vacancies").parse_args(argv)
+    if config.WORKERS > 1:
+        from src.workers import main as run_supervisor
+        run_supervisor([])
+        return
     parser = TelegramParser()
     loop = asyncio.get_event_loop()
     
@@ -179,6 +493,8 @@ def main():
             sig,
             lambda s=sig: asyncio.create_task(parser.shutdown(sig))
         )
+    if hasattr(signal, 'SIGUSR1'):
+        loop.add_signal_handler(signal.SIGUSR1, parser.request_profile)
     
     try:
         loop.run_until_complete(parser.run())
@@ -186,6 +502,7 @@ def main():
         loop.run_until_complete(loop.shutdown_asyncgens())
         loop.close()
         logger.info("Successfully shutdown the parser.")
+        stop_logging()
         sys.exit(0)
 
 if __name__ == "__main__":
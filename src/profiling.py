@@ -0,0 +1,117 @@
+"""On-demand profiling of a running parser.
+
+A profile is started by SIGUSR1 or by `settings.profiling.enabled` and
+covers the next scan cycles (or a number of seconds). While it runs,
+cProfile and tracemalloc are active and the event loop lag is sampled;
+when it ends, the results are written next to the log file:
+
+    profile-<time>.pstats       python -m pstats <file>
+    profile-<time>.tracemalloc  tracemalloc.Snapshot.load(<file>)
+    profile-<time>.lag.csv      event loop lag samples
+
+Nothing is installed while no profile runs, so there is no overhead.
+"""
+import asyncio
+import cProfile
+import csv
+import os
+import pstats
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from src.logger import logger
+
+# Stack frames kept per allocation by tracemalloc
+TRACEMALLOC_FRAMES = 10
+# Functions and allocation sites listed in the log summary
+SUMMARY_LINES = 5
+
+class ProfileSession:
+    """One profile run: cProfile, tracemalloc and event loop lag sampling"""
+
+    def __init__(self, output_dir: Path, name: str = "profile", cycles: int = 1,
+                 seconds: float = 0, lag_interval: float = 0.05):
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        self.output_prefix = output_dir / f"{name}-{stamp}"
+        self.cycles = cycles
+        self.seconds = seconds
+        self.lag_interval = lag_interval
+        self.lag_samples: List[Tuple[float, float]] = []
+        self._profile = cProfile.Profile()
+        self._started_tracemalloc = False
+        self._lag_task: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._cycles_done = 0
+        self.started = False
+        self.finished = False
+
+    @property
+    def by_cycles(self) -> bool:
+        return not self.seconds
+
+    def start(self):
+        """Start profiling, must be called from the event loop"""
+        loop = asyncio.get_running_loop()
+        self.started = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        self._lag_task = loop.create_task(self._sample_lag())
+        if not self.by_cycles:
+            self._timer = loop.call_later(self.seconds, self.stop)
+        self._profile.enable()
+        what = f"{self.cycles} scan cycles" if self.by_cycles else f"{self.seconds:g} seconds"
+        logger.info(f"Profiling next {what}, output {self.output_prefix}.*")
+
+    def cycle_finished(self):
+        """Count finished scan cycle, stop after the requested number"""
+        self._cycles_done += 1
+        if self.by_cycles and self._cycles_done >= self.cycles:
+            self.stop()
+
+    async def _sample_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            self.lag_samples.append((time.time(), max(0.0, loop.time() - expected)))
+
+    def stop(self):
+        """Stop profiling and write results"""
+        if self.finished:
+            return
+        self.finished = True
+        self._profile.disable()
+        if self._timer:
+            self._timer.cancel()
+        if self._lag_task:
+            self._lag_task.cancel()
+        snapshot = tracemalloc.take_snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        os.makedirs(self.output_prefix.parent, exist_ok=True)
+        self._profile.dump_stats(f"{self.output_prefix}.pstats")
+        snapshot.dump(f"{self.output_prefix}.tracemalloc")
+        with open(f"{self.output_prefix}.lag.csv", 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['time', 'lag_seconds'])
+            writer.writerows((f"{t:.3f}", f"{lag:.6f}") for t, lag in self.lag_samples)
+        self._log_summary(snapshot)
+
+    def _log_summary(self, snapshot: tracemalloc.Snapshot):
+        lags = sorted(lag for _, lag in self.lag_samples)
+        if lags:
+            p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+            logger.info(f"Profile finished: event loop lag p50 {lags[len(lags) // 2] * 1000:.1f}ms, "
+                        f"p99 {p99 * 1000:.1f}ms, max {lags[-1] * 1000:.1f}ms")
+        stats = pstats.Stats(self._profile)
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        for (filename, line, function), (_, calls, _, cumulative, _) in top[:SUMMARY_LINES]:
+            logger.info(f"  {cumulative:.3f}s cumulative, {calls} calls: "
+                        f"{function} ({Path(filename).name}:{line})")
+        for stat in snapshot.statistics('lineno')[:SUMMARY_LINES]:
+            logger.info(f"  {stat.size / 1024:.0f} KiB in {stat.count} blocks: {stat.traceback[0]}")
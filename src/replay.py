@@ -0,0 +1,267 @@
+"""Offline replay of a message dump through the parser pipeline.
+
+Dump format is JSON lines, one message per line:
+    {"id": 1, "channel": "@jobs", "date": "2024-11-30T10:00:00+00:00", "text": "..."}
+
+Usage:
+    python -m src.replay messages.jsonl [--latency 0.05] [--flood-every 50] [--workers 2]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import tempfile
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import pytz
+from telethon.errors import FloodWaitError
+
+from src.logger import setup_logger
+from src.parser import TelegramParser
+from src.ratelimit import TokenBucket
+from src.workers import Supervisor, create_worker
+
+PAGE_SIZE = 100
+
+def _channel_peer_id(channel) -> int:
+    """Numeric channel id for dump channel (stable hash for usernames)"""
+    text = str(channel)
+    if text.lstrip('-').isdigit():
+        return abs(int(text)) % 10 ** 10
+    return zlib.crc32(text.encode()) + 10 ** 9
+
+def load_dump(dump_file: Path) -> Dict[str, List[SimpleNamespace]]:
+    """Load messages from JSON lines dump grouped by channel, oldest first"""
+    channels: Dict[str, List[SimpleNamespace]] = defaultdict(list)
+    with open(dump_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            channel = str(record['channel'])
+            date = datetime.fromisoformat(record['date'])
+            if date.tzinfo is None:
+                date = date.replace(tzinfo=pytz.UTC)
+            channels[channel].append(SimpleNamespace(
+                id=int(record['id']),
+                date=date,
+                text=record.get('text') or '',
+                peer_id=SimpleNamespace(channel_id=_channel_peer_id(channel))
+            ))
+    for messages in channels.values():
+        messages.sort(key=lambda m: m.id)
+    return dict(channels)
+
+class StageTimer:
+    """Collects durations per pipeline stage"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def add(self, stage: str, seconds: float):
+        self.samples[stage].append(seconds)
+
+    def wrap(self, stage: str, func):
+        """Wrap coroutine function so each call is timed"""
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - started)
+        return timed
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for stage, samples in self.samples.items():
+            ordered = sorted(samples)
+            result[stage] = {
+                'count': len(samples),
+                'total_s': sum(samples),
+                'mean_ms': statistics.mean(samples) * 1000,
+                'p95_ms': ordered[int(0.95 * (len(ordered) - 1))] * 1000,
+            }
+        return result
+
+class FakeTelegramClient:
+    """Local stand-in for TelegramClient serving messages from a dump"""
+
+    def __init__(self, channels: Dict[str, List[SimpleNamespace]],
+                 latency: float = 0.0, flood_every: int = 0, flood_seconds: int = 0,
+                 timer: Optional[StageTimer] = None, honor_dates: bool = False):
+        self.channels = channels
+        # Dumps are usually older than days_to_parse, so offset_date is ignored by default
+        self.honor_dates = honor_dates
+        self.latency = latency
+        self.flood_every = flood_every
+        self.flood_seconds = flood_seconds
+        self.timer = timer or StageTimer()
+        self.sent: List[tuple] = []
+        self.flood_waits = 0
+        self._send_calls = 0
+        self._by_peer_id = {_channel_peer_id(name): name for name in channels}
+
+    async def start(self):
+        pass
+
+    async def disconnect(self):
+        pass
+
+    def add_event_handler(self, callback, event=None):
+        pass
+
+    def remove_event_handler(self, callback, event=None):
+        pass
+
+    async def _delay(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get_entity(self, channel_id):
+        await self._delay()
+        name = str(channel_id)
+        if name not in self.channels:
+            raise ValueError(f"Cannot find any entity corresponding to \"{channel_id}\"")
+        return SimpleNamespace(id=_channel_peer_id(name), access_hash=0, username=name)
+
+    def _before_offset(self, message, offset_date, reverse: bool) -> bool:
+        """offset_date selects messages after it when reversed, before it otherwise"""
+        if offset_date is None or not self.honor_dates:
+            return True
+        return message.date >= offset_date if reverse else message.date < offset_date
+
+    async def iter_messages(self, entity, offset_date=None, min_id: int = 0, max_id: int = 0,
+                            reverse: bool = False, limit: Optional[int] = None):
+        name = self._by_peer_id[getattr(entity, 'id', getattr(entity, 'channel_id', None))]
+        messages = [
+            m for m in self.channels[name]
+            if m.id > (min_id or 0) and (not max_id or m.id < max_id)
+            and self._before_offset(m, offset_date, reverse)
+        ]
+        if not reverse:
+            messages.reverse()
+        if limit is not None:
+            messages = messages[:limit]
+        # One simulated history request per page
+        for start in range(0, len(messages), PAGE_SIZE):
+            started = time.perf_counter()
+            await self._delay()
+            self.timer.add('fetch_page', time.perf_counter() - started)
+            for message in messages[start:start + PAGE_SIZE]:
+                yield message
+
+    async def send_message(self, entity, message, **kwargs):
+        await self._delay()
+        self._send_calls += 1
+        if self.flood_every and self._send_calls % self.flood_every == 0:
+            self.flood_waits += 1
+            raise FloodWaitError(request=None, capture=self.flood_seconds)
+        self.sent.append((entity, message))
+
+async def replay(dump_file: Path, latency: float = 0.0, flood_every: int = 0,
+                 flood_seconds: int = 0, send_rate: Optional[float] = None,
+                 data_dir: Optional[Path] = None, workers: int = 1) -> Dict:
+    """Run dump through process_channel and the sender, return report.
+
+    With `workers` > 1 channels are sharded between worker parsers sharing
+    cache and outbox, and delivered by the supervisor's sender, as in
+    src.workers but within one process.
+    """
+    channels = load_dump(dump_file)
+    timer = StageTimer()
+    client = FakeTelegramClient(channels, latency, flood_every, flood_seconds, timer)
+    channel_list = [{'id': name} for name in channels]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        state_dir = data_dir or Path(tmp_dir)
+        if workers > 1:
+            supervisor = Supervisor(workers, client=client, data_dir=state_dir,
+                                    target_channel='replay')
+            parsers = [create_worker(index, workers, client, state_dir, 'replay')
+                       for index in range(workers)]
+            sender = supervisor.sender
+        else:
+            parsers = [TelegramParser(client=client, target_channel='replay', data_dir=state_dir)]
+            sender = parsers[0].sender
+        for parser in parsers:
+            parser.process_message = timer.wrap('process_message', parser.process_message)
+        # Sender rate limit is skipped unless requested, to measure the pipeline itself
+        sender.bucket = TokenBucket(send_rate or 1e9, send_rate or 1e9)
+        sender.backoff_base = 0
+
+        started = time.perf_counter()
+        scans = await asyncio.gather(*(
+            parser.scan_channels(parser.own_channels(channel_list)) for parser in parsers
+        ))
+        results = [result for scan in scans for result in scan]
+        scanned = time.perf_counter() - started
+
+        deliver = timer.wrap('deliver', sender.deliver)
+        while len(sender.outbox):
+            await deliver(sender.outbox.peek()[0])
+        elapsed = time.perf_counter() - started
+        for parser in parsers:
+            parser.outbox.close()
+            parser.cache.close()
+        if workers > 1:
+            sender.outbox.close()
+            sender.cache.close()
+
+    total = sum(r.messages for r in results)
+    return {
+        'channels': len(channels),
+        'messages': total,
+        'scan_seconds': scanned,
+        'total_seconds': elapsed,
+        'messages_per_second': total / scanned if scanned else 0.0,
+        'sent': len(client.sent),
+        'flood_waits': client.flood_waits,
+        'failed_channels': [r.channel_id for r in results if r.error],
+        'stages': timer.summary(),
+    }
+
+def print_report(report: Dict):
+    print(f"Channels:        {report['channels']}")
+    print(f"Messages:        {report['messages']}")
+    print(f"Scan time:       {report['scan_seconds']:.3f}s "
+          f"({report['messages_per_second']:.0f} messages/sec)")
+    print(f"Total time:      {report['total_seconds']:.3f}s")
+    print(f"Sent:            {report['sent']}")
+    print(f"FloodWaits:      {report['flood_waits']}")
+    if report['failed_channels']:
+        print(f"Failed channels: {', '.join(report['failed_channels'])}")
+    print("Stages:")
+    for stage, stats in report['stages'].items():
+        print(f"  {stage:16} {stats['count']:>8} calls  mean {stats['mean_ms']:.3f}ms  "
+              f"p95 {stats['p95_ms']:.3f}ms  total {stats['total_s']:.3f}s")
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Replay message dump through the parser offline")
+    arg_parser.add_argument('dump', type=Path, help="JSON lines file with id, channel, date, text")
+    arg_parser.add_argument('--latency', type=float, default=0.0, help="Simulated API latency in seconds")
+    arg_parser.add_argument('--flood-every', type=int, default=0, help="Raise FloodWait on every Nth send")
+    arg_parser.add_argument('--flood-seconds', type=int, default=0, help="FloodWait duration in seconds")
+    arg_parser.add_argument('--send-rate', type=float, help="Sender rate limit, messages per second")
+    arg_parser.add_argument('--workers', type=int, default=1, help="Shard channels between N workers")
+    arg_parser.add_argument('--json', action='store_true', help="Print report as JSON")
+    arg_parser.add_argument('--verbose', action='store_true', help="Keep parser logging")
+    args = arg_parser.parse_args(argv)
+
+    if not args.verbose:
+        setup_logger().setLevel(logging.WARNING)
+    report = asyncio.run(replay(args.dump, args.latency, args.flood_every,
+                                args.flood_seconds, args.send_rate, workers=args.workers))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
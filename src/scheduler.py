@@ -0,0 +1,145 @@
+import heapq
+import json
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Recent message timestamps kept per channel to estimate its posting rate
+RATE_WINDOW = 20
+
+class ChannelScheduler:
+    """Per-channel polling schedule, a heap of channels by next due time.
+
+    With `adaptive` each channel is polled about once per expected new
+    message: the interval is the mean gap between its recent messages
+    (counting the silence since the newest one), kept within min/max
+    bounds. Otherwise every channel uses the default interval. Channels
+    may override the interval (`interval_minutes`) or its bounds
+    (`min_minutes`, `max_minutes`) in job_channels.
+
+    Recent timestamps are stored next to the cursors, so rates survive
+    restarts; due times do not, all channels are scanned at startup.
+    """
+
+    def __init__(self, state_file: Path, default_interval: float, min_interval: float,
+                 max_interval: float, adaptive: bool = True):
+        self.state_file = state_file
+        self.configure(default_interval, min_interval, max_interval, adaptive)
+        self.history: Dict[str, Deque[float]] = self._load()
+        self.channels: Dict[str, dict] = {}
+        self._due: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._dirty = False
+
+    def configure(self, default_interval: float, min_interval: float, max_interval: float,
+                  adaptive: bool):
+        """Apply (reloaded) settings, intervals in seconds"""
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.adaptive = adaptive
+
+    def _load(self) -> Dict[str, Deque[float]]:
+        if not self.state_file.exists():
+            return {}
+        try:
+            with open(self.state_file, 'r') as f:
+                data = json.load(f)
+            return {str(channel_id): deque(sorted(map(float, stamps))[-RATE_WINDOW:],
+                                           maxlen=RATE_WINDOW)
+                    for channel_id, stamps in data.items()}
+        except (OSError, ValueError, TypeError, AttributeError):
+            return {}
+
+    def save(self):
+        """Atomically write recent timestamps if changed"""
+        if not self._dirty:
+            return
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.state_file.with_name(self.state_file.name + ".tmp")
+        with open(tmp_file, 'w') as f:
+            json.dump({channel_id: list(stamps) for channel_id, stamps in self.history.items()}, f)
+        os.replace(tmp_file, self.state_file)
+        self._dirty = False
+
+    def sync(self, channels: List[dict], now: Optional[float] = None):
+        """Follow configured channels: new ones are due at once, removed ones dropped"""
+        now = time.monotonic() if now is None else now
+        self.channels = {str(channel['id']): channel for channel in channels}
+        for channel_id in self.channels:
+            if channel_id not in self._due:
+                self._push(channel_id, now)
+        for channel_id in list(self._due):
+            if channel_id not in self.channels:
+                # Heap entry is skipped when popped
+                del self._due[channel_id]
+        for channel_id in list(self.history):
+            if channel_id not in self.channels:
+                del self.history[channel_id]
+                self._dirty = True
+
+    def _push(self, channel_id: str, due: float):
+        self._due[channel_id] = due
+        heapq.heappush(self._heap, (due, channel_id))
+
+    def _drop_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def next_due(self) -> Optional[float]:
+        """Monotonic time the next channel is due, None without channels"""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: Optional[float] = None) -> List[dict]:
+        """Channels due by now, in order of due time; reschedule() puts them back"""
+        now = time.monotonic() if now is None else now
+        due = []
+        while self.next_due() is not None and self._heap[0][0] <= now:
+            _, channel_id = heapq.heappop(self._heap)
+            del self._due[channel_id]
+            due.append(self.channels[channel_id])
+        return due
+
+    def expedite(self, now: Optional[float] = None):
+        """Make all channels due now"""
+        now = time.monotonic() if now is None else now
+        for channel_id in list(self._due):
+            self._push(channel_id, now)
+
+    def observe(self, channel_id, timestamp: float):
+        """Record date (unix time) of a new message of channel"""
+        stamps = self.history.setdefault(str(channel_id), deque(maxlen=RATE_WINDOW))
+        if stamps and timestamp < stamps[-1]:
+            return
+        stamps.append(timestamp)
+        self._dirty = True
+
+    def rate(self, channel_id, now: Optional[float] = None) -> Optional[float]:
+        """Estimated messages per second, None before anything was observed"""
+        stamps = self.history.get(str(channel_id))
+        if not stamps:
+            return None
+        now = time.time() if now is None else now
+        return len(stamps) / max(now - stamps[0], 1.0)
+
+    def interval(self, channel_id, now: Optional[float] = None) -> float:
+        """Seconds until channel should be polled again"""
+        channel = self.channels.get(str(channel_id), {})
+        if 'interval_minutes' in channel:
+            return channel['interval_minutes'] * 60
+        low = channel.get('min_minutes', self.min_interval / 60) * 60
+        high = max(low, channel.get('max_minutes', self.max_interval / 60) * 60)
+        rate = self.rate(channel_id, now) if self.adaptive else None
+        interval = 1 / rate if rate else self.default_interval
+        return min(max(interval, low), high) if self.adaptive else interval
+
+    def reschedule(self, channel_id, now: Optional[float] = None) -> float:
+        """Schedule next poll of scanned channel, return interval in seconds"""
+        channel_id = str(channel_id)
+        interval = self.interval(channel_id)
+        if channel_id in self.channels:
+            self._push(channel_id, (time.monotonic() if now is None else now) + interval)
+        return interval
@@ -0,0 +1,130 @@
+import importlib.util
+import re
+from typing import Dict, List, Sequence, Tuple
+
+# Weight of stop words that have no explicit weight
+DEFAULT_STOP_WEIGHT = -10.0
+# Longest keyword phrase, in words, that is turned into a feature
+MAX_NGRAM = 4
+
+# Words keep + # and dots but not trailing dots, so "c++", "c#" and
+# "node.js" stay distinct terms like in keyword matching
+_TOKEN_RE = re.compile(r'[\w+#.]*[\w+#]')
+# Multiplier combining word hashes into n-gram hashes, modulo 2**64
+_NGRAM_MULTIPLIER = 1000003
+_HASH_MASK = (1 << 64) - 1
+
+def scoring_available() -> bool:
+    # numpy is optional and slow to import, check without importing it
+    return importlib.util.find_spec('numpy') is not None
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+def _term_hash(tokens: List[str]) -> int:
+    """Hash of a word n-gram, the same as computed for texts in score_batch"""
+    value = 0
+    for index, token in enumerate(tokens):
+        token_hash = hash(token) & _HASH_MASK
+        value = token_hash if index == 0 else (value * _NGRAM_MULTIPLIER + token_hash) & _HASH_MASK
+    return value
+
+class TermScorer:
+    """Linear relevance model over hashed word n-gram features.
+
+    Every text becomes the set of hashes of its word n-grams. The words of
+    a whole batch are hashed into one array and n-gram hashes are combined
+    from it with array operations, so the Python work per text is a single
+    regex split. Weighted terms are kept as a sorted hash array and looked
+    up with one searchsorted and one bincount instead of a loop per keyword.
+    Hashes are only compared within one process, so the built-in
+    (per-process salted) string hash is enough.
+    """
+
+    def __init__(self, weights: Dict[str, float], threshold: float = 1.0, bias: float = 0.0):
+        if not scoring_available():
+            raise ImportError("Relevance scoring requires numpy")
+        import numpy as np
+        self.threshold = threshold
+        self.bias = bias
+
+        # Normalize terms the same way as texts, later weights of equal terms win
+        normalized: Dict[str, float] = {}
+        for term, weight in weights.items():
+            key = ' '.join(_tokens(term))
+            if key:
+                normalized[key] = float(weight)
+        self.max_ngram = min(MAX_NGRAM, max((key.count(' ') + 1 for key in normalized), default=1))
+
+        ordered = sorted(
+            ((_term_hash(term.split(' ')), position, term, weight)
+             for position, (term, weight) in enumerate(normalized.items())),
+            key=lambda entry: entry[0]
+        )
+        self._hashes = np.array([entry[0] for entry in ordered], dtype=np.uint64)
+        self._order = [entry[1] for entry in ordered]
+        self._terms = [entry[2] for entry in ordered]
+        self._weights = np.array([entry[3] for entry in ordered], dtype=np.float64)
+
+    def _features(self, texts: Sequence[str]):
+        """Rows and hashes of word n-grams of all texts"""
+        import numpy as np
+        tokens: List[str] = []
+        counts: List[int] = []
+        for text in texts:
+            text_tokens = _tokens(text)
+            tokens.extend(text_tokens)
+            counts.append(len(text_tokens))
+        words = np.fromiter(map(hash, tokens), dtype=np.int64, count=len(tokens)).view(np.uint64)
+        rows = np.repeat(np.arange(len(texts)), counts)
+
+        features, feature_rows = [words], [rows]
+        grams = words
+        multiplier = np.uint64(_NGRAM_MULTIPLIER)
+        for n in range(2, self.max_ngram + 1):
+            # Extend each (n-1)-gram by the following word, within the same text
+            grams = grams[:-1] * multiplier + words[n - 1:]
+            same_text = rows[:len(grams)] == rows[n - 1:]
+            features.append(grams[same_text])
+            feature_rows.append(rows[:len(grams)][same_text])
+        return np.concatenate(feature_rows), np.concatenate(features)
+
+    def score_batch(self, texts: Sequence[str]) -> Tuple[List[float], List[List[str]]]:
+        """Scores of texts and their positively weighted terms, in configured order"""
+        import numpy as np
+        scores = np.full(len(texts), self.bias, dtype=np.float64)
+        terms: List[List[str]] = [[] for _ in texts]
+        if not texts or not len(self._hashes):
+            return scores.tolist(), terms
+
+        row_array, feature_array = self._features(texts)
+        positions = np.searchsorted(self._hashes, feature_array)
+        positions[positions == len(self._hashes)] = 0
+        hit = self._hashes[positions] == feature_array
+        # A term counts once per text however often it occurs
+        hits = np.unique(row_array[hit] * len(self._hashes) + positions[hit])
+        hit_rows, hit_positions = hits // len(self._hashes), hits % len(self._hashes)
+        scores += np.bincount(hit_rows, weights=self._weights[hit_positions], minlength=len(texts))
+
+        positive = self._weights[hit_positions] > 0
+        for row, position in sorted(zip(hit_rows[positive].tolist(), hit_positions[positive].tolist()),
+                                    key=lambda pair: (pair[0], self._order[pair[1]])):
+            terms[row].append(self._terms[position])
+        return scores.tolist(), terms
+
+def build_scorer(keywords: Dict) -> TermScorer:
+    """Compile `keywords.scoring` section of channels.yaml.
+
+    Positions and stop words take part with weight 1 and stop_weight
+    unless `weights` gives them (or other terms) explicit weights.
+    """
+    scoring = keywords.get('scoring', {})
+    stop_weight = scoring.get('stop_weight', DEFAULT_STOP_WEIGHT)
+    weights: Dict[str, float] = {}
+    for word in keywords['positions']:
+        weights[word] = 1.0
+    for word in keywords['stop_words']:
+        weights[word] = stop_weight
+    weights.update(scoring.get('weights', {}))
+    return TermScorer(weights, threshold=scoring.get('threshold', 1.0),
+                      bias=scoring.get('bias', 0.0))
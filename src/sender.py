@@ -0,0 +1,213 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Sequence
+from telethon.errors import FloodWaitError
+
+from src.config import config
+from src.cache import MessageCache
+from src.dedup import NearDuplicateIndex, hamming_distance
+from src.digest import build_digests, is_full
+from src.logger import logger
+from src import metrics
+from src.outbox import Outbox, OutboxItem
+from src.ratelimit import TokenBucket
+
+# Pending items considered for one round of digests
+DIGEST_BATCH_SIZE = 200
+
+class MessageSender:
+    """Drains the outbox into the target channels under a rate limit"""
+
+    def __init__(self, client, outbox: Outbox, cache: MessageCache, target_channel,
+                 duplicates: Optional[NearDuplicateIndex] = None,
+                 poll_interval: Optional[float] = None):
+        """Create sender.
+
+        Items of routes go to the route's target, others to `target_channel`.
+        `duplicates` suppresses near-duplicates at delivery time, so one index
+        covers all channels even when they are scanned by separate workers;
+        every route gets its own index next to it.
+        `poll_interval` is needed when other processes put to the outbox.
+        """
+        self.client = client
+        self.outbox = outbox
+        self.cache = cache
+        self.target_channel = target_channel
+        self.duplicates = duplicates
+        self._route_duplicates: Dict[str, NearDuplicateIndex] = {}
+        self.poll_interval = poll_interval
+        self.bucket = TokenBucket(config.SEND_RATE_PER_MINUTE / 60, config.SEND_BURST)
+        self.max_retries = config.MAX_RETRIES
+        self.backoff_base = 2.0
+        self.digest = config.DIGEST_ENABLED
+        self.group_by = config.DIGEST_GROUP_BY
+        self.flush_interval = config.DIGEST_FLUSH_INTERVAL
+        self.max_latency = config.DIGEST_MAX_LATENCY
+        self.is_running = True
+
+    def stop(self):
+        self.is_running = False
+
+    async def run(self):
+        """Send queued messages until stopped"""
+        while self.is_running:
+            items = self.outbox.peek(DIGEST_BATCH_SIZE if self.digest else 1)
+            if not items:
+                await self.outbox.wait(self.poll_interval)
+                continue
+            if not self.digest:
+                await self.deliver(items[0])
+                continue
+            delay = self._digest_delay(items)
+            if delay > 0:
+                # New items may fill the digest earlier, so wait on the outbox
+                timeout = delay if self.poll_interval is None else min(delay, self.poll_interval)
+                await self.outbox.wait(timeout)
+                continue
+            await self.deliver_digest(items)
+
+    def _digest_delay(self, items: List[OutboxItem]) -> float:
+        """Seconds until pending items should be sent as digest.
+
+        Digest is sent once no new match arrived for flush_interval, when
+        the oldest match waited max_latency, or when it is already full.
+        """
+        if any('entry' not in item.payload for item in items) or is_full(items):
+            return 0.0
+        newest = max(item.created for item in items)
+        oldest = min(item.created for item in items)
+        due = min(newest + self.flush_interval, oldest + self.max_latency)
+        return due - time.time()
+
+    def _target(self, item: OutboxItem):
+        return item.payload.get('target', self.target_channel)
+
+    def _duplicates_of(self, item: OutboxItem) -> Optional[NearDuplicateIndex]:
+        """Near-duplicate index of item's route, the same vacancy may go to every route once"""
+        route = item.payload.get('route')
+        if self.duplicates is None or route is None:
+            return self.duplicates
+        index = self._route_duplicates.get(route)
+        if index is None:
+            index_file = self.duplicates.index_file
+            index = NearDuplicateIndex(index_file.with_name(f"{index_file.stem}.{route}{index_file.suffix}"))
+            self._route_duplicates[route] = index
+        return index
+
+    def _save_duplicates(self):
+        if self.duplicates is not None:
+            self.duplicates.save()
+        for index in self._route_duplicates.values():
+            index.save()
+
+    def _is_near_duplicate(self, item: OutboxItem, pending: Sequence[OutboxItem] = ()) -> bool:
+        """Check item against delivered fingerprints and items `pending` in the same digest"""
+        fingerprint = item.payload.get('fingerprint')
+        duplicates = self._duplicates_of(item)
+        if duplicates is None or fingerprint is None:
+            return False
+        route = item.payload.get('route')
+        with metrics.stage_seconds.time('near_dedup'):
+            if duplicates.contains(fingerprint):
+                return True
+            return any(
+                hamming_distance(fingerprint, other.payload['fingerprint']) <= duplicates.max_distance
+                for other in pending
+                if 'fingerprint' in other.payload and other.payload.get('route') == route
+            )
+
+    def _done(self, item: OutboxItem):
+        """Mark item as processed and remove it from the outbox"""
+        with metrics.stage_seconds.time('cache'):
+            self.cache.add_message(item.message_id, item.channel_id, item.payload.get('route'))
+            self.outbox.ack(item.id)
+
+    def _skip_duplicate(self, item: OutboxItem):
+        # Same vacancy was already delivered from this or another channel
+        channel = item.payload.get('channel', str(item.channel_id))
+        metrics.messages_deduplicated.inc(channel, 'near_duplicate')
+        logger.info(f"Skipping near-duplicate message {item.message_id} in {channel}",
+                    extra={'channel': channel, 'message_id': item.message_id, 'stage': 'near_dedup'})
+        self._done(item)
+
+    def _delivered(self, item: OutboxItem):
+        # Mark as processed only after successful delivery
+        self._done(item)
+        duplicates = self._duplicates_of(item)
+        if duplicates is not None and 'fingerprint' in item.payload:
+            duplicates.add(item.payload['fingerprint'])
+        metrics.messages_sent.inc(item.payload.get('channel', str(item.channel_id)))
+
+    async def _send(self, text: str, parse_mode: str, items: List[OutboxItem],
+                    description: str, log_fields: dict) -> bool:
+        """Send text covering `items` of one target, return False if it has to be retried"""
+        with metrics.stage_seconds.time('rate_limit'):
+            await self.bucket.acquire()
+        try:
+            with metrics.stage_seconds.time('send'):
+                await self.client.send_message(
+                    self._target(items[0]),
+                    text,
+                    parse_mode=parse_mode,
+                    link_preview=False
+                )
+        except FloodWaitError as e:
+            # Only the sender pauses, scanning continues
+            logger.warning(f"Hit flood limit, sender waiting {e.seconds} seconds", extra=log_fields)
+            metrics.flood_wait_seconds.inc('send', amount=e.seconds)
+            await asyncio.sleep(e.seconds)
+            return False
+        except Exception as e:
+            attempts = max(self.outbox.record_failure(item.id) for item in items)
+            if attempts >= self.max_retries:
+                logger.error(f"Giving up on {description} after {attempts} attempts: {e}",
+                             extra=log_fields)
+                for item in items:
+                    self.outbox.mark_failed(item.id)
+            else:
+                delay = self.backoff_base ** attempts
+                logger.warning(f"Error sending {description}: {e}, retrying in {delay:.0f}s",
+                               extra=log_fields)
+                await asyncio.sleep(delay)
+            return False
+        return True
+
+    async def deliver(self, item: OutboxItem) -> bool:
+        """Send single outbox item, return False if it has to be retried"""
+        channel = item.payload.get('channel', str(item.channel_id))
+        log_fields = {'channel': channel, 'message_id': item.message_id, 'stage': 'send'}
+        if self._is_near_duplicate(item):
+            self._skip_duplicate(item)
+            return True
+        description = f"message {item.message_id} from {channel}"
+        if not await self._send(item.payload['text'], 'markdown', [item], description, log_fields):
+            return False
+        self._delivered(item)
+        self._save_duplicates()
+        return True
+
+    async def deliver_digest(self, items: List[OutboxItem]) -> bool:
+        """Send items as digest messages, return False if some have to be retried"""
+        entries: List[OutboxItem] = []
+        for item in items:
+            if 'entry' not in item.payload:
+                # Queued before digest mode was enabled
+                if not await self.deliver(item):
+                    return False
+            elif self._is_near_duplicate(item, entries):
+                self._skip_duplicate(item)
+            else:
+                entries.append(item)
+
+        try:
+            for part in build_digests(entries, self.group_by):
+                description = f"digest of {len(part.items)} messages"
+                if not await self._send(part.text, 'html', part.items, description, {'stage': 'send'}):
+                    return False
+                # Included messages are marked only now that the digest is delivered
+                for item in part.items:
+                    self._delivered(item)
+                logger.info(f"Sent {description}")
+        finally:
+            self._save_duplicates()
+        return True
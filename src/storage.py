@@ -0,0 +1,604 @@
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import struct
+import zlib
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.idset import IdRun, MessageIdSet, to_little_endian
+
+# Append-only stores are compacted once they hold this many records
+# and more than twice the number of live entries
+MIN_COMPACTION_RECORDS = 1000
+# Characters read at a time when streaming a JSON cache
+JSON_CHUNK_SIZE = 1 << 16
+# Bucket size of binary stores written without a cache TTL (migration, import)
+DEFAULT_BUCKET_SECONDS = 3600
+
+def _atomic_write(path: Path, write, binary: bool = False):
+    """Write file through temporary file and atomic rename"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_name(path.name + ".tmp")
+    with (open(tmp_file, 'wb') if binary else open(tmp_file, 'w', encoding='utf-8')) as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+def _iter_json_object(f) -> Iterator[Tuple[str, object]]:
+    """Stream key/value pairs of a flat JSON object without loading the whole file"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+
+    def read_more():
+        nonlocal buffer, pos, eof
+        chunk = f.read(JSON_CHUNK_SIZE)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+    def next_char() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buffer) or eof:
+                return buffer[pos] if pos < len(buffer) else ''
+            read_more()
+
+    def next_value():
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # A value ending at the buffer end may be a number cut in half
+                if end < len(buffer) or eof:
+                    pos = end
+                    return value
+            except ValueError:
+                if eof:
+                    raise
+            read_more()
+
+    if next_char() != '{':
+        raise ValueError("not a JSON object")
+    pos += 1
+    if next_char() == '}':
+        return
+    while True:
+        next_char()
+        key = next_value()
+        if next_char() != ':':
+            raise ValueError(f"expected ':' after {key!r}")
+        pos += 1
+        next_char()
+        yield key, next_value()
+        separator = next_char()
+        pos += 1
+        if separator == '}':
+            return
+        if separator != ',':
+            raise ValueError(f"expected ',' or '}}' after {key!r}")
+
+def _parse_line(line: str) -> Optional[Tuple[str, int]]:
+    """Record of a JSON lines store, None for a line torn by a crash mid-write"""
+    try:
+        record = json.loads(line)
+        return record['k'], record['t']
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return None
+
+def _iter_json_lines(f) -> Iterator[Tuple[str, int]]:
+    for line in f:
+        record = _parse_line(line)
+        if record is not None:
+            yield record
+
+class CacheStorage(ABC):
+    """Base class for MessageCache persistence backends"""
+
+    suffix = ".json"
+    # True if add() persists single entry without rewriting everything
+    incremental = False
+    # True if other processes may write to the store, so lookups read through
+    shared = False
+
+    def __init__(self, path: Path):
+        self.path = path
+        # Number of records currently kept on disk, including stale ones
+        self.stored = 0
+
+    @abstractmethod
+    def load(self) -> Dict[str, int]:
+        """Stored entries"""
+
+    def add(self, key: str, timestamp: int):
+        """Persist single entry, for incremental stores only"""
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[int]:
+        """Timestamp of stored entry, for shared stores only"""
+        return None
+
+    @abstractmethod
+    def save(self, entries: Dict[str, int]):
+        """Replace stored entries"""
+
+    def needs_compaction(self, live_entries: int) -> bool:
+        return self.stored >= MIN_COMPACTION_RECORDS and self.stored > 2 * live_entries
+
+    @abstractmethod
+    def iter_entries(self) -> Iterator[Tuple[str, int]]:
+        """Stream stored records without loading them all into memory"""
+
+    @abstractmethod
+    def retain(self, keep: Callable[[str, int], bool]) -> int:
+        """Remove records for which keep() is false, return number removed"""
+
+    @abstractmethod
+    def merge(self, entries: Iterable[Tuple[str, int]]) -> int:
+        """Add or replace entries, return number of records written"""
+
+    def verify(self) -> List[str]:
+        """Problems with the stored file, empty if it is intact"""
+        problems = []
+        try:
+            for _ in self.iter_entries():
+                pass
+        except (OSError, ValueError) as e:
+            problems.append(f"cannot read {self.path.name}: {e}")
+        return problems
+
+    def files(self) -> List[Path]:
+        """Files holding the store"""
+        return [self.path]
+
+    def close(self):
+        pass
+
+class JsonStorage(CacheStorage):
+    """Whole cache as a single JSON object, rewritten on every save"""
+
+    def load(self) -> Dict[str, int]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f)
+        except json.JSONDecodeError:
+            return {}
+        self.stored = len(entries)
+        return entries
+
+    def save(self, entries: Dict[str, int]):
+        _atomic_write(self.path, lambda f: json.dump(entries, f))
+        self.stored = len(entries)
+
+    def iter_entries(self) -> Iterator[Tuple[str, int]]:
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            yield from _iter_json_object(f)
+
+    def retain(self, keep: Callable[[str, int], bool]) -> int:
+        if not self.path.exists():
+            return 0
+        removed = 0
+
+        def write(f):
+            nonlocal removed
+            separator = ''
+            f.write('{')
+            for key, timestamp in self.iter_entries():
+                if keep(key, timestamp):
+                    f.write(f"{separator}{json.dumps(key)}: {json.dumps(timestamp)}")
+                    separator = ', '
+                else:
+                    removed += 1
+            f.write('}')
+
+        _atomic_write(self.path, write)
+        return removed
+
+    def merge(self, entries: Iterable[Tuple[str, int]]) -> int:
+        # The parser holds a JSON cache in memory anyway, so it fits here too
+        stored = self.load()
+        count = 0
+        for key, timestamp in entries:
+            stored[key] = timestamp
+            count += 1
+        self.save(stored)
+        return count
+
+class LogStorage(CacheStorage):
+    """Append-only JSON lines log with periodic atomic compaction"""
+
+    suffix = ".jsonl"
+    incremental = True
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self._file = None
+
+    def load(self) -> Dict[str, int]:
+        entries: Dict[str, int] = {}
+        for key, timestamp in self.iter_entries():
+            entries[key] = timestamp
+            self.stored += 1
+        self._drop_torn_tail()
+        return entries
+
+    def _drop_torn_tail(self):
+        """Truncate a record torn by a crash, so the next append starts a new line"""
+        if not self.path.exists():
+            return
+        with open(self.path, 'r+b') as f:
+            end = f.seek(0, os.SEEK_END)
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+            # Look for the last complete line backwards, a block at a time
+            position = end
+            while position > 0:
+                start = max(position - JSON_CHUNK_SIZE, 0)
+                f.seek(start)
+                newline = f.read(position - start).rfind(b"\n")
+                if newline >= 0:
+                    f.truncate(start + newline + 1)
+                    return
+                position = start
+            f.truncate(0)
+
+    def iter_entries(self) -> Iterator[Tuple[str, int]]:
+        # Later records of a key replace earlier ones on load
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            yield from _iter_json_lines(f)
+
+    def _append_handle(self):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._drop_torn_tail()
+            self._file = open(self.path, 'a', encoding='utf-8')
+        return self._file
+
+    def add(self, key: str, timestamp: int):
+        f = self._append_handle()
+        f.write(json.dumps({'k': key, 't': timestamp}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+        self.stored += 1
+
+    def save(self, entries: Dict[str, int]):
+        self.close()
+
+        def write(f):
+            for key, timestamp in entries.items():
+                f.write(json.dumps({'k': key, 't': timestamp}) + "\n")
+
+        _atomic_write(self.path, write)
+        self.stored = len(entries)
+
+    def retain(self, keep: Callable[[str, int], bool]) -> int:
+        if not self.path.exists():
+            return 0
+        self.close()
+        removed = 0
+        kept = 0
+
+        def write(f):
+            nonlocal removed, kept
+            with open(self.path, 'r', encoding='utf-8') as source:
+                for line in source:
+                    record = _parse_line(line)
+                    if record is not None and keep(*record):
+                        f.write(line if line.endswith("\n") else line + "\n")
+                        kept += 1
+                    else:
+                        removed += 1
+
+        _atomic_write(self.path, write)
+        self.stored = kept
+        return removed
+
+    def merge(self, entries: Iterable[Tuple[str, int]]) -> int:
+        f = self._append_handle()
+        count = 0
+        for key, timestamp in entries:
+            f.write(json.dumps({'k': key, 't': timestamp}) + "\n")
+            count += 1
+        f.flush()
+        os.fsync(f.fileno())
+        self.stored += count
+        return count
+
+    def verify(self) -> List[str]:
+        if not self.path.exists():
+            return []
+        with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+            torn = sum(1 for line in f if _parse_line(line) is None)
+        return [f"{torn} unreadable lines in {self.path.name}"] if torn else []
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class SqliteStorage(CacheStorage):
+    """SQLite database in WAL mode, one row per cached message"""
+
+    suffix = ".db"
+    incremental = True
+    shared = True
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS messages (key TEXT PRIMARY KEY, ts INTEGER NOT NULL)"
+        )
+        self._db.commit()
+
+    def load(self) -> Dict[str, int]:
+        entries = dict(self._db.execute("SELECT key, ts FROM messages ORDER BY ts"))
+        self.stored = len(entries)
+        return entries
+
+    def add(self, key: str, timestamp: int):
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO messages (key, ts) VALUES (?, ?)", (key, timestamp)
+            )
+        self.stored += 1
+
+    def get(self, key: str) -> Optional[int]:
+        row = self._db.execute("SELECT ts FROM messages WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def save(self, entries: Dict[str, int]):
+        with self._db:
+            self._db.execute("DELETE FROM messages")
+            self._db.executemany(
+                "INSERT INTO messages (key, ts) VALUES (?, ?)", entries.items()
+            )
+        self.stored = len(entries)
+
+    def iter_entries(self) -> Iterator[Tuple[str, int]]:
+        # Cursor fetches rows as they are consumed
+        yield from self._db.execute("SELECT key, ts FROM messages")
+
+    def retain(self, keep: Callable[[str, int], bool]) -> int:
+        self._db.create_function('keep_entry', 2, lambda key, ts: bool(keep(key, ts)))
+        with self._db:
+            removed = self._db.execute("DELETE FROM messages WHERE NOT keep_entry(key, ts)").rowcount
+        if removed:
+            # Return freed pages to the file system
+            self._db.execute("VACUUM")
+        self.stored -= removed
+        return removed
+
+    def merge(self, entries: Iterable[Tuple[str, int]]) -> int:
+        with self._db:
+            count = self._db.executemany(
+                "INSERT OR REPLACE INTO messages (key, ts) VALUES (?, ?)", entries
+            ).rowcount
+        self.stored += count
+        return count
+
+    def verify(self) -> List[str]:
+        rows = [row[0] for row in self._db.execute("PRAGMA integrity_check")]
+        return [] if rows == ['ok'] else [f"{self.path.name}: {row}" for row in rows]
+
+    def files(self) -> List[Path]:
+        return [self.path, self.path.with_name(self.path.name + "-wal"),
+                self.path.with_name(self.path.name + "-shm")]
+
+    def close(self):
+        self._db.close()
+
+class BinaryStorage(CacheStorage):
+    """Message ids in compact per-channel arrays (see src.idset).
+
+    The file starts with a zlib-compressed block per channel: its sorted
+    ids and their buckets. Entries added later are appended as small
+    records, until compaction writes all blocks again.
+    """
+
+    suffix = ".bin"
+    incremental = True
+
+    MAGIC = b'CSID'
+    VERSION = 1
+    # Magic, version, bucket seconds, base bucket
+    HEADER = struct.Struct('<4sBIq')
+    # Record type b'R', group length, ordered, entries, compressed length
+    RUN = struct.Struct('<cH?II')
+    # Record type b'A', group length, message id, timestamp
+    ADD = struct.Struct('<cHqq')
+
+    def __init__(self, path: Path, bucket_seconds: int = DEFAULT_BUCKET_SECONDS):
+        super().__init__(path)
+        self.bucket_seconds = bucket_seconds
+        self._file = None
+
+    def _read(self) -> Tuple[MessageIdSet, int, int]:
+        """Stored ids, number of records and length of the readable part of the file"""
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        if len(data) < self.HEADER.size or not data.startswith(self.MAGIC):
+            raise ValueError("not a binary message cache")
+        _, version, stored_seconds, base = self.HEADER.unpack_from(data)
+        if version != self.VERSION:
+            raise ValueError(f"unsupported binary cache version {version}")
+        ids = MessageIdSet(stored_seconds, base)
+        records = 0
+        pos = self.HEADER.size
+        try:
+            while pos < len(data):
+                kind = data[pos:pos + 1]
+                if kind == b'R':
+                    _, name_length, ordered, count, length = self.RUN.unpack_from(data, pos)
+                    start = pos + self.RUN.size + name_length
+                    if start + length > len(data):
+                        break
+                    group = data[start - name_length:start].decode('utf-8')
+                    values = zlib.decompress(data[start:start + length])
+                    run = IdRun(to_little_endian(array('i', values[:4 * count])),
+                                to_little_endian(array('H', values[4 * count:])), ordered)
+                    if len(run.ids) != count or len(run.buckets) != count:
+                        raise ValueError(f"damaged block of {group}")
+                    ids.add_run(group, run)
+                    records += count
+                    pos = start + length
+                elif kind == b'A':
+                    _, name_length, message_id, timestamp = self.ADD.unpack_from(data, pos)
+                    start = pos + self.ADD.size
+                    if start + name_length > len(data):
+                        break
+                    ids.add(data[start:start + name_length].decode('utf-8'), message_id, timestamp)
+                    records += 1
+                    pos = start + name_length
+                else:
+                    raise ValueError(f"unknown record at byte {pos}")
+        except struct.error:
+            # Record header cut off by a crash mid-write
+            pass
+        return ids, records, pos
+
+    def load_ids(self, bucket_seconds: Optional[int] = None) -> MessageIdSet:
+        """Stored ids, bucket size of a new store is `bucket_seconds`"""
+        if not self.path.exists():
+            self.stored = 0
+            ids = MessageIdSet(bucket_seconds or self.bucket_seconds)
+        else:
+            ids, self.stored, length = self._read()
+            if length < self.path.stat().st_size:
+                # Drop torn tail, so later appends stay readable
+                with open(self.path, 'r+b') as f:
+                    f.truncate(length)
+        # A file created by appending uses the same buckets
+        self.bucket_seconds = ids.bucket_seconds
+        return ids
+
+    def load(self) -> Dict[str, int]:
+        return {f"{group}_{message_id}": timestamp
+                for group, message_id, timestamp in self.load_ids().items()}
+
+    def _append_handle(self):
+        if self._file is None:
+            if not self.path.exists():
+                self.save_ids(MessageIdSet(self.bucket_seconds))
+            self._file = open(self.path, 'ab')
+        return self._file
+
+    def _add_record(self, f, key: str, timestamp: int):
+        group, _, message_id = key.rpartition('_')
+        name = group.encode('utf-8')
+        f.write(self.ADD.pack(b'A', len(name), int(message_id), int(timestamp)) + name)
+
+    def add(self, key: str, timestamp: int):
+        f = self._append_handle()
+        self._add_record(f, key, timestamp)
+        f.flush()
+        os.fsync(f.fileno())
+        self.stored += 1
+
+    def save_ids(self, ids: MessageIdSet):
+        """Replace stored entries with a block per group"""
+        self.close()
+
+        def write(f):
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, ids.bucket_seconds, ids.base))
+            for group, run in ids.groups.items():
+                name = group.encode('utf-8')
+                values = zlib.compress(to_little_endian(run.ids).tobytes()
+                                       + to_little_endian(run.buckets).tobytes(), 1)
+                f.write(self.RUN.pack(b'R', len(name), run.ordered, len(run), len(values)))
+                f.write(name)
+                f.write(values)
+
+        _atomic_write(self.path, write, binary=True)
+        self.stored = len(ids)
+
+    def save(self, entries: Dict[str, int]):
+        ids = MessageIdSet(self.bucket_seconds)
+        for key, timestamp in sorted(entries.items(), key=lambda entry: entry[1]):
+            group, _, message_id = key.rpartition('_')
+            ids.add(group, int(message_id), timestamp)
+        self.save_ids(ids)
+
+    def iter_entries(self) -> Iterator[Tuple[str, int]]:
+        # Arrays are small enough to be read at once
+        if not self.path.exists():
+            return
+        for group, message_id, timestamp in self._read()[0].items():
+            yield f"{group}_{message_id}", timestamp
+
+    def retain(self, keep: Callable[[str, int], bool]) -> int:
+        if not self.path.exists():
+            return 0
+        ids = self.load_ids()
+        kept = MessageIdSet(ids.bucket_seconds)
+        for group, message_id, timestamp in ids.items():
+            if keep(f"{group}_{message_id}", timestamp):
+                kept.add(group, message_id, timestamp)
+        self.save_ids(kept)
+        return len(ids) - len(kept)
+
+    def merge(self, entries: Iterable[Tuple[str, int]]) -> int:
+        f = self._append_handle()
+        count = 0
+        for key, timestamp in entries:
+            self._add_record(f, key, timestamp)
+            count += 1
+        f.flush()
+        os.fsync(f.fileno())
+        self.stored += count
+        return count
+
+    def verify(self) -> List[str]:
+        if not self.path.exists():
+            return []
+        try:
+            _, _, length = self._read()
+        except (OSError, ValueError, struct.error, zlib.error) as e:
+            return [f"cannot read {self.path.name}: {e}"]
+        size = self.path.stat().st_size
+        return [f"{size - length} unreadable bytes at the end of {self.path.name}"] if length < size else []
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+BACKENDS = {
+    'json': JsonStorage,
+    'log': LogStorage,
+    'sqlite': SqliteStorage,
+    'binary': BinaryStorage,
+}
+
+def create_storage(backend: str, cache_file: Path) -> CacheStorage:
+    """Create cache storage, migrating an existing JSON cache if needed"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown cache backend: {backend}")
+    storage_class = BACKENDS[backend]
+    if storage_class is JsonStorage:
+        return JsonStorage(cache_file)
+
+    path = cache_file.with_suffix(storage_class.suffix)
+    legacy_file = cache_file.with_suffix(JsonStorage.suffix)
+    migrate = not path.exists() and legacy_file.exists()
+    storage = storage_class(path)
+    if migrate:
+        storage.save(JsonStorage(legacy_file).load())
+        legacy_file.rename(legacy_file.with_name(legacy_file.name + ".migrated"))
+    return storage
@@ -0,0 +1,232 @@
+"""Sharded scanning across several Telegram sessions.
+
+The supervisor starts `workers` processes. Each worker has its own session
+file and scans the channels assigned to it by a consistent hash ring, so
+history reads are spread over several accounts' flood limits. All workers
+share the SQLite cache and outbox in the data directory; the supervisor
+drains the outbox through a single MessageSender.
+
+Usage:
+    python -m src.workers --login      # authorize worker sessions once
+    python -m src.workers [--workers N]
+"""
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import signal
+from bisect import bisect
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from telethon import TelegramClient
+
+from src.config import config
+from src.cache import MessageCache
+from src.dedup import NearDuplicateIndex
+from src.logger import logger, setup_logger, stop_logging
+from src import metrics
+from src.outbox import OUTBOX_POLL_INTERVAL, Outbox
+from src.parser import TelegramParser
+from src.sender import MessageSender
+
+# Virtual nodes per worker, more nodes give a more even split
+RING_REPLICAS = 100
+# Seconds between checks for exited worker processes
+WORKER_CHECK_INTERVAL = 10.0
+# Seconds a worker gets to finish after SIGTERM
+WORKER_STOP_TIMEOUT = 30.0
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+class HashRing:
+    """Consistent hash ring mapping channel ids to worker indexes.
+
+    Adding a worker moves only the channels that land on the new worker's
+    points, the rest keep their worker (and its cursors and session).
+    """
+
+    def __init__(self, nodes: int, replicas: int = RING_REPLICAS):
+        points = sorted(
+            (_hash(f"worker-{node}#{replica}"), node)
+            for node in range(nodes) for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key) -> int:
+        index = bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._nodes[index]
+
+class Shard(NamedTuple):
+    index: int
+    ring: HashRing
+
+    def owns(self, channel_id) -> bool:
+        return self.ring.node_for(channel_id) == self.index
+
+def session_name(index: int) -> str:
+    return f"career_scout_worker_{index}"
+
+def worker_log_file(index: int) -> Path:
+    log_file = Path(config.LOG_FILE)
+    return log_file.with_name(f"{log_file.stem}.worker-{index}{log_file.suffix}")
+
+def assign_channels(channels: List[dict], workers: int) -> Dict[int, List[dict]]:
+    """Split channels between workers"""
+    ring = HashRing(workers)
+    assignment: Dict[int, List[dict]] = {index: [] for index in range(workers)}
+    for channel in channels:
+        assignment[ring.node_for(channel['id'])].append(channel)
+    return assignment
+
+def create_worker(index: int, workers: int, client=None, data_dir: Optional[Path] = None,
+                  target_channel=None) -> TelegramParser:
+    """Parser scanning the channels of one shard, without its own sender"""
+    client = client or TelegramClient(session_name(index), config.API_ID, config.API_HASH)
+    return TelegramParser(client=client, target_channel=target_channel, data_dir=data_dir,
+                          shard=Shard(index, HashRing(workers)))
+
+def run_worker(index: int, workers: int):
+    """Entry point of worker process"""
+    setup_logger(log_file=worker_log_file(index))
+    parser = create_worker(index, workers)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(parser.run())
+
+    def stop():
+        parser.stop_parser()
+        task.cancel()
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop)
+    loop.add_signal_handler(signal.SIGUSR1, parser.request_profile)
+    try:
+        loop.run_until_complete(task)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        loop.close()
+        logger.info(f"Worker {index} stopped")
+        stop_logging()
+
+class Supervisor:
+    """Runs scanning workers as processes and delivers their matches"""
+
+    def __init__(self, workers: int, client=None, data_dir: Optional[Path] = None,
+                 target_channel=None):
+        self.workers = workers
+        self.client = client or TelegramClient('career_scout', config.API_ID, config.API_HASH)
+        data_dir = data_dir or config.CACHE_FILE.parent
+        self.cache = MessageCache(data_dir / config.CACHE_FILE.name)
+        self.outbox = Outbox(data_dir / "outbox.db")
+        duplicates = (NearDuplicateIndex(data_dir / "fingerprints.bin")
+                      if config.DEDUP_ENABLED else None)
+        target_channel = config.CHANNEL_ID if target_channel is None else target_channel
+        self.sender = MessageSender(self.client, self.outbox, self.cache, target_channel,
+                                    duplicates, poll_interval=OUTBOX_POLL_INTERVAL)
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        # Fresh interpreter per worker, forking a process with running threads is unsafe
+        self._context = multiprocessing.get_context('spawn')
+
+    def _spawn(self, index: int):
+        process = self._context.Process(target=run_worker, args=(index, self.workers),
+                                        name=f"career-scout-worker-{index}")
+        process.start()
+        self.processes[index] = process
+        logger.info(f"Started worker {index} (pid {process.pid})")
+
+    def _restart_exited(self):
+        for index, process in list(self.processes.items()):
+            if not process.is_alive():
+                logger.error(f"Worker {index} exited with code {process.exitcode}, restarting")
+                self._spawn(index)
+
+    def profile_workers(self):
+        """Pass SIGUSR1 on to workers, scanning runs there"""
+        for process in self.processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGUSR1)
+
+    def _stop_workers(self):
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for index, process in self.processes.items():
+            process.join(WORKER_STOP_TIMEOUT)
+            if process.is_alive():
+                logger.warning(f"Worker {index} did not stop in time, killing it")
+                process.kill()
+                process.join()
+
+    async def run(self):
+        """Start workers and deliver queued messages until cancelled"""
+        sender_task = None
+        metrics_server = None
+        try:
+            await self.client.start()
+            if config.METRICS_PORT:
+                metrics_server = await metrics.start_metrics_server(
+                    config.METRICS_HOST, config.METRICS_PORT)
+            assignment = assign_channels(config.get_channels(), self.workers)
+            for index in range(self.workers):
+                logger.info(f"Worker {index}: {len(assignment[index])} channels")
+                self._spawn(index)
+            sender_task = asyncio.create_task(self.sender.run())
+
+            while True:
+                await asyncio.sleep(WORKER_CHECK_INTERVAL)
+                self._restart_exited()
+        finally:
+            if metrics_server:
+                metrics_server.close()
+            if sender_task:
+                self.sender.stop()
+                sender_task.cancel()
+                await asyncio.gather(sender_task, return_exceptions=True)
+            self._stop_workers()
+            self.outbox.close()
+            self.cache.close()
+            await self.client.disconnect()
+
+async def login_workers(workers: int):
+    """Authorize worker sessions interactively, workers cannot prompt for codes"""
+    for index in range(workers):
+        print(f"Logging in worker {index} ({session_name(index)}.session)")
+        client = TelegramClient(session_name(index), config.API_ID, config.API_HASH)
+        await client.start()
+        await client.disconnect()
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Scan channels with several sharded sessions")
+    arg_parser.add_argument('--workers', type=int, default=config.WORKERS,
+                            help="Number of worker processes (default from config)")
+    arg_parser.add_argument('--login', action='store_true',
+                            help="Authorize worker sessions and exit")
+    args = arg_parser.parse_args(argv)
+
+    if args.login:
+        asyncio.run(login_workers(args.workers))
+        return
+    if config.CACHE_BACKEND != 'sqlite':
+        raise SystemExit("Sharded workers require cache backend sqlite")
+
+    supervisor = Supervisor(args.workers)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(supervisor.run())
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, task.cancel)
+    loop.add_signal_handler(signal.SIGUSR1, supervisor.profile_workers)
+    try:
+        loop.run_until_complete(task)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        loop.close()
+        logger.info("Successfully shutdown the supervisor.")
+        stop_logging()
+
+if __name__ == "__main__":
+    main()
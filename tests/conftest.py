@@ -3,6 +3,41 @@ from pathlib import Path
 import json
 from datetime import datetime
 import pytz
+from src.config import build_snapshot, config
+
+def _merge(raw, overrides):
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(raw.get(key), dict):
+            _merge(raw[key], value)
+        else:
+            raw[key] = value
+
+@pytest.fixture(autouse=True)
+def configure(tmp_path, monkeypatch):
+    """Test configuration with all files in tmp_path, instead of channels.yaml.
+
+    Returns function that applies overrides, e.g.
+    configure({'settings': {'dedup': {'enabled': True}}})
+    """
+    raw = {
+        'settings': {
+            'cache': {'file': str(tmp_path / "messages_cache.json"), 'size': 1000, 'ttl': 3600},
+            'parser': {'days_to_parse': 1, 'max_retries': 3, 'request_delay': 0,
+                       'timezone': 'UTC', 'log_level': 'INFO',
+                       'log_file': str(tmp_path / "logs" / "parser.log"), 'pause_minutes': 1},
+        },
+        'channels': {'job_channels': []},
+        'keywords': {'positions': ['python developer'], 'stop_words': []},
+    }
+
+    def apply(overrides=None):
+        _merge(raw, overrides or {})
+        # Set in instance dict, setattr would load channels.yaml to keep the old value
+        monkeypatch.setitem(vars(config), '_snapshot', build_snapshot(raw))
+        return config.snapshot
+
+    apply()
+    return apply
 
 @pytest.fixture
 def sample_message_text():
@@ -0,0 +1,77 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+import pytest
+import pytz
+from src.commands.backfill import BackfillState, backfill, split_range
+from src.cursors import ChannelCursors
+from src.outbox import Outbox
+from src.replay import FakeTelegramClient, load_dump
+
+@pytest.fixture
+def backfill_config(configure):
+    configure({'settings': {'cache': {'backend': 'sqlite'},
+                            'sender': {'rate_per_minute': 60000, 'burst': 100}}})
+
+@pytest.fixture
+def history(tmp_path):
+    now = datetime.now(pytz.UTC)
+    records = [
+        {'id': i, 'channel': '@jobs',
+         'date': (now - timedelta(days=10 if i <= 50 else 1, minutes=-i)).isoformat(),
+         'text': f"Python developer #{i}" if i % 20 == 0 else f"Message {i}"}
+        for i in range(1, 251)
+    ]
+    path = tmp_path / "dump.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in records))
+    return load_dump(path)
+
+def test_split_range():
+    segments = split_range(50, 250, 4)
+    assert [(s.low, s.high) for s in segments] == [(50, 100), (100, 150), (150, 200), (200, 250)]
+    assert len(split_range(0, 2, 8)) == 2
+
+def test_backfill_resumes_from_checkpoints(backfill_config, history, tmp_path, monkeypatch):
+    client = FakeTelegramClient(history, honor_dates=True)
+    since = datetime.now(pytz.UTC) - timedelta(days=5)
+    failures = {120}
+
+    original = FakeTelegramClient.iter_messages
+
+    def flaky_iter_messages(self, entity, **kwargs):
+        # History request of the page containing message 120 fails once
+        if kwargs.get('min_id', 0) < 120 <= kwargs.get('max_id', 0) and failures:
+            failures.clear()
+            raise ConnectionError("network down")
+        return original(self, entity, **kwargs)
+
+    monkeypatch.setattr(FakeTelegramClient, 'iter_messages', flaky_iter_messages)
+
+    def run():
+        return asyncio.run(backfill(['@jobs'], since, segments=4, concurrency=2,
+                                    request_rate=1000, send=True, client=client,
+                                    data_dir=tmp_path, target_channel='backfill'))
+
+    assert run()[0][1] == "network down"
+    segments = BackfillState(tmp_path / "backfill.json").plans['@jobs']
+    assert [(s.low, s.high) for s in segments] == [(50, 100), (100, 150), (150, 200), (200, 250)]
+    assert segments[1].done == 100
+    assert all(s.finished for s in segments if s.low != 100)
+
+    assert run() == [('@jobs', None)]
+    # Matches of ids 60..240 delivered exactly once over both runs
+    assert len(client.sent) == 10
+    assert BackfillState(tmp_path / "backfill.json").plans == {}
+    assert ChannelCursors(tmp_path / "cursors.json").get('@jobs') == 250
+
+def test_backfill_only_queues_by_default(backfill_config, history, tmp_path):
+    client = FakeTelegramClient(history, honor_dates=True)
+    since = datetime.now(pytz.UTC) - timedelta(days=5)
+
+    assert asyncio.run(backfill(['@jobs'], since, segments=2, request_rate=1000, client=client,
+                                data_dir=tmp_path, target_channel='backfill')) == [('@jobs', None)]
+
+    assert client.sent == []
+    outbox = Outbox(tmp_path / "outbox.db")
+    assert len(outbox) == 10
+    outbox.close()
@@ -0,0 +1,42 @@
+from src import benchmark
+from src.filters import MessageFilter
+from src.matcher import build_keyword_matcher
+
+def test_generate_keywords_is_deterministic():
+    keywords = benchmark.generate_keywords(10000)
+
+    assert len(set(keywords['positions'])) == 10000
+    assert keywords == benchmark.generate_keywords(10000)
+
+def test_corpus_matches_generated_keywords():
+    corpus = benchmark.generate_corpus(200)
+    message_filter = MessageFilter(build_keyword_matcher(benchmark.generate_keywords(10000)))
+    relevant = sum(message_filter.is_relevant(text) for text in corpus)
+
+    assert any(not text.isascii() for text in corpus)
+    assert 0 < relevant < len(corpus)
+
+def test_filter_cases():
+    report = benchmark.run_benchmarks(keyword_counts=(100,), suites=('filter',), corpus_size=20)
+
+    assert set(report['results']) == {
+        'filter/build/keywords=100',
+        'filter/is_relevant/keywords=100',
+        'filter/extract_keywords/keywords=100',
+    }
+
+def test_cache_cases_for_every_backend():
+    results = benchmark.bench_cache(sizes=(100,), backends=benchmark.CACHE_BACKENDS,
+                                    operations=10, budget=1.0)
+
+    for backend in benchmark.CACHE_BACKENDS:
+        for operation in ('load', 'message_exists_hit', 'message_exists_miss', 'add_message', 'save'):
+            assert results[f"cache/{operation}/backend={backend}/size=100"] > 0
+
+def test_compare_marks_regressions():
+    baseline = {'results': {'a': 1.0, 'b': 1.0, 'removed': 1.0}}
+    report = {'results': {'a': 1.1, 'b': 1.5, 'new': 1.0}}
+
+    rows = benchmark.compare(report, baseline, threshold=0.25)
+
+    assert [(row['case'], row['regression']) for row in rows] == [('a', False), ('b', True)]
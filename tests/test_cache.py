@@ -1,7 +1,8 @@
 import pytest
 import json
 import time
-from src.cache import MessageCache
+from src import cache as cache_module
+from src.cache import MessageCache, cache_key, split_key
 
 def test_message_exists(temp_cache_file, monkeypatch):
     # Mock config
@@ -9,6 +10,7 @@ def test_message_exists(temp_cache_file, monkeypatch):
         CACHE_FILE = temp_cache_file
         CACHE_SIZE = 1000
         CACHE_TTL = 3600
+        CACHE_BACKEND = 'json'
     
     monkeypatch.setattr('src.cache.config', MockConfig())
     
@@ -25,6 +27,7 @@ def test_add_message(temp_cache_file, monkeypatch):
         CACHE_FILE = temp_cache_file
         CACHE_SIZE = 1000
         CACHE_TTL = 3600
+        CACHE_BACKEND = 'json'
     
     monkeypatch.setattr('src.cache.config', MockConfig())
     
@@ -36,6 +39,15 @@ def test_add_message(temp_cache_file, monkeypatch):
         data = json.load(f)
         assert "2222_1111" in data
 
+def test_messages_cached_per_route(tmp_path):
+    cache = MessageCache(tmp_path / "cache.log", backend='log', cache_size=10, cache_ttl=3600)
+    cache.add_message(1, 100, 'mobile')
+
+    assert cache.message_exists(1, 100, 'mobile') == True
+    assert cache.message_exists(1, 100) == False
+    assert cache.message_exists(1, 100, 'data') == False
+    assert split_key(cache_key(1, '@my_jobs', 'mobile')) == ('@my_jobs', 1)
+
 def test_cleanup_old_messages(temp_cache_file, monkeypatch):
     # Create initial cache file with old message
     old_timestamp = int(time.time()) - 3600  # 1 hour ago
@@ -49,6 +61,7 @@ def test_cleanup_old_messages(temp_cache_file, monkeypatch):
         CACHE_FILE = temp_cache_file
         CACHE_SIZE = 1000
         CACHE_TTL = 1  # 1 second TTL
+        CACHE_BACKEND = 'json'
     
     monkeypatch.setattr('src.cache.config', MockConfig())
     
@@ -62,4 +75,85 @@ def test_cleanup_old_messages(temp_cache_file, monkeypatch):
     # Verify old messages were removed from file
     with open(temp_cache_file, 'r') as f:
         data = json.load(f)
-        assert len(data) == 0
\ No newline at end of file
+        assert len(data) == 0
+
+def test_sqlite_backend_persists_messages(tmp_path, monkeypatch):
+    class MockConfig:
+        CACHE_FILE = tmp_path / "messages_cache.json"
+        CACHE_SIZE = 1000
+        CACHE_TTL = 3600
+        CACHE_BACKEND = 'sqlite'
+
+    monkeypatch.setattr('src.cache.config', MockConfig())
+
+    cache = MessageCache()
+    cache.add_message(1111, 2222)
+    cache.close()
+
+    cache = MessageCache()
+    assert cache.message_exists(1111, 2222) == True
+
+def test_sqlite_backend_reads_through_to_other_process_writes(tmp_path, monkeypatch):
+    class MockConfig:
+        CACHE_FILE = tmp_path / "messages_cache.json"
+        CACHE_SIZE = 1000
+        CACHE_TTL = 3600
+        CACHE_BACKEND = 'sqlite'
+
+    monkeypatch.setattr('src.cache.config', MockConfig())
+
+    worker_cache = MessageCache()
+    sender_cache = MessageCache()
+    assert worker_cache.message_exists(1111, 2222) == False
+
+    sender_cache.add_message(1111, 2222)
+
+    assert worker_cache.message_exists(1111, 2222) == True
+
+def test_eviction_keeps_newest_messages(tmp_path, monkeypatch):
+    class MockConfig:
+        CACHE_FILE = tmp_path / "messages_cache.json"
+        CACHE_SIZE = 2
+        CACHE_TTL = 3600
+        CACHE_BACKEND = 'log'
+
+    monkeypatch.setattr('src.cache.config', MockConfig())
+
+    cache = MessageCache()
+    cache.add_message(1, 100)
+    cache.add_message(2, 100)
+    cache.add_message(1, 100)
+    cache.add_message(3, 100)
+
+    # Re-added message moves to the end, so message 2 is the oldest
+    assert cache.message_exists(2, 100) == False
+    assert cache.message_exists(1, 100) == True
+    assert cache.message_exists(3, 100) == True
+
+def test_binary_backend_keeps_ids_per_channel(tmp_path, monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(cache_module.time, 'time', lambda: now[0])
+    cache_file = tmp_path / "messages_cache.json"
+    cache = MessageCache(cache_file, backend='binary', cache_size=3, cache_ttl=2560)
+    for message_id in (1, 2, 3):
+        cache.add_message(message_id, 100)
+    now[0] += 30
+    cache.add_message(1, 100, 'mobile')
+
+    assert cache.cache == {}
+    assert cache.ids.bucket_seconds == 10
+    # Oldest message evicted by size
+    assert [cache.message_exists(i, 100) for i in (1, 2, 3)] == [False, True, True]
+    assert cache.message_exists(1, 100, 'mobile') == True
+    cache.close()
+
+    cache = MessageCache(cache_file, backend='binary', cache_size=3, cache_ttl=2560)
+    assert len(cache) == 3
+    assert cache.message_exists(3, 100) == True
+    now[0] += 2560
+    # Expired by TTL, a bucket late at most
+    assert cache.message_exists(3, 100) == False
+    assert cache.message_exists(1, 100, 'mobile') == True
+    cache.add_message(4, 100)
+    assert len(cache) == 2
+    cache.close()
@@ -0,0 +1,88 @@
+import io
+import json
+import pytest
+from src.commands import cache as cache_command
+from src.storage import JsonStorage, SqliteStorage
+
+NOW = 1700000000
+
+@pytest.fixture(params=[JsonStorage, SqliteStorage])
+def storage(request, tmp_path):
+    storage = request.param(tmp_path / f"cache{request.param.suffix}")
+    storage.save({
+        "555_1": NOW - 60,
+        "555_2": NOW - 2 * 86400,
+        "777_1": NOW - 10 * 86400,
+    })
+    yield storage
+    storage.close()
+
+def test_collect_stats(storage):
+    stats = cache_command.collect_stats(storage, ttl=7 * 86400, now=NOW)
+
+    assert stats.records == 3
+    assert stats.expired == 1
+    assert stats.channels == {'555': 2, '777': 1}
+    assert stats.ages == [1, 0, 0, 1, 0, 1, 0]
+    assert stats.size > 0
+
+def test_compact_removes_expired(storage):
+    assert cache_command.compact(storage, ttl=7 * 86400, now=NOW) == 1
+    assert sorted(key for key, _ in storage.iter_entries()) == ["555_1", "555_2"]
+
+def test_purge_channel_and_range(storage):
+    assert cache_command.purge(storage, channel_id='777') == 1
+    assert cache_command.purge(storage, start=NOW - 3600, end=NOW) == 1
+    assert [key for key, _ in storage.iter_entries()] == ["555_2"]
+
+def test_purge_resolves_configured_channel(tmp_path, capsys):
+    (tmp_path / "worker-0").mkdir()
+    with open(tmp_path / "worker-0" / "entities.json", 'w') as f:
+        json.dump({'@jobs': {'id': 555, 'access_hash': 1}}, f)
+    storage = cache_command.open_storage()
+    storage.save({"555_1": NOW, "mobile:555_2": NOW, "1234567890_1": NOW, "777_1": NOW})
+    storage.close()
+
+    assert cache_command.resolve_channel('-1001234567890', tmp_path) == '1234567890'
+    with pytest.raises(ValueError):
+        cache_command.resolve_channel('@unknown', tmp_path)
+
+    cache_command.main(['purge', '--channel', '@jobs'])
+    cache_command.main(['purge', '--channel', '-1001234567890'])
+
+    assert capsys.readouterr().out.splitlines() == ["Removed 2 records", "Removed 1 records"]
+    assert dict(storage.iter_entries()) == {"777_1": NOW}
+
+def test_export_import_roundtrip(storage, tmp_path):
+    exported = io.StringIO()
+    assert cache_command.export_entries(storage, exported) == 3
+
+    target = SqliteStorage(tmp_path / "imported.db")
+    assert cache_command.import_entries(target, io.StringIO(exported.getvalue())) == 3
+    assert dict(target.iter_entries()) == dict(storage.iter_entries())
+    target.close()
+
+def test_verify(storage, tmp_path):
+    assert cache_command.verify(storage, now=NOW) == []
+
+    storage.merge([("no-message-id", NOW), ("555_3", NOW + 7 * 86400)])
+
+    assert cache_command.verify(storage, now=NOW) == [
+        "1 records with invalid keys",
+        "1 records with invalid or future timestamps",
+    ]
+
+def test_verify_reports_broken_json(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text('{"555_1": 100, "555_2": ')
+
+    assert cache_command.verify(JsonStorage(path)) != []
+
+def test_clear_deletes_all_files(tmp_path):
+    storage = SqliteStorage(tmp_path / "cache.db")
+    storage.add("555_1", NOW)
+
+    deleted = cache_command.clear(storage)
+
+    assert tmp_path / "cache.db" in deleted
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,46 @@
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+from src import cli
+
+ROOT = Path(__file__).parent.parent
+
+calls = []
+
+def record_call(argv):
+    calls.append(argv)
+
+def test_dispatches_to_command(monkeypatch):
+    calls.clear()
+    monkeypatch.setitem(cli.COMMANDS, 'logs', ('tests.test_cli', 'record_call', ""))
+
+    cli.main(['logs', '--level', 'warning'])
+
+    assert calls == [['--level', 'warning']]
+
+def test_run_is_default_command(monkeypatch):
+    calls.clear()
+    monkeypatch.setitem(cli.COMMANDS, 'run', ('tests.test_cli', 'record_call', ""))
+
+    cli.main([])
+
+    assert calls == [[]]
+
+def test_unknown_command():
+    with pytest.raises(SystemExit):
+        cli.main(['unknown'])
+
+def test_utility_commands_start_without_heavy_imports():
+    # No credentials in the environment, nothing but the standard library loaded
+    code = (
+        "import sys\n"
+        "from src import cli, cache, logger\n"
+        "from src.commands import watch_logs\n"
+        "loaded = {'telethon', 'yaml', 'numpy', 'pytz', 'dotenv'} & set(sys.modules)\n"
+        "assert not loaded, loaded\n"
+    )
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, env={}, check=True)
+    result = subprocess.run([sys.executable, '-m', 'src.cli', 'logs', '--help'], cwd=ROOT, env={},
+                            capture_output=True, text=True, check=True)
+    assert '--level' in result.stdout
@@ -0,0 +1,101 @@
+import os
+import pytest
+import yaml
+from src import config as config_module
+from src.config import Config, ConfigError, build_snapshot
+
+@pytest.fixture
+def raw_config():
+    return {
+        'settings': {
+            'cache': {'file': 'data/cache/messages_cache.json', 'size': 5000, 'ttl': 604800},
+            'parser': {'days_to_parse': 2, 'max_retries': 3, 'request_delay': 1,
+                       'timezone': 'UTC', 'log_level': 'info', 'log_file': 'logs/parser.log',
+                       'pause_minutes': 10},
+        },
+        'channels': {'job_channels': [{'id': '@jobs'}]},
+        'keywords': {'positions': ['ios developer'], 'stop_words': ['resume']},
+    }
+
+def test_build_snapshot(raw_config):
+    snapshot = build_snapshot(raw_config)
+
+    assert snapshot.settings.cache_size == 5000
+    assert snapshot.settings.log_level == 'INFO'
+    assert snapshot.settings.send_rate_per_minute == 60
+    assert snapshot.channels == ({'id': '@jobs'},)
+    assert snapshot.matcher.find("ios developer")['positions'] == ['ios developer']
+
+def test_build_snapshot_routes(raw_config):
+    raw_config['routes'] = [
+        {'name': 'mobile', 'target': '-1001234567890', 'keywords': {'positions': ['swift']}},
+        {'name': 'data', 'target': '@data_jobs', 'channels': ['@jobs'],
+         'keywords': {'positions': ['data engineer'], 'stop_words': ['intern']}},
+    ]
+    snapshot = build_snapshot(raw_config)
+
+    mobile, data = snapshot.routes
+    assert (mobile.target, mobile.channels, mobile.keywords['stop_words']) == (-1001234567890, None, [])
+    assert (data.target, data.channels) == ('@data_jobs', frozenset({'@jobs'}))
+    found = snapshot.matcher.find("ios developer, swift")
+    assert found['positions'] == ['ios developer']
+    assert found['mobile:positions'] == ['swift']
+
+@pytest.mark.parametrize('path, value', [
+    (('settings', 'cache', 'size'), 'big'),
+    (('settings', 'parser', 'timezone'), 'Mars/Base'),
+    (('channels', 'job_channels'), [{'name': 'no id'}]),
+    (('keywords', 'positions'), 'ios developer'),
+    (('settings', 'parser', 'workers'), 2),
+    (('settings', 'dedup'), {'enabled': True, 'similarity': 0.85}),
+    (('settings', 'sender'), {'rate_per_minute': 0}),
+    (('settings', 'parser', 'schedule'), {'min_minutes': 60, 'max_minutes': 10}),
+    (('channels', 'job_channels'), [{'id': '@jobs', 'interval_minutes': -5}]),
+    (('routes',), [{'name': 'mobile', 'keywords': {'positions': ['ios']}}]),
+    (('routes',), [{'name': 'mobile feed', 'target': '@mobile', 'keywords': {'positions': ['ios']}}]),
+    (('routes',), [{'name': 'mobile', 'target': '@mobile', 'keywords': {'positions': ['ios']}}] * 2),
+    (('routes',), [{'name': 'mobile', 'target': '@mobile', 'keywords': {'positions': 'ios'}}]),
+])
+def test_build_snapshot_rejects_invalid(raw_config, path, value):
+    section = raw_config
+    for key in path[:-1]:
+        section = section[key]
+    section[path[-1]] = value
+
+    with pytest.raises(ConfigError):
+        build_snapshot(raw_config)
+
+def test_reload_if_changed(tmp_path, raw_config, monkeypatch):
+    monkeypatch.setattr(config_module, 'RELOAD_CHECK_INTERVAL', 0)
+    config_file = tmp_path / "channels.yaml"
+    config_file.write_text(yaml.safe_dump(raw_config))
+    config = Config(config_file)
+
+    assert config.reload_if_changed() == False
+
+    raw_config['channels']['job_channels'].append({'id': '@more_jobs'})
+    config_file.write_text(yaml.safe_dump(raw_config))
+    os.utime(config_file, (1, 1))
+
+    assert config.reload_if_changed() == True
+    assert len(config.get_channels()) == 2
+
+    # Invalid file keeps previous snapshot
+    snapshot = config.snapshot
+    config_file.write_text("settings: [")
+    os.utime(config_file, (2, 2))
+
+    assert config.reload_if_changed() == False
+    assert config.snapshot is snapshot
+
+def test_snapshot_set_by_tests_kept_on_reload_check(tmp_path, raw_config, monkeypatch):
+    monkeypatch.setattr(config_module, 'RELOAD_CHECK_INTERVAL', 0)
+    config_file = tmp_path / "channels.yaml"
+    config_file.write_text(yaml.safe_dump(raw_config))
+    config = Config(config_file)
+    raw_config['settings']['parser']['log_file'] = str(tmp_path / "test.log")
+    config._snapshot = build_snapshot(raw_config)
+
+    assert config.reload_if_changed() == False
+    assert config.reload_if_changed() == False
+    assert config.LOG_FILE == tmp_path / "test.log"
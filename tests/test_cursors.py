@@ -0,0 +1,45 @@
+import json
+from src.cursors import ChannelCursors
+
+def test_update_and_save(tmp_path):
+    cursor_file = tmp_path / "cursors.json"
+    cursors = ChannelCursors(cursor_file)
+
+    assert cursors.get("@channel") is None
+
+    cursors.update("@channel", 10)
+    cursors.update("@channel", 5)
+    cursors.save()
+
+    assert ChannelCursors(cursor_file).get("@channel") == 10
+
+def test_save_merges_cursors_of_other_writers(tmp_path):
+    cursor_file = tmp_path / "cursors.json"
+    parser_cursors = ChannelCursors(cursor_file)
+    backfill_cursors = ChannelCursors(cursor_file)
+
+    backfill_cursors.update("@new", 500)
+    backfill_cursors.update("@channel", 300)
+    backfill_cursors.save()
+    parser_cursors.update("@channel", 200)
+    parser_cursors.update("@other", 7)
+    parser_cursors.save()
+
+    assert ChannelCursors(cursor_file).cursors == {"@new": 500, "@channel": 300, "@other": 7}
+
+def test_invalid_cursors_ignored(tmp_path):
+    cursor_file = tmp_path / "cursors.json"
+    with open(cursor_file, 'w') as f:
+        json.dump({"@good": 42, "@bad": "x", "@negative": -1}, f)
+
+    cursors = ChannelCursors(cursor_file)
+
+    assert cursors.get("@good") == 42
+    assert cursors.get("@bad") is None
+    assert cursors.get("@negative") is None
+
+def test_corrupted_file(tmp_path):
+    cursor_file = tmp_path / "cursors.json"
+    cursor_file.write_text("{not json")
+
+    assert ChannelCursors(cursor_file).cursors == {}
@@ -0,0 +1,96 @@
+import random
+import time
+from src.config import MIN_DEDUP_SIMILARITY
+from src.dedup import NearDuplicateIndex, hamming_distance, simhash
+
+VACANCY = """
+Senior iOS Developer wanted at Acme. Remote, full time.
+Requirements: 5+ years of Swift, UIKit and SwiftUI, experience with
+CI/CD and unit testing. We offer a competitive salary, equipment and
+flexible hours. Send your CV to @acme_hr
+"""
+
+def test_simhash_similar_texts():
+    repost = VACANCY.replace("@acme_hr", "@acme_jobs")
+    other = "Looking for a data engineer with Spark and Airflow experience in Berlin"
+
+    assert hamming_distance(simhash(VACANCY), simhash(repost)) < hamming_distance(
+        simhash(VACANCY), simhash(other))
+    assert simhash(VACANCY) == simhash(VACANCY.upper())
+
+def test_index_finds_near_duplicates(tmp_path):
+    index = NearDuplicateIndex(tmp_path / "fingerprints.bin", similarity=0.9, ttl=3600)
+    fingerprint = simhash(VACANCY)
+    index.add(fingerprint)
+
+    assert index.contains(fingerprint ^ 0b101) == True
+    assert index.contains(~fingerprint & (2 ** 64 - 1)) == False
+
+def test_index_persists_and_expires(tmp_path):
+    index_file = tmp_path / "fingerprints.bin"
+    index = NearDuplicateIndex(index_file, similarity=0.95, ttl=3600)
+    index.add(12345)
+    index.save()
+
+    assert NearDuplicateIndex(index_file, similarity=0.95, ttl=3600).contains(12345) == True
+
+    index.fingerprints[12345] = int(time.time()) - 7200
+    assert index.contains(12345) == False
+    assert len(index) == 0
+
+def test_index_probes_bits_spread_over_bands(tmp_path):
+    index = NearDuplicateIndex(tmp_path / "fingerprints.bin", similarity=0.9, ttl=3600)
+    assert index.max_distance == 6
+    fingerprint = simhash(VACANCY)
+    index.add(fingerprint)
+
+    # No band is equal, 2 + 2 + 1 + 1 bits differ
+    flipped = [0, 1, 16, 17, 32, 48]
+    assert index.contains(fingerprint ^ sum(1 << bit for bit in flipped)) == True
+    assert index.contains(fingerprint ^ sum(1 << bit for bit in flipped + [50])) == False
+
+def test_lookup_cost_at_lowest_similarity(tmp_path, monkeypatch):
+    index = NearDuplicateIndex(tmp_path / "fingerprints.bin",
+                               similarity=MIN_DEDUP_SIMILARITY, ttl=3600)
+    rng = random.Random(1)
+    for _ in range(50000):
+        index.add(rng.getrandbits(64))
+    compared = 0
+
+    def counting_distance(a, b):
+        nonlocal compared
+        compared += 1
+        return hamming_distance(a, b)
+
+    monkeypatch.setattr('src.dedup.hamming_distance', counting_distance)
+    for _ in range(100):
+        assert index.contains(rng.getrandbits(64)) == False
+    # One probe per bit of a band: 4 bands * 17 buckets * ~0.8 fingerprints
+    assert compared / 100 < 100
+
+def test_index_appends_and_compacts(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.dedup.MIN_COMPACTION_RECORDS', 4)
+    index_file = tmp_path / "fingerprints.bin"
+    index = NearDuplicateIndex(index_file, similarity=0.95, ttl=3600)
+    for fingerprint in (1, 2, 3):
+        index.add(fingerprint)
+        index.save()
+    assert index_file.stat().st_size == 3 * 16
+
+    # Torn record of an interrupted append is dropped
+    with open(index_file, 'ab') as f:
+        f.write(b'\x01\x02\x03')
+    index = NearDuplicateIndex(index_file, similarity=0.95, ttl=3600)
+    assert len(index) == 3
+    assert index_file.stat().st_size == 3 * 16
+
+    for fingerprint in (1, 2, 3):
+        index.fingerprints[fingerprint] = int(time.time()) - 7200
+    index.add(4)
+    index.save()
+    # 4 records in file, only one of them live
+    assert index_file.stat().st_size == 16
+    index.add(5)
+    index.save()
+    assert index_file.stat().st_size == 2 * 16
+    assert list(NearDuplicateIndex(index_file, similarity=0.95, ttl=3600).fingerprints) == [4, 5]
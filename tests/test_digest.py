@@ -0,0 +1,34 @@
+from src.digest import MESSAGE_LIMIT, build_digests, telegram_length
+from src.outbox import OutboxItem
+
+def make_item(item_id, channel, entry):
+    return OutboxItem(item_id, 100, item_id, {'channel': channel, 'entry': entry}, 0, 0)
+
+def test_digests_split_between_entries_within_limit():
+    items = [make_item(i, '@jobs', f"{i}: " + "x" * 990) for i in range(10)]
+
+    parts = build_digests(items, 'channel')
+
+    assert len(parts) == 3
+    assert all(telegram_length(part.text) <= MESSAGE_LIMIT for part in parts)
+    assert [item.id for part in parts for item in part.items] == list(range(10))
+    assert parts[1].text.startswith("🔍 <b>New vacancies in @jobs</b>\n\n4: ")
+
+def test_window_grouping_combines_channels_and_escapes_header():
+    items = [make_item(1, '@a<b>', "one"), make_item(2, '@c', "two")]
+
+    assert len(build_digests(items, 'window')) == 1
+    channel_parts = build_digests(items, 'channel')
+    assert len(channel_parts) == 2
+    assert "@a&lt;b&gt;" in channel_parts[0].text
+
+def test_routes_get_own_digests():
+    items = [make_item(1, '@jobs', "one"), make_item(2, '@jobs', "two")]
+    items[1].payload['route'] = 'mobile'
+
+    parts = build_digests(items, 'window')
+    assert [[item.id for item in part.items] for part in parts] == [[1], [2]]
+
+def test_telegram_length_counts_utf16_units():
+    assert telegram_length("abc") == 3
+    assert telegram_length("🔍") == 2
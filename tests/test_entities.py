@@ -0,0 +1,40 @@
+import asyncio
+from types import SimpleNamespace
+from telethon.tl.types import InputPeerChannel
+from src.entities import EntityCache
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def get_entity(self, channel_id):
+        self.calls += 1
+        return SimpleNamespace(id=1234, access_hash=5678)
+
+def test_resolve_once_and_persist(tmp_path):
+    cache_file = tmp_path / "entities.json"
+    client = CountingClient()
+    entities = EntityCache(cache_file)
+
+    peer = asyncio.run(entities.resolve(client, "@jobs"))
+    asyncio.run(entities.resolve(client, "@jobs"))
+
+    assert peer == InputPeerChannel(1234, 5678)
+    assert client.calls == 1
+
+    # Reused after restart
+    asyncio.run(EntityCache(cache_file).resolve(client, "@jobs"))
+    assert client.calls == 1
+
+def test_sync_and_invalidate(tmp_path):
+    client = CountingClient()
+    entities = EntityCache(tmp_path / "entities.json")
+    asyncio.run(entities.resolve(client, "@jobs"))
+    asyncio.run(entities.resolve(client, "@old"))
+
+    entities.sync(["@jobs"])
+    assert list(entities.entities) == ["@jobs"]
+
+    entities.invalidate("@jobs")
+    asyncio.run(entities.resolve(client, "@jobs"))
+    assert client.calls == 3
@@ -1,5 +1,6 @@
 import pytest
 from src.filters import MessageFilter
+from src.matcher import build_keyword_matcher
 
 def test_is_relevant(sample_message_text, monkeypatch):
     class MockConfig:
@@ -35,4 +36,41 @@ def test_extract_keywords(sample_message_text, monkeypatch):
     keywords = filter.extract_keywords(sample_message_text)
     
     assert 'positions' in keywords
-    assert 'ios developer' in keywords['positions'] 
\ No newline at end of file
+    assert 'ios developer' in keywords['positions'] 
+
+def test_match_word_boundary(monkeypatch):
+    class MockConfig:
+        @staticmethod
+        def get_keywords():
+            return {
+                'positions': ['python developer'],
+                'stop_words': ['cv'],
+                'word_boundary': True
+            }
+
+    monkeypatch.setattr('src.filters.config', MockConfig())
+
+    filter = MessageFilter()
+
+    result = filter.match("Python Developer, CVS experience")
+    assert result.is_relevant == True
+    assert result.keywords['positions'] == ['python developer']
+
+    assert filter.match("Python developer, send CV").is_relevant == False
+
+def test_match_routes_in_same_pass():
+    matcher = build_keyword_matcher(
+        {'positions': ['python developer'], 'stop_words': ['cv']},
+        {'mobile': {'positions': ['ios developer'], 'stop_words': ['senior']},
+         'data': {'positions': ['python', 'sql'], 'stop_words': []}}
+    )
+    filter = MessageFilter(matcher, ['mobile', 'data'])
+
+    result = filter.match("Python developer and iOS developer wanted")
+    assert result.is_relevant == True
+    assert result.routes == {'mobile': ['ios developer'], 'data': ['python']}
+
+    # Stop words only reject their own route
+    result = filter.match("Senior iOS developer, SQL, send CV")
+    assert result.is_relevant == False
+    assert result.routes == {'data': ['sql']}
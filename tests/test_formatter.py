@@ -23,4 +23,40 @@ def test_format_message(sample_message_text, sample_keywords, monkeypatch):
     assert "New vacancy!" in message
     assert "@test_channel" in message
     assert "ios developer" in message
-    assert "https://t.me/c/123/456" in message 
\ No newline at end of file
+    assert "https://t.me/c/123/456" in message 
+
+
+def test_format_message_with_score(sample_message_text, sample_keywords, monkeypatch):
+    class MockConfig:
+        TIMEZONE = 'UTC'
+
+    monkeypatch.setattr('src.formatter.config', MockConfig())
+
+    message = MessageFormatter().format_message(
+        original_text=sample_message_text,
+        channel_name="@test_channel",
+        message_url="https://t.me/c/123/456",
+        keywords=sample_keywords,
+        published_date=datetime.now(pytz.UTC),
+        score=3.5
+    )
+
+    assert "Score: 3.5" in message
+
+def test_format_digest_entry_escapes_html(monkeypatch):
+    class MockConfig:
+        TIMEZONE = 'UTC'
+
+    monkeypatch.setattr('src.formatter.config', MockConfig())
+
+    entry = MessageFormatter().format_digest_entry(
+        original_text="Python <b>developer</b> & **Django**\n\n" + "x" * 500,
+        channel_name="@test_channel",
+        message_url="https://t.me/c/123/456",
+        keywords={'positions': ['python developer']},
+        published_date=datetime(2024, 11, 30, 10, 0, tzinfo=pytz.UTC)
+    )
+
+    assert "Python &lt;b&gt;developer&lt;/b&gt; &amp; **Django** x" in entry
+    assert '<a href="https://t.me/c/123/456">@test_channel</a>' in entry
+    assert len(entry) < 500
@@ -0,0 +1,103 @@
+import time
+from array import array
+from src.idset import MAX_RELATIVE_BUCKET, IdRun, MessageIdSet
+from src.storage import BinaryStorage
+
+def test_add_and_get_with_coarse_timestamps():
+    ids = MessageIdSet(bucket_seconds=60)
+    ids.add('100', 5, 1000)
+    ids.add('100', 7, 1010)
+    ids.add('mobile:100', 5, 1200)
+
+    # Timestamps are rounded up to the end of their bucket
+    assert ids.get('100', 5) == 1019
+    assert ids.get('mobile:100', 5) == 1259
+    assert ids.get('100', 6) is None
+    assert ids.get('200', 5) is None
+    assert len(ids) == 3
+    assert ids.groups['100'].ordered == True
+
+def test_late_and_repeated_ids_keep_arrays_sorted():
+    ids = MessageIdSet(bucket_seconds=10)
+    for message_id, timestamp in ((10, 100), (30, 100), (20, 150), (30, 200)):
+        ids.add('100', message_id, timestamp)
+
+    run = ids.groups['100']
+    assert list(run.ids) == [10, 20, 30]
+    assert ids.get('100', 30) == 209
+    assert len(ids) == 3
+    # Message 20 was added after 30, so expiry cannot cut a prefix anymore
+    assert run.ordered == False
+
+def test_expire_removes_whole_buckets():
+    ids = MessageIdSet(bucket_seconds=10)
+    ids.add('a', 1, 100)
+    ids.add('a', 2, 115)
+    ids.add('b', 1, 105)
+    ids.add('b', 9, 130)
+    ids.add('b', 5, 120)
+
+    # Bucket 110..119 is only partly expired and kept
+    ids.expire(112)
+    assert sorted((group, message_id) for group, message_id, _ in ids.items()) == [
+        ('a', 2), ('b', 5), ('b', 9)]
+
+    ids.expire(125)
+    assert sorted((group, message_id) for group, message_id, _ in ids.items()) == [('b', 5), ('b', 9)]
+    assert 'a' not in ids.groups
+    assert len(ids) == 2
+
+def test_evict_oldest_first():
+    ids = MessageIdSet(bucket_seconds=10)
+    for message_id in range(1, 6):
+        ids.add('a', message_id, 100)
+    ids.add('b', 1, 200)
+
+    ids.evict(3)
+    assert sorted((group, message_id) for group, message_id, _ in ids.items()) == [
+        ('a', 4), ('a', 5), ('b', 1)]
+    ids.evict(2)
+    assert list(ids.items()) == [('b', 1, 209)]
+
+def test_rebase_keeps_live_entries():
+    ids = MessageIdSet(bucket_seconds=1)
+    ids.add('a', 1, 1000)
+    ids.add('a', 2, 1000 + MAX_RELATIVE_BUCKET)
+    ids.add('a', 3, 1000 + MAX_RELATIVE_BUCKET + 10)
+
+    # Entry 1 is too old for 16-bit relative buckets
+    assert [message_id for _, message_id, _ in ids.items()] == [2, 3]
+    assert ids.get('a', 3) == 1000 + MAX_RELATIVE_BUCKET + 10
+    assert ids.base == 1000 + MAX_RELATIVE_BUCKET
+
+def test_million_messages_in_a_few_megabytes(tmp_path):
+    now = int(time.time())
+    ids = MessageIdSet(bucket_seconds=3600, base=now // 3600 - 100)
+    # 50 channels of 20,000 messages each, every third id relevant, ids grow with time
+    for channel in range(50):
+        run = IdRun(array('i', range(1000, 1000 + 60000, 3)),
+                    array('H', (i // 200 for i in range(20000))), ordered=True)
+        ids.add_run(str(100000 + channel), run)
+    assert len(ids) == 1_000_000
+    memory = sum(run.ids.itemsize * len(run.ids) + run.buckets.itemsize * len(run.buckets)
+                 for run in ids.groups.values())
+    assert memory <= 6_000_000
+
+    path = tmp_path / "messages_cache.bin"
+    storage = BinaryStorage(path)
+    storage.save_ids(ids)
+    assert path.stat().st_size < 4_000_000
+    storage.add("100007_61000", now)
+
+    started = time.perf_counter()
+    loaded = BinaryStorage(path).load_ids()
+    assert time.perf_counter() - started < 2.0
+    assert len(loaded) == 1_000_001
+    assert loaded.get('100007', 1003) == ids.get('100007', 1003)
+    assert loaded.get('100007', 1004) is None
+    assert loaded.get('100007', 61000) >= now
+    assert loaded.groups['100049'].ordered == True
+
+    # Half of the buckets expire as an array prefix of every channel
+    loaded.expire(loaded.timestamp(50))
+    assert len(loaded) == 500_001
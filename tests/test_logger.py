@@ -0,0 +1,33 @@
+import json
+import logging
+from logging.handlers import QueueHandler, RotatingFileHandler
+from src import logger as logger_module
+from src.logger import JsonFormatter, flush_logging, logger
+
+def test_json_formatter_structured_fields():
+    record = logging.LogRecord('career_scout', logging.INFO, __file__, 1,
+                               "Found relevant message %s", (42,), None)
+    record.channel = '@jobs'
+    record.message_id = 42
+    record.stage = 'filter'
+
+    data = json.loads(JsonFormatter().format(record))
+
+    assert data['message'] == "Found relevant message 42"
+    assert data['level'] == 'INFO'
+    assert data['channel'] == '@jobs'
+    assert data['message_id'] == 42
+    assert data['stage'] == 'filter'
+
+def test_records_go_through_queue():
+    # Logging is configured by the first record
+    logger.warning("queued logging test record")
+    flush_logging()
+
+    assert all(isinstance(h, QueueHandler) for h in logger.handlers)
+
+    # Logging stays configured with the log file of the first test that logged
+    log_file = next(h.baseFilename for h in logger_module._listener.handlers
+                    if isinstance(h, RotatingFileHandler))
+    with open(log_file, 'r', encoding='utf-8') as f:
+        assert "queued logging test record" in f.read()
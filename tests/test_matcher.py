@@ -0,0 +1,39 @@
+from src.matcher import KeywordMatcher
+
+def test_find_groups_in_single_pass():
+    matcher = KeywordMatcher({
+        'stop_words': ['resume'],
+        'positions': ['ios developer', 'developer', 'swift']
+    })
+
+    found = matcher.find("senior ios developer, swift and swiftui")
+
+    assert found['stop_words'] == []
+    assert found['positions'] == ['ios developer', 'developer', 'swift']
+
+def test_stop_group_ends_scan():
+    matcher = KeywordMatcher({'stop_words': ['cv'], 'positions': ['python']})
+
+    found = matcher.find("send cv, python", stop_groups=('stop_words',))
+
+    assert found['stop_words'] == ['cv']
+    assert found['positions'] == []
+
+def test_scan_ends_once_every_stop_group_hit():
+    matcher = KeywordMatcher({'stop_words': ['cv'], 'mobile:stop_words': ['senior'],
+                              'positions': ['python']})
+
+    found = matcher.find("send cv, python", stop_groups=('stop_words', 'mobile:stop_words'))
+    assert found['positions'] == ['python']
+
+    found = matcher.find("senior, send cv, python", stop_groups=('stop_words', 'mobile:stop_words'))
+    assert found['positions'] == []
+
+def test_word_boundary():
+    groups = {'stop_words': ['cv'], 'positions': ['c++']}
+
+    assert KeywordMatcher(groups).find("cvs")['stop_words'] == ['cv']
+    strict = KeywordMatcher(groups, word_boundary=True)
+    assert strict.find("cvs")['stop_words'] == []
+    assert strict.find("send cv.")['stop_words'] == ['cv']
+    assert strict.find("c++ engineer")['positions'] == ['c++']
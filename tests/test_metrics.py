@@ -0,0 +1,46 @@
+import asyncio
+from src.metrics import MetricsRegistry, start_metrics_server
+from src import metrics
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    sent = registry.counter('sent_total', 'Sent messages', ('channel',))
+    latency = registry.histogram('stage_seconds', 'Stage latency', ('stage',))
+
+    sent.inc('@jobs')
+    sent.inc('@jobs', amount=2)
+    latency.observe(0.002, 'filter')
+    latency.observe(100, 'filter')
+
+    text = registry.render()
+
+    assert '# TYPE sent_total counter' in text
+    assert 'sent_total{channel="@jobs"} 3' in text
+    assert 'stage_seconds_bucket{stage="filter",le="0.005"} 1' in text
+    assert 'stage_seconds_bucket{stage="filter",le="+Inf"} 2' in text
+    assert 'stage_seconds_count{stage="filter"} 2' in text
+
+def test_cycle_summary_reports_delta():
+    before = metrics.registry.snapshot()
+    metrics.messages_fetched.inc('@summary_test', amount=5)
+    metrics.stage_seconds.observe(0.5, 'summary_test')
+
+    lines = metrics.cycle_summary(before)
+
+    assert 'fetched=5' in lines[0]
+    assert any('stage summary_test: 1 calls' in line for line in lines)
+
+def test_metrics_endpoint():
+    async def fetch():
+        server = await start_metrics_server('127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        response = await reader.read()
+        server.close()
+        return response.decode()
+
+    response = asyncio.run(fetch())
+
+    assert response.startswith("HTTP/1.1 200 OK")
+    assert 'career_scout_messages_fetched_total' in response
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+from types import SimpleNamespace
+from telethon import events
+from src.parser import TelegramParser
+from src.replay import FakeTelegramClient, load_dump
+
+def _dump(tmp_path, counts):
+    records = [
+        {'id': i, 'channel': channel, 'date': '2024-11-30T10:00:00+00:00',
+         'text': f"Python developer #{i}" if i % 2 else f"Message {i}"}
+        for channel, count in counts.items() for i in range(1, count + 1)
+    ]
+    path = tmp_path / "dump.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in records))
+    return load_dump(path)
+
+class ConcurrencyClient(FakeTelegramClient):
+    """Records how many channel histories are fetched at the same time"""
+
+    def __init__(self, channels, slow):
+        super().__init__(channels)
+        self.slow = slow
+        self.active = 0
+        self.max_active = 0
+
+    async def iter_messages(self, entity, **kwargs):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            name = self._by_peer_id[entity.channel_id]
+            await asyncio.sleep(0.2 if name == self.slow else 0.02)
+            async for message in super().iter_messages(entity, **kwargs):
+                yield message
+        finally:
+            self.active -= 1
+
+def test_scan_channels_bounded_and_isolated(configure, tmp_path, caplog):
+    configure({'settings': {'parser': {'max_concurrent_channels': 2}}})
+    client = ConcurrencyClient(_dump(tmp_path, {'@slow': 3, '@a': 4, '@b': 2, '@c': 5}), slow='@slow')
+    parser = TelegramParser(client=client, target_channel=1, data_dir=tmp_path)
+    # @missing cannot be resolved and fails alone
+    channels = [{'id': name} for name in ('@slow', '@missing', '@a', '@b', '@c')]
+
+    results = asyncio.run(parser.scan_channels(channels))
+
+    assert [r.channel_id for r in results] == ['@slow', '@missing', '@a', '@b', '@c']
+    assert [r.messages for r in results] == [3, 0, 4, 2, 5]
+    assert [r.error is None for r in results] == [True, False, True, True, True]
+    assert client.max_active == 2
+    assert results[0].seconds >= 0.2
+    # Matches (odd ids) of all resolved channels are queued
+    assert len(parser.outbox) == 2 + 2 + 1 + 3
+    assert parser.cursors.get('@c') == 5
+
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="career_scout"):
+        parser._log_cycle_summary(results, 1.5)
+    summary = [record.getMessage() for record in caplog.records]
+    assert summary[0] == "Scan cycle took 1.5s: 5 channels, 1 failed"
+    # Slowest channel first
+    assert summary[1].startswith("  @slow:") and summary[1].endswith("3 messages, ok")
+    assert any(line.startswith("  @missing:") and "failed: Cannot find" in line for line in summary)
+
+class EventClient(FakeTelegramClient):
+    """Keeps registered event handlers"""
+
+    def __init__(self, channels):
+        super().__init__(channels)
+        self.handlers = []
+
+    def add_event_handler(self, callback, event=None):
+        self.handlers.append((callback, event))
+
+    def remove_event_handler(self, callback, event=None):
+        self.handlers = [(c, e) for c, e in self.handlers
+                         if c != callback or event is not None and e is not event]
+
+def test_event_handlers_follow_channels(configure, tmp_path):
+    configure({'settings': {'parser': {'mode': 'events'}}})
+    channels = _dump(tmp_path, {'@jobs': 1, '@it_jobs': 1})
+    client = EventClient(channels)
+    parser = TelegramParser(client=client, target_channel=1, data_dir=tmp_path)
+
+    asyncio.run(parser.register_event_handlers([{'id': '@jobs'}]))
+    registered = list(client.handlers)
+    assert [type(event) for _, event in registered] == [events.NewMessage]
+    peer_id = -1000000000000 - channels['@jobs'][0].peer_id.channel_id
+    assert parser._channel_names == {peer_id: '@jobs'}
+
+    # Unchanged channels keep the handlers
+    asyncio.run(parser.register_event_handlers([{'id': '@jobs'}]))
+    assert client.handlers == registered
+
+    configure({'settings': {'parser': {'listen_edits': True}}})
+    asyncio.run(parser.register_event_handlers([{'id': '@jobs'}, {'id': '@it_jobs'}]))
+    assert [type(event) for _, event in client.handlers] == [events.NewMessage, events.MessageEdited]
+    assert sorted(parser._channel_names.values()) == ['@it_jobs', '@jobs']
+
+def test_event_message_goes_through_pipeline(configure, tmp_path):
+    configure({'settings': {'parser': {'mode': 'events'}}})
+    channels = _dump(tmp_path, {'@jobs': 2})
+    parser = TelegramParser(client=EventClient(channels), target_channel=1, data_dir=tmp_path)
+    asyncio.run(parser.register_event_handlers([{'id': '@jobs'}]))
+    chat_id = next(iter(parser._channel_names))
+
+    for message in channels['@jobs']:
+        asyncio.run(parser._on_message(SimpleNamespace(chat_id=chat_id, message=message)))
+    # Edit of a queued message is not queued again
+    asyncio.run(parser._on_message(SimpleNamespace(chat_id=chat_id, message=channels['@jobs'][0])))
+
+    items = parser.outbox.peek(10)
+    assert [(item.message_id, item.payload['channel']) for item in items] == [(1, '@jobs')]
+    # Events leave the cursor to catch-up scans
+    assert parser.cursors.get('@jobs') is None
+
+def test_routes_queue_message_once_per_route(configure, tmp_path):
+    configure({
+        'settings': {'sender': {'rate_per_minute': 60000, 'burst': 100}},
+        'routes': [
+            {'name': 'mobile', 'target': '@mobile_jobs', 'keywords': {'positions': ['ios developer']}},
+            {'name': 'data', 'target': '-1007', 'channels': ['@b'],
+             'keywords': {'positions': ['sql'], 'stop_words': ['intern']}},
+        ],
+    })
+    records = [
+        {'id': 1, 'channel': '@a', 'text': "Python developer and iOS developer"},
+        {'id': 2, 'channel': '@a', 'text': "Python developer, SQL"},
+        {'id': 1, 'channel': '@b', 'text': "iOS developer with SQL"},
+        {'id': 2, 'channel': '@b', 'text': "SQL intern"},
+    ]
+    path = tmp_path / "dump.jsonl"
+    path.write_text("\n".join(json.dumps(dict(r, date='2024-11-30T10:00:00+00:00')) for r in records))
+    channels = load_dump(path)
+    client = FakeTelegramClient(channels)
+    parser = TelegramParser(client=client, target_channel=1, data_dir=tmp_path)
+
+    for name in ('@a', '@b'):
+        asyncio.run(parser.process_page(name, channels[name]))
+    items = parser.outbox.peek(10)
+    # data route only applies to @b
+    assert [(item.payload['channel'], item.message_id, item.payload.get('route')) for item in items] == [
+        ('@a', 1, None), ('@a', 1, 'mobile'), ('@a', 2, None), ('@b', 1, 'mobile'), ('@b', 1, 'data')]
+
+    for item in items:
+        assert asyncio.run(parser.sender.deliver(item))
+    assert [entity for entity, _ in client.sent] == [1, '@mobile_jobs', 1, '@mobile_jobs', -1007]
+    peer_id = channels['@b'][0].peer_id.channel_id
+    assert parser.cache.message_exists(1, peer_id, 'data')
+    assert not parser.cache.message_exists(1, peer_id)
+
+    # Delivered routes are not queued again
+    for name in ('@a', '@b'):
+        asyncio.run(parser.process_page(name, channels[name]))
+    assert len(parser.outbox) == 0
+
+def test_route_channels_match_quoted_and_unquoted_ids(configure, tmp_path):
+    configure({
+        'routes': [
+            {'name': 'quoted', 'target': '@quoted', 'channels': ['-1001'],
+             'keywords': {'positions': ['sql']}},
+            {'name': 'unquoted', 'target': '@unquoted', 'channels': [-1002],
+             'keywords': {'positions': ['sql']}},
+        ],
+    })
+    records = [
+        {'id': 1, 'channel': '-1001', 'text': "SQL analyst"},
+        {'id': 1, 'channel': '-1002', 'text': "SQL analyst"},
+    ]
+    path = tmp_path / "dump.jsonl"
+    path.write_text("\n".join(json.dumps(dict(r, date='2024-11-30T10:00:00+00:00')) for r in records))
+    channels = load_dump(path)
+    parser = TelegramParser(client=FakeTelegramClient(channels), target_channel=1, data_dir=tmp_path)
+
+    # Unquoted job_channels ids are ints, quoted ones strings
+    asyncio.run(parser.process_page(-1001, channels['-1001']))
+    asyncio.run(parser.process_page('-1002', channels['-1002']))
+    assert [(item.payload['channel'], item.payload.get('route')) for item in parser.outbox.peek(10)] == [
+        (-1001, 'quoted'), ('-1002', 'unquoted')]
@@ -0,0 +1,65 @@
+import asyncio
+import csv
+import pstats
+import tracemalloc
+from src.parser import TelegramParser
+from src.profiling import ProfileSession
+from src.replay import FakeTelegramClient
+
+def _written(tmp_path):
+    return sorted(path.name.split('.', 1)[1] for path in tmp_path.iterdir())
+
+def test_profile_cycles(tmp_path):
+    async def run():
+        session = ProfileSession(tmp_path, cycles=2, lag_interval=0.01)
+        session.start()
+        for _ in range(2):
+            sum(i * i for i in range(10000))
+            await asyncio.sleep(0.05)
+            session.cycle_finished()
+        return session
+
+    session = asyncio.run(run())
+
+    assert session.finished
+    assert not tracemalloc.is_tracing()
+    assert _written(tmp_path) == ['lag.csv', 'pstats', 'tracemalloc']
+    prefix = session.output_prefix
+    assert pstats.Stats(f"{prefix}.pstats").total_calls > 0
+    tracemalloc.Snapshot.load(f"{prefix}.tracemalloc")
+    with open(f"{prefix}.lag.csv") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['time', 'lag_seconds'] and len(rows) > 1
+
+def test_profile_seconds_stops_itself(tmp_path):
+    async def run():
+        session = ProfileSession(tmp_path, seconds=0.1)
+        session.start()
+        await asyncio.sleep(0.3)
+        return session
+
+    assert asyncio.run(run()).finished
+    assert _written(tmp_path) == ['lag.csv', 'pstats', 'tracemalloc']
+
+def test_parser_profiles_cycle_when_enabled(configure, tmp_path):
+    configure({'settings': {'parser': {'pause_minutes': 60},
+                            'profiling': {'enabled': True, 'cycles': 1}}})
+
+    async def run():
+        parser = TelegramParser(client=FakeTelegramClient({}), target_channel=1, data_dir=tmp_path)
+        task = asyncio.create_task(parser.run())
+        while not (parser.profile and parser.profile.finished):
+            await asyncio.sleep(0.01)
+        # Pause of the next cycle is ended by a new request
+        parser.request_profile()
+        while not parser.profile.started:
+            await asyncio.sleep(0.01)
+        parser.stop_parser()
+        parser._wake.set()
+        await task
+        return parser
+
+    parser = asyncio.run(run())
+
+    assert parser.profile.finished
+    assert len(list((tmp_path / "logs").glob("profile-*.pstats"))) >= 1
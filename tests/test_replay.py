@@ -0,0 +1,54 @@
+import asyncio
+import json
+import pytest
+from src.replay import FakeTelegramClient, load_dump, replay
+
+@pytest.fixture
+def replay_config(configure):
+    configure({
+        'settings': {
+            'cache': {'backend': 'sqlite'},
+            'parser': {'max_concurrent_channels': 2},
+            'dedup': {'enabled': True, 'similarity': 0.95},
+        },
+        'keywords': {'stop_words': ['resume']},
+    })
+
+@pytest.fixture
+def dump_file(tmp_path):
+    records = [
+        {'id': 1, 'channel': '@jobs', 'date': '2024-11-30T10:00:00+00:00',
+         'text': 'Senior Python Developer, remote, Django and PostgreSQL'},
+        {'id': 2, 'channel': '@jobs', 'date': '2024-11-30T11:00:00+00:00',
+         'text': 'Python developer resume attached'},
+        {'id': 3, 'channel': '@jobs', 'date': '2024-11-30T12:00:00+00:00',
+         'text': 'Frontend engineer, React'},
+        {'id': 7, 'channel': '@it_jobs', 'date': '2024-11-30T10:30:00+00:00',
+         'text': 'Senior Python Developer, remote, Django and PostgreSQL'},
+        {'id': 8, 'channel': '@it_jobs', 'date': '2024-11-30T10:40:00+00:00',
+         'text': 'Python developer for data pipelines, Airflow'},
+    ]
+    path = tmp_path / "dump.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in records))
+    return path
+
+def test_fake_client_iter_messages(dump_file):
+    client = FakeTelegramClient(load_dump(dump_file))
+
+    async def fetch():
+        entity = await client.get_entity('@jobs')
+        return [m.id async for m in client.iter_messages(entity, min_id=1, reverse=True)]
+
+    assert asyncio.run(fetch()) == [2, 3]
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_replay_end_to_end(replay_config, dump_file, workers):
+    report = asyncio.run(replay(dump_file, flood_every=2, workers=workers))
+
+    assert report['messages'] == 5
+    # Stop word and non-matching message are filtered, repost in @it_jobs is a near-duplicate
+    # even when both channels are scanned by different workers
+    assert report['sent'] == 2
+    assert report['flood_waits'] == 1
+    assert report['failed_channels'] == []
+    assert report['stages']['process_message']['count'] == 5
@@ -0,0 +1,100 @@
+import json
+from src.scheduler import ChannelScheduler, RATE_WINDOW
+
+def _scheduler(tmp_path, adaptive=True):
+    # Default 60 minutes, adaptive bounds 2 minutes .. 6 hours
+    return ChannelScheduler(tmp_path / "schedule.json", 3600, 120, 6 * 3600, adaptive)
+
+def test_new_channels_due_in_order(tmp_path):
+    scheduler = _scheduler(tmp_path)
+    scheduler.sync([{'id': '@a'}, {'id': '@b'}], now=0)
+
+    assert scheduler.next_due() == 0
+    assert [channel['id'] for channel in scheduler.pop_due(now=0)] == ['@a', '@b']
+    assert scheduler.next_due() is None
+
+    scheduler.reschedule('@b', now=0)
+    scheduler.reschedule('@a', now=10)
+    assert scheduler.next_due() == 3600
+    assert scheduler.pop_due(now=3605) == [{'id': '@b'}]
+    assert scheduler.pop_due(now=3610) == [{'id': '@a'}]
+
+def test_adaptive_interval_follows_rate(tmp_path):
+    scheduler = _scheduler(tmp_path)
+    scheduler.sync([{'id': '@busy'}, {'id': '@quiet'}, {'id': '@new'}], now=0)
+    for i in range(10):
+        scheduler.observe('@busy', 1000 + i * 600)
+    scheduler.observe('@quiet', 1000)
+
+    assert scheduler.rate('@new') is None
+    assert scheduler.interval('@new') == 3600
+    # 10 messages in 6000 seconds
+    assert scheduler.interval('@busy', now=7000) == 600
+    # Clamped to max_interval
+    assert scheduler.interval('@quiet', now=1000 + 86400) == 6 * 3600
+    # Clamped to min_interval
+    scheduler.observe('@busy', 6500)
+    assert scheduler.interval('@busy', now=1000) == 120
+
+def test_history_window_and_order(tmp_path):
+    scheduler = _scheduler(tmp_path)
+    for i in range(RATE_WINDOW + 5):
+        scheduler.observe('@a', float(i))
+    scheduler.observe('@a', 0.0)
+
+    assert len(scheduler.history['@a']) == RATE_WINDOW
+    assert scheduler.history['@a'][0] == 5.0
+
+def test_channel_overrides(tmp_path):
+    scheduler = _scheduler(tmp_path)
+    scheduler.sync([{'id': '@fixed', 'interval_minutes': 5},
+                    {'id': '@bounded', 'min_minutes': 30, 'max_minutes': 45}], now=0)
+    for channel_id in ('@fixed', '@bounded'):
+        scheduler.observe(channel_id, 1000)
+        scheduler.observe(channel_id, 1060)
+
+    assert scheduler.interval('@fixed', now=1060) == 300
+    assert scheduler.interval('@bounded', now=1060) == 1800
+    assert scheduler.interval('@bounded', now=1000 + 86400) == 2700
+
+def test_not_adaptive_uses_default(tmp_path):
+    scheduler = _scheduler(tmp_path, adaptive=False)
+    scheduler.sync([{'id': '@a'}], now=0)
+    scheduler.observe('@a', 1000)
+    scheduler.observe('@a', 1001)
+
+    assert scheduler.interval('@a', now=1001) == 3600
+
+def test_removed_channels_and_expedite(tmp_path):
+    scheduler = _scheduler(tmp_path)
+    scheduler.sync([{'id': '@a'}, {'id': '@b'}], now=0)
+    scheduler.pop_due(now=0)
+    scheduler.reschedule('@a', now=0)
+    scheduler.reschedule('@b', now=0)
+    scheduler.observe('@b', 1000)
+
+    scheduler.sync([{'id': '@a'}], now=10)
+    assert '@b' not in scheduler.history
+    # Stale heap entry of @b is skipped
+    assert scheduler.pop_due(now=3600) == [{'id': '@a'}]
+    assert scheduler.reschedule('@b', now=3600) == 3600
+    assert scheduler.pop_due(now=10 ** 6) == []
+
+    scheduler.reschedule('@a', now=3600)
+    scheduler.expedite(now=4000)
+    assert scheduler.next_due() == 4000
+    assert scheduler.pop_due(now=4000) == [{'id': '@a'}]
+    assert scheduler.pop_due(now=10 ** 6) == []
+
+def test_history_persisted(tmp_path):
+    scheduler = _scheduler(tmp_path)
+    scheduler.observe('@a', 1000)
+    scheduler.observe('@a', 1600)
+    scheduler.save()
+
+    with open(tmp_path / "schedule.json") as f:
+        assert json.load(f) == {'@a': [1000, 1600]}
+    assert list(_scheduler(tmp_path).history['@a']) == [1000, 1600]
+
+    (tmp_path / "schedule.json").write_text("{not json")
+    assert _scheduler(tmp_path).history == {}
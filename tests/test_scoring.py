@@ -0,0 +1,70 @@
+import pytest
+from src.config import ConfigError, build_snapshot
+from src.filters import ScoringFilter, create_filter
+
+pytest.importorskip('numpy')
+
+from src.scoring import TermScorer, build_scorer
+
+def test_score_batch_sums_weights_of_found_terms():
+    scorer = TermScorer({'python developer': 3, 'python': 1, 'django': 0.5, 'resume': -5})
+
+    scores, terms = scorer.score_batch([
+        "Senior Python Developer with Django",
+        "Python developer, resume attached",
+        "Snake python in the zoo",
+        "",
+    ])
+
+    assert scores == [4.5, -1.0, 1.0, 0.0]
+    assert terms[0] == ['python developer', 'python', 'django']
+    assert terms[1] == ['python developer', 'python']
+    assert terms[3] == []
+
+def test_symbols_in_words_are_kept():
+    scorer = TermScorer({'c++': 3, 'c': 1, 'c#': 2, 'node.js developer': 4})
+
+    scores, terms = scorer.score_batch([
+        "Senior C++ engineer",
+        "Embedded C, some C#.",
+        "Node.js developer.",
+        "Node js developer",
+    ])
+
+    assert scores == [3.0, 3.0, 4.0, 0.0]
+    assert terms[0] == ['c++']
+    assert terms[1] == ['c', 'c#']
+
+def test_build_scorer_uses_keywords_with_overrides():
+    scorer = build_scorer({
+        'positions': ['python developer', 'python'],
+        'stop_words': ['resume'],
+        'scoring': {'enabled': True, 'threshold': 2, 'weights': {'python': 0.5}},
+    })
+    scoring_filter = ScoringFilter(scorer)
+
+    result = scoring_filter.match("Looking for a Python developer")
+    assert result.is_relevant == False
+    assert result.score == 1.5
+    assert result.keywords == {'positions': ['python developer', 'python']}
+
+    results = scoring_filter.match_batch(["python developer, python developer", "python resume"])
+    assert [r.score for r in results] == [1.5, -9.5]
+
+def test_snapshot_creates_scoring_filter(monkeypatch):
+    raw = {
+        'settings': {
+            'cache': {'file': 'data/cache/messages_cache.json', 'size': 10, 'ttl': 60},
+            'parser': {'days_to_parse': 1, 'max_retries': 1, 'request_delay': 1,
+                       'timezone': 'UTC', 'log_level': 'INFO', 'log_file': 'logs/parser.log',
+                       'pause_minutes': 1},
+        },
+        'channels': {'job_channels': []},
+        'keywords': {'positions': ['python'], 'stop_words': [], 'scoring': {'enabled': True}},
+    }
+
+    assert isinstance(create_filter(build_snapshot(raw)), ScoringFilter)
+
+    monkeypatch.setattr('src.config.scoring_available', lambda: False)
+    with pytest.raises(ConfigError):
+        build_snapshot(raw)
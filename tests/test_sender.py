@@ -0,0 +1,117 @@
+import asyncio
+from src.dedup import NearDuplicateIndex
+from src.outbox import Outbox
+from src.sender import MessageSender
+
+class MockConfig:
+    SEND_RATE_PER_MINUTE = 6000
+    SEND_BURST = 10
+    MAX_RETRIES = 2
+    DIGEST_ENABLED = False
+    DIGEST_GROUP_BY = 'channel'
+    DIGEST_FLUSH_INTERVAL = 60
+    DIGEST_MAX_LATENCY = 600
+
+class DigestConfig(MockConfig):
+    DIGEST_ENABLED = True
+
+class MockCache:
+    def __init__(self):
+        self.messages = []
+
+    def add_message(self, message_id, channel_id, route=None):
+        self.messages.append((message_id, channel_id) if route is None else (message_id, channel_id, route))
+
+class FlakyClient:
+    def __init__(self, failures):
+        self.failures = failures
+        self.sent = []
+
+    async def send_message(self, entity, text, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("network down")
+        self.sent.append((entity, text))
+
+def test_deliver_retries_then_marks_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.sender.config', MockConfig())
+    outbox = Outbox(tmp_path / "outbox.db")
+    outbox.put(1, 100, {'text': 'vacancy'})
+    cache = MockCache()
+    client = FlakyClient(failures=1)
+    sender = MessageSender(client, outbox, cache, target_channel=-1)
+    sender.backoff_base = 0
+
+    assert asyncio.run(sender.deliver(outbox.peek()[0])) == False
+    assert cache.messages == []
+
+    assert asyncio.run(sender.deliver(outbox.peek()[0])) == True
+    assert client.sent == [(-1, 'vacancy')]
+    assert cache.messages == [(1, 100)]
+    assert len(outbox) == 0
+
+def test_deliver_gives_up_after_max_retries(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.sender.config', MockConfig())
+    outbox = Outbox(tmp_path / "outbox.db")
+    outbox.put(1, 100, {'text': 'vacancy'})
+    cache = MockCache()
+    sender = MessageSender(FlakyClient(failures=5), outbox, cache, target_channel=-1)
+    sender.backoff_base = 0
+
+    for _ in range(2):
+        asyncio.run(sender.deliver(outbox.peek()[0]))
+
+    assert len(outbox) == 0
+    assert cache.messages == []
+
+def test_digest_marks_cache_only_after_delivery(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.sender.config', DigestConfig())
+    outbox = Outbox(tmp_path / "outbox.db")
+    for message_id in (1, 2):
+        outbox.put(message_id, 100, {'text': 'vacancy', 'channel': '@jobs',
+                                     'entry': f"entry {message_id}"})
+    outbox.put(3, 200, {'text': 'vacancy', 'channel': '@other', 'entry': "entry 3"})
+    cache = MockCache()
+    client = FlakyClient(failures=1)
+    sender = MessageSender(client, outbox, cache, target_channel=-1)
+    sender.backoff_base = 0
+
+    assert asyncio.run(sender.deliver_digest(outbox.peek(10))) == False
+    assert cache.messages == []
+    assert len(outbox) == 3
+
+    assert asyncio.run(sender.deliver_digest(outbox.peek(10))) == True
+    # One digest per channel
+    assert len(client.sent) == 2
+    assert "entry 1\n\nentry 2" in client.sent[0][1]
+    assert sorted(cache.messages) == [(1, 100), (2, 100), (3, 200)]
+    assert len(outbox) == 0
+
+def test_near_duplicates_suppressed_per_route(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.sender.config', MockConfig())
+    outbox = Outbox(tmp_path / "outbox.db")
+    outbox.put(1, 100, {'text': 'vacancy', 'fingerprint': 7})
+    outbox.put(1, 100, {'text': 'vacancy', 'fingerprint': 7, 'route': 'mobile', 'target': '@mobile'})
+    outbox.put(1, 200, {'text': 'repost', 'fingerprint': 7, 'route': 'mobile', 'target': '@mobile'})
+    cache = MockCache()
+    client = FlakyClient(failures=0)
+    duplicates = NearDuplicateIndex(tmp_path / "fingerprints.bin", similarity=0.95, ttl=3600)
+    sender = MessageSender(client, outbox, cache, -1, duplicates)
+
+    for item in outbox.peek(10):
+        asyncio.run(sender.deliver(item))
+
+    # Same vacancy goes to every target once
+    assert client.sent == [(-1, 'vacancy'), ('@mobile', 'vacancy')]
+    assert cache.messages == [(1, 100), (1, 100, 'mobile'), (1, 200, 'mobile')]
+    assert (tmp_path / "fingerprints.mobile.bin").exists()
+
+def test_digest_waits_for_quiet_period(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.sender.config', DigestConfig())
+    outbox = Outbox(tmp_path / "outbox.db")
+    outbox.put(1, 100, {'text': 'vacancy', 'entry': "entry"})
+    sender = MessageSender(FlakyClient(failures=0), outbox, MockCache(), target_channel=-1)
+
+    assert 0 < sender._digest_delay(outbox.peek(10)) <= 60
+    sender.flush_interval = 0
+    assert sender._digest_delay(outbox.peek(10)) <= 0
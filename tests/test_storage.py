@@ -0,0 +1,135 @@
+import json
+import pytest
+from src.storage import BinaryStorage, JsonStorage, LogStorage, SqliteStorage, create_storage
+
+@pytest.mark.parametrize('storage_class', [LogStorage, SqliteStorage])
+def test_incremental_add_and_reload(tmp_path, storage_class):
+    path = tmp_path / f"cache{storage_class.suffix}"
+    storage = storage_class(path)
+    storage.load()
+    storage.add("1_1", 100)
+    storage.add("1_2", 200)
+    storage.close()
+
+    storage = storage_class(path)
+    assert storage.load() == {"1_1": 100, "1_2": 200}
+    storage.close()
+
+def test_log_skips_torn_line(tmp_path):
+    path = tmp_path / "cache.jsonl"
+    path.write_text('{"k": "1_1", "t": 100}\n{"k": "1_2", "t"')
+
+    assert LogStorage(path).load() == {"1_1": 100}
+
+def test_log_appends_after_torn_line(tmp_path):
+    path = tmp_path / "cache.jsonl"
+    path.write_text('{"k": "1_1", "t": 100}\n{"k": "1_2", "t"')
+    storage = LogStorage(path)
+    storage.load()
+    storage.add("1_3", 300)
+    storage.add("1_4", 400)
+    storage.close()
+
+    assert LogStorage(path).load() == {"1_1": 100, "1_3": 300, "1_4": 400}
+    assert LogStorage(path).verify() == []
+
+def test_log_compaction(tmp_path):
+    path = tmp_path / "cache.jsonl"
+    storage = LogStorage(path)
+    for i in range(1000):
+        storage.add(f"1_{i}", i)
+
+    assert storage.needs_compaction(live_entries=10) == True
+
+    storage.save({"1_999": 999})
+
+    assert storage.stored == 1
+    assert path.read_text().count("\n") == 1
+
+def test_migrate_json_cache(tmp_path):
+    cache_file = tmp_path / "messages_cache.json"
+    with open(cache_file, 'w') as f:
+        json.dump({"1234_5678": 100}, f)
+
+    storage = create_storage('sqlite', cache_file)
+
+    assert storage.load() == {"1234_5678": 100}
+    assert not cache_file.exists()
+    assert (tmp_path / "messages_cache.json.migrated").exists()
+
+def test_json_save_is_atomic(tmp_path):
+    path = tmp_path / "cache.json"
+    JsonStorage(path).save({"1_1": 100})
+
+    assert json.loads(path.read_text()) == {"1_1": 100}
+    assert list(tmp_path.iterdir()) == [path]
+
+def test_json_streaming_matches_load(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.storage.JSON_CHUNK_SIZE', 16)
+    path = tmp_path / "cache.json"
+    entries = {f"@channel_{i}_{i * 7}": 1700000000 + i for i in range(200)}
+    entries['"quoted", \\ key_1'] = 5
+    JsonStorage(path).save(entries)
+
+    assert dict(JsonStorage(path).iter_entries()) == entries
+
+@pytest.mark.parametrize('storage_class', [JsonStorage, LogStorage, SqliteStorage])
+def test_retain_and_merge(tmp_path, storage_class):
+    path = tmp_path / f"cache{storage_class.suffix}"
+    storage = storage_class(path)
+    storage.save({"a_1": 100, "a_2": 200, "b_1": 300})
+
+    assert storage.retain(lambda key, timestamp: timestamp > 100) == 1
+    assert storage.merge(iter([("c_1", 400), ("a_2", 500)])) == 2
+    storage.close()
+
+    storage = storage_class(path)
+    assert storage.load() == {"a_2": 500, "b_1": 300, "c_1": 400}
+    assert storage.verify() == []
+    storage.close()
+
+def test_log_retain_drops_torn_lines(tmp_path):
+    path = tmp_path / "cache.jsonl"
+    path.write_text('{"k": "1_1", "t": 100}\n{"k": "1_2", "t"\n{"k": "1_3", "t": 300}\n')
+    storage = LogStorage(path)
+
+    assert storage.verify() == ["1 unreadable lines in cache.jsonl"]
+    assert storage.retain(lambda key, timestamp: True) == 1
+    assert storage.verify() == []
+    assert list(storage.iter_entries()) == [("1_1", 100), ("1_3", 300)]
+
+def test_binary_appends_and_drops_torn_tail(tmp_path):
+    path = tmp_path / "cache.bin"
+    storage = BinaryStorage(path, bucket_seconds=1)
+    storage.save({"100_1": 100, "mobile:100_2": 200})
+    storage.add("100_3", 300)
+    storage.close()
+    with open(path, 'ab') as f:
+        f.write(b'A\x03\x00')
+
+    storage = BinaryStorage(path)
+    assert storage.verify() == ["3 unreadable bytes at the end of cache.bin"]
+    assert storage.load() == {"100_1": 100, "mobile:100_2": 200, "100_3": 300}
+    assert storage.stored == 3
+    # Torn record is cut off on load, appends continue after the last complete one
+    storage.add("100_4", 400)
+    assert storage.verify() == []
+    assert storage.needs_compaction(live_entries=1) == False
+    storage.close()
+    assert dict(BinaryStorage(path).iter_entries())["100_4"] == 400
+
+def test_binary_retain_and_merge(tmp_path):
+    storage = BinaryStorage(tmp_path / "cache.bin", bucket_seconds=1)
+    storage.save({"a_1": 100, "a_2": 200, "b_1": 300})
+
+    assert storage.retain(lambda key, timestamp: timestamp > 100) == 1
+    assert storage.merge(iter([("c_1", 400), ("a_2", 500)])) == 2
+    storage.close()
+
+    assert BinaryStorage(tmp_path / "cache.bin").load() == {"a_2": 500, "b_1": 300, "c_1": 400}
+
+def test_binary_rejects_other_files(tmp_path):
+    path = tmp_path / "cache.bin"
+    path.write_bytes(b'{"1_1": 100}')
+
+    assert BinaryStorage(path).verify() == ["cannot read cache.bin: not a binary message cache"]
@@ -0,0 +1,63 @@
+import json
+import os
+from src.commands.watch_logs import LineFilter, LogFollower, tail_lines
+
+def test_tail_lines_reads_last_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.commands.watch_logs.TAIL_BLOCK_SIZE', 16)
+    log_file = tmp_path / 'parser.log'
+    log_file.write_text(''.join(f"line {i}\n" for i in range(100)))
+
+    assert tail_lines(log_file, 3) == ["line 97\n", "line 98\n", "line 99\n"]
+    assert len(tail_lines(log_file, 500)) == 100
+
+def test_tail_lines_reads_back_until_enough_matches(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.commands.watch_logs.TAIL_BLOCK_SIZE', 16)
+    log_file = tmp_path / 'parser.log'
+    # One matching line per 100, far more than a window of 20 lines per match
+    log_file.write_text(''.join(
+        f"ERROR failed {i}\n" if i % 100 == 0 else f"INFO line {i}\n" for i in range(1000)))
+    line_filter = LineFilter(pattern='ERROR')
+
+    assert tail_lines(log_file, 3, line_filter) == [
+        "ERROR failed 700\n", "ERROR failed 800\n", "ERROR failed 900\n"]
+    assert len(tail_lines(log_file, 50, line_filter)) == 10
+
+def test_line_filter_text_and_json():
+    line_filter = LineFilter(level='warning', channel='@jobs')
+
+    assert line_filter("2024-01-01 00:00:00 - career_scout - ERROR - Error processing channel @jobs\n")
+    assert not line_filter("2024-01-01 00:00:00 - career_scout - INFO - Processing channel @jobs\n")
+    assert not line_filter("2024-01-01 00:00:00 - career_scout - ERROR - Error processing channel @other\n")
+    assert not line_filter("2024-01-01 00:00:00 - career_scout - ERROR - Error processing channel @jobs_remote\n")
+    assert line_filter("2024-01-01 00:00:00 - career_scout - ERROR - Error resolving channel @jobs: timeout\n")
+    assert line_filter(json.dumps({'level': 'WARNING', 'message': 'x', 'channel': '@jobs'}))
+    assert not line_filter(json.dumps({'level': 'WARNING', 'message': '@jobs', 'channel': '@other'}))
+
+    assert LineFilter(pattern=r'Found \d+')("Found 3 new messages\n")
+    assert not LineFilter(pattern=r'Found \d+')("Nothing here\n")
+
+def test_follower_survives_rotation_and_partial_lines(tmp_path):
+    log_file = tmp_path / 'parser.log'
+    log_file.write_text("old\n")
+    follower = LogFollower(log_file)
+    follower.open(at_end=True)
+
+    with open(log_file, 'a') as f:
+        f.write("first\nhal")
+    assert follower.read_available() == ["first\n"]
+
+    with open(log_file, 'a') as f:
+        f.write("f\n")
+    # Rotate like RotatingFileHandler and write to the new file
+    os.rename(log_file, tmp_path / 'parser.log.1')
+    log_file.write_text("fresh\n")
+
+    assert follower.read_available() == ["half\n", "fresh\n"]
+
+    # Truncation in place starts reading from the beginning
+    log_file.write_text("")
+    assert follower.read_available() == []
+    with open(log_file, 'a') as f:
+        f.write("after truncate\n")
+    assert follower.read_available() == ["after truncate\n"]
+    follower.close()
@@ -0,0 +1,22 @@
+from src.workers import HashRing, Shard, assign_channels
+
+def test_hash_ring_moves_few_channels_when_worker_added():
+    channels = [f"@channel{i}" for i in range(1000)]
+    before = HashRing(3)
+    after = HashRing(4)
+
+    moved = [c for c in channels if before.node_for(c) != after.node_for(c)]
+
+    # Only channels taken over by the new worker change their worker
+    assert all(after.node_for(c) == 3 for c in moved)
+    assert 150 < len(moved) < 350
+
+def test_assign_channels_partitions_all_channels():
+    channels = [{'id': f"@channel{i}"} for i in range(100)]
+    assignment = assign_channels(channels, 3)
+
+    assert sorted(c['id'] for shard in assignment.values() for c in shard) == \
+        sorted(c['id'] for c in channels)
+    ring = HashRing(3)
+    for index, shard in assignment.items():
+        assert all(Shard(index, ring).owns(c['id']) for c in shard)